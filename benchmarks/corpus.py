@@ -0,0 +1,91 @@
+"""Synthetic corpora for the benchmarks: random words and values, with a
+configurable share of words from non-Latin (and accented Latin) alphabets.
+"""
+import datetime
+import random
+
+from google.appengine.api import search as search_api
+
+from search.globs import CHARACTER_MAP
+
+
+ASCII_LETTERS = u'abcdefghijklmnopqrstuvwxyz'
+
+# Alphabets non-ASCII words are drawn from. The accented letters are the ones
+# `indexers.anglicise` knows about, so anglicising has work to do
+ALPHABETS = {
+    'latin': sorted(c for c in CHARACTER_MAP if len(c) == 1),
+    'cyrillic': [unichr(c) for c in range(0x0430, 0x0450)],
+    'greek': [unichr(c) for c in range(0x03b1, 0x03ca)],
+    'cjk': [unichr(c) for c in range(0x4e00, 0x4e00 + 500)],
+}
+
+
+class Corpus(object):
+    """Generates words, texts and field values from a seeded random number
+    generator, so that runs with the same arguments benchmark the same data.
+    `unicode_ratio` is the share of words with non-ASCII letters in.
+    """
+    def __init__(self, size=1000, unicode_ratio=0.2, seed=0):
+        if not 0 <= unicode_ratio <= 1:
+            raise ValueError("unicode_ratio must be between 0 and 1")
+        self.size = size
+        self.unicode_ratio = unicode_ratio
+        self.random = random.Random(seed)
+
+    def word(self, min_length=2, max_length=10):
+        length = self.random.randint(min_length, max_length)
+        if self.random.random() < self.unicode_ratio:
+            alphabet = ALPHABETS[self.random.choice(sorted(ALPHABETS))]
+            # Mix in some ASCII, as real text with accents would
+            letters = [
+                self.random.choice(alphabet if self.random.random() < 0.5 else ASCII_LETTERS)
+                for _ in range(length)
+            ]
+        else:
+            letters = [self.random.choice(ASCII_LETTERS) for _ in range(length)]
+        return u''.join(letters)
+
+    def text(self, min_words=3, max_words=12):
+        return u' '.join(
+            self.word()
+            for _ in range(self.random.randint(min_words, max_words))
+        )
+
+    def texts(self, **kwargs):
+        return [self.text(**kwargs) for _ in range(self.size)]
+
+    def words(self):
+        return [self.word() for _ in range(self.size)]
+
+    def integers(self):
+        return [self.random.randint(-2 ** 30, 2 ** 30) for _ in range(self.size)]
+
+    def floats(self):
+        return [self.random.uniform(-1e6, 1e6) for _ in range(self.size)]
+
+    def booleans(self):
+        return [self.random.random() < 0.5 for _ in range(self.size)]
+
+    def dates(self):
+        start = datetime.date(2000, 1, 1)
+        return [
+            start + datetime.timedelta(days=self.random.randint(0, 10000))
+            for _ in range(self.size)
+        ]
+
+    def datetimes(self):
+        start = datetime.datetime(2000, 1, 1)
+        return [
+            start + datetime.timedelta(seconds=self.random.randint(0, 10 ** 9))
+            for _ in range(self.size)
+        ]
+
+    def geopoints(self):
+        return [
+            search_api.GeoPoint(
+                self.random.uniform(-90, 90),
+                self.random.uniform(-180, 180)
+            )
+            for _ in range(self.size)
+        ]
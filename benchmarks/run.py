@@ -0,0 +1,359 @@
+"""Micro-benchmarks for the hot paths: indexers, field conversions, query
+compilation, document construction and serialization.
+
+    python -m benchmarks.run --size 2000 --unicode-ratio 0.3 --output results.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.1
+
+Each benchmark runs an operation over every item of a synthetic corpus (see
+`benchmarks.corpus`), `--repeat` times, and reports the best and median time
+per operation. With `--baseline`, any benchmark that's more than
+`--threshold` slower than the baseline is reported as a regression, and the
+exit status is 1. Baselines only mean something on the machine they were
+saved on.
+"""
+import argparse
+import datetime
+import fnmatch
+import json
+import platform
+import sys
+import timeit
+
+from google.appengine.api import search as search_api
+
+from search import fields, indexers, ql, timezone
+from search.backends.memory import MemoryBackend
+from search.indexes import DocumentModel, Index
+from search.query import construct_document, construct_lazy_document
+
+from .corpus import Corpus
+
+
+class BenchmarkDocument(DocumentModel):
+    title = fields.TextField()
+    tags = fields.AtomField()
+    indexed = fields.TextField(indexer=indexers.startswith)
+    number = fields.IntegerField()
+    real = fields.FloatField()
+    flag = fields.BooleanField()
+    date = fields.DateField()
+    timestamp = fields.DateTimeField()
+    geo = fields.GeoField()
+
+
+# Benchmarks by name, each a function taking a `Corpus` and returning a
+# function to time and the number of operations it does
+benchmarks = []
+
+
+def benchmark(name):
+    def register(fn):
+        benchmarks.append((name, fn))
+        return fn
+    return register
+
+
+def each(fn, items):
+    """A benchmark calling `fn` on each of `items`"""
+    def run():
+        for item in items:
+            fn(item)
+    return run, len(items)
+
+
+@benchmark('indexers.startswith')
+def bench_startswith(corpus):
+    return each(indexers.startswith, corpus.texts())
+
+
+@benchmark('indexers.contains')
+def bench_contains(corpus):
+    return each(indexers.contains, corpus.words())
+
+
+@benchmark('indexers.build_corpus')
+def bench_build_corpus(corpus):
+    value_maps = [
+        ((corpus.text(), indexers.startswith), (corpus.word(), indexers.contains))
+        for _ in range(corpus.size)
+    ]
+    return each(lambda value_map: indexers.build_corpus(*value_map), value_maps)
+
+
+@benchmark('indexers.anglicise')
+def bench_anglicise(corpus):
+    return each(indexers.anglicise, corpus.texts())
+
+
+# The field classes to benchmark, with the corpus method for their values
+FIELD_VALUES = [
+    (fields.TextField, 'texts'),
+    (fields.AtomField, 'words'),
+    (fields.IntegerField, 'integers'),
+    (fields.FloatField, 'floats'),
+    (fields.BooleanField, 'booleans'),
+    (fields.DateField, 'dates'),
+    (fields.DateTimeField, 'datetimes'),
+    (fields.TZDateTimeField, 'datetimes'),
+    (fields.GeoField, 'geopoints'),
+]
+
+
+def add_field_benchmarks():
+    for field_class, values_name in FIELD_VALUES:
+        name = 'fields.%s' % field_class.__name__
+
+        def get_values(corpus, field_class=field_class, values_name=values_name):
+            values = getattr(corpus, values_name)()
+            if field_class is fields.TZDateTimeField:
+                values = [v.replace(tzinfo=timezone.utc) for v in values]
+            return field_class(), values
+
+        def bench_to_search_value(corpus, get_values=get_values):
+            field, values = get_values(corpus)
+            return each(field.to_search_value, values)
+
+        def bench_to_python(corpus, get_values=get_values):
+            field, values = get_values(corpus)
+            return each(field.to_python, [field.to_search_value(v) for v in values])
+
+        benchmark(name + '.to_search_value')(bench_to_search_value)
+        benchmark(name + '.to_python')(bench_to_python)
+
+
+add_field_benchmarks()
+
+
+def make_q(corpus, leaves):
+    """A Q tree with `leaves` filters, built up one at a time alternating
+    between `|` and `&`, so it's as deep as it has filters
+    """
+    q = ql.Q(title=corpus.word())
+    for i in range(leaves - 1):
+        other = ql.Q(number__gte=corpus.random.randint(0, 1000)) if i % 3 else ql.Q(tags=corpus.word())
+        q = q | other if i % 2 else q & other
+    return q
+
+
+def iter_q(q):
+    stack = [q]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(c for c in node.children if isinstance(c, ql.Q))
+
+
+@benchmark('ql.build_query.cold')
+def bench_build_query_cold(corpus):
+    trees = [make_q(corpus, 50) for _ in range(max(corpus.size // 50, 1))]
+
+    def run():
+        for q in trees:
+            # Nothing compiled before
+            ql.filter_cache.clear()
+            for node in iter_q(q):
+                node._compiled = None
+            query = ql.Query(BenchmarkDocument)
+            query.add_q(q)
+            query.build_query()
+    return run, len(trees)
+
+
+@benchmark('ql.build_query.warm')
+def bench_build_query_warm(corpus):
+    trees = [make_q(corpus, 50) for _ in range(max(corpus.size // 50, 1))]
+
+    def run():
+        for q in trees:
+            query = ql.Query(BenchmarkDocument)
+            query.add_q(q)
+            query.build_query()
+    return run, len(trees)
+
+
+@benchmark('ql.build_query.in')
+def bench_build_query_in(corpus):
+    values = [corpus.words()[:300] for _ in range(max(corpus.size // 300, 1))]
+
+    def run():
+        ql.filter_cache.clear()
+        for value in values:
+            query = ql.Query(BenchmarkDocument)
+            query.add_q(ql.Q(tags__in=value))
+            query.build_query()
+    return run, len(values)
+
+
+def make_documents(corpus):
+    texts, words = corpus.texts(), corpus.words()
+    integers, floats, booleans = corpus.integers(), corpus.floats(), corpus.booleans()
+    dates, datetimes, geopoints = corpus.dates(), corpus.datetimes(), corpus.geopoints()
+    return [
+        BenchmarkDocument(
+            doc_id=str(i),
+            title=texts[i],
+            tags=words[i],
+            indexed=words[i],
+            number=integers[i] % 2 ** 20,
+            real=floats[i],
+            flag=booleans[i],
+            date=dates[i],
+            timestamp=datetimes[i],
+            geo=geopoints[i],
+        )
+        for i in range(corpus.size)
+    ]
+
+
+@benchmark('index.serialize')
+def bench_serialize(corpus):
+    index = Index('benchmark', BenchmarkDocument, backend=MemoryBackend())
+    return each(index.to_search_document, make_documents(corpus))
+
+
+def make_results(corpus):
+    index = Index('benchmark', BenchmarkDocument, backend=MemoryBackend())
+    return [
+        search_api.ScoredDocument(
+            doc_id=document.doc_id,
+            fields=index.to_search_document(document).fields
+        )
+        for document in make_documents(corpus)
+    ]
+
+
+@benchmark('query.construct_document')
+def bench_construct_document(corpus):
+    return each(
+        lambda result: construct_document(BenchmarkDocument, result),
+        make_results(corpus)
+    )
+
+
+@benchmark('query.construct_lazy_document')
+def bench_construct_lazy_document(corpus):
+    return each(
+        lambda result: construct_lazy_document(BenchmarkDocument, result),
+        make_results(corpus)
+    )
+
+
+def run_benchmark(fn, corpus, repeat):
+    """Time the benchmark `fn`, returning its timings per operation"""
+    run, ops = fn(corpus)
+    # Warm up, e.g. compiling regexes and serializers
+    run()
+
+    times = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        run()
+        times.append((timeit.default_timer() - start) / ops)
+    times.sort()
+    return {
+        'ops': ops,
+        'best': times[0],
+        'median': times[len(times) // 2],
+        'ops_per_sec': 1 / times[0] if times[0] else None,
+    }
+
+
+def run_benchmarks(size=1000, unicode_ratio=0.2, seed=0, repeat=5, pattern='*'):
+    results = {}
+    for name, fn in benchmarks:
+        if fnmatch.fnmatch(name, pattern):
+            corpus = Corpus(size=size, unicode_ratio=unicode_ratio, seed=seed)
+            results[name] = run_benchmark(fn, corpus, repeat)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'size': size,
+            'unicode_ratio': unicode_ratio,
+            'seed': seed,
+            'repeat': repeat,
+            'time': datetime.datetime.utcnow().isoformat(),
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Compare the best times of `results` to those in `baseline`. Returns
+    a list of `(name, baseline time, time, change)` for every benchmark in
+    both, and the names of the ones that are more than `threshold` slower.
+    """
+    comparison = []
+    regressions = []
+    for name in sorted(results['results']):
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['best']
+        after = results['results'][name]['best']
+        change = (after - before) / before if before else 0
+        comparison.append((name, before, after, change))
+        if change > threshold:
+            regressions.append(name)
+    return comparison, regressions
+
+
+def write_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', type=int, default=1000,
+        help="Items in each benchmark's corpus")
+    parser.add_argument('--unicode-ratio', type=float, default=0.2,
+        help="Share of words with non-ASCII letters in")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default='*',
+        help="Only run the benchmarks whose names match this glob")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare the results to this JSON file")
+    parser.add_argument('--save-baseline', metavar='PATH',
+        help="Write the results to PATH, to compare later runs with")
+    parser.add_argument('--threshold', type=float, default=0.1,
+        help="How much slower than the baseline is a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        size=args.size,
+        unicode_ratio=args.unicode_ratio,
+        seed=args.seed,
+        repeat=args.repeat,
+        pattern=args.filter
+    )
+
+    for name, timing in sorted(results['results'].items()):
+        print '%-45s %12.2fus %12.2fus median' % (
+            name, timing['best'] * 1e6, timing['median'] * 1e6
+        )
+
+    if args.output:
+        write_json(results, args.output)
+    if args.save_baseline:
+        write_json(results, args.save_baseline)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison, regressions = compare(results, baseline, args.threshold)
+        print
+        for name, before, after, change in comparison:
+            print '%-45s %12.2fus -> %10.2fus %+7.1f%%%s' % (
+                name, before * 1e6, after * 1e6, change * 100,
+                '  REGRESSION' if name in regressions else ''
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import re
+import threading
+
+from .errors import AliasError
+from .indexes import Index
+
+
+VERSION_REGEX = re.compile(r'^(?P<name>.+)_v(?P<version>\d+)$')
+
+
+class Alias(object):
+    """Points the name `name` at the physical index `current`. While the
+    index is being rebuilt into `next`, writes go to both.
+    """
+    def __init__(self, name, current, next=None):
+        self.name = name
+        self.current = current
+        self.next = next
+
+    def __repr__(self):
+        return '<Alias: %s -> %s%s>' % (
+            self.name,
+            self.current,
+            ' (building %s)' % self.next if self.next else ''
+        )
+
+    @property
+    def write_names(self):
+        """The physical indexes that writes to this alias go to"""
+        return [self.current, self.next] if self.next else [self.current]
+
+
+def get_version_name(name, version):
+    return '%s_v%d' % (name, version)
+
+
+def get_next_version_name(alias):
+    """The physical index name for the version after `alias.current`. A name
+    without a version is taken to be version 1.
+    """
+    match = VERSION_REGEX.match(alias.current)
+    version = int(match.group('version')) if match else 1
+    return get_version_name(alias.name, version + 1)
+
+
+class AliasStore(object):
+    """Base class for the stores of index aliases. Subclasses implement
+    `get_alias` and `compare_and_set`, everything else is built on those.
+
+    Names with no alias are their own physical index, so everything works
+    as before for indexes that have never been reindexed this way.
+    """
+    def get_alias(self, name):
+        """Get the `Alias` for `name`, or `None` if there isn't one"""
+        raise NotImplementedError()
+
+    def compare_and_set(self, name, expected, alias):
+        """Atomically replace `name`'s alias with `alias`, but only if it
+        currently matches `expected` (an `Alias`, or `None` for no alias).
+        Returns whether it was replaced.
+        """
+        raise NotImplementedError()
+
+    def resolve(self, name):
+        """The name of the physical index to read from for `name`"""
+        alias = self.get_alias(name)
+        return alias.current if alias else name
+
+    def get_write_names(self, name):
+        """The names of the physical indexes to write to for `name`"""
+        alias = self.get_alias(name)
+        return alias.write_names if alias else [name]
+
+    def begin_rebuild(self, name):
+        """Start building a new version of the index behind `name`. From
+        now on, writes go to both it and the current version. Returns the
+        new version's index name, which is what to reindex everything into.
+        """
+        current = self.get_alias(name)
+        if current is not None and current.next:
+            raise AliasError(
+                '%s is already being rebuilt into %s' % (name, current.next)
+            )
+
+        alias = Alias(name, current.current if current else name)
+        alias.next = get_next_version_name(alias)
+        if not self.compare_and_set(name, current, alias):
+            raise AliasError('%s was changed by something else' % name)
+        return alias.next
+
+    def finish_rebuild(self, name):
+        """Point `name` at the version built since `begin_rebuild`, in one
+        atomic step. Returns the name of the old version, which is left as
+        it is (to go back to or purge later).
+        """
+        current = self.get_alias(name)
+        if current is None or not current.next:
+            raise AliasError("%s isn't being rebuilt" % name)
+
+        alias = Alias(name, current.next)
+        if not self.compare_and_set(name, current, alias):
+            raise AliasError('%s was changed by something else' % name)
+        return current.current
+
+    def cancel_rebuild(self, name):
+        """Stop writing to the version being built for `name`"""
+        current = self.get_alias(name)
+        if current is None or not current.next:
+            return
+
+        alias = Alias(name, current.current)
+        if not self.compare_and_set(name, current, alias):
+            raise AliasError('%s was changed by something else' % name)
+
+    def point(self, name, index_name):
+        """Point `name` straight at `index_name`, e.g. to go back to an old
+        version.
+        """
+        current = self.get_alias(name)
+        if not self.compare_and_set(name, current, Alias(name, index_name)):
+            raise AliasError('%s was changed by something else' % name)
+
+
+def same_alias(a, b):
+    if a is None or b is None:
+        return a is b
+    return (a.name, a.current, a.next) == (b.name, b.current, b.next)
+
+
+class MemoryAliasStore(AliasStore):
+    """Keeps aliases in this process. Fine for tests and scripts, but every
+    process writing to the index needs to see the same aliases, so use a
+    shared store (e.g. `search.django.aliases.DjangoAliasStore`) otherwise.
+    """
+    def __init__(self):
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def get_alias(self, name):
+        alias = self._aliases.get(name)
+        return Alias(alias.name, alias.current, alias.next) if alias else None
+
+    def compare_and_set(self, name, expected, alias):
+        with self._lock:
+            if not same_alias(self._aliases.get(name), expected):
+                return False
+            self._aliases[name] = alias
+            return True
+
+
+_default_store = None
+
+
+def get_alias_store():
+    """Get the process-wide alias store, a `MemoryAliasStore` unless
+    something else has been set with `set_alias_store`.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = MemoryAliasStore()
+    return _default_store
+
+
+def set_alias_store(store):
+    global _default_store
+    _default_store = store
+
+
+def rebuild_index(name, documents, store=None, backend=None, **kwargs):
+    """Rebuild the index behind the alias `name` from `documents` (any
+    iterable of documents), without it ever being incomplete. A new version
+    of the index is built alongside the current one and the alias is only
+    pointed at it once every document has been put. Returns the name of the
+    old version.
+
+    Anything writing to the index in the meantime should write to every
+    index in `store.get_write_names(name)`, so that the new version doesn't
+    miss changes made after `documents` were read. Extra kwargs are passed
+    to `Index.bulk_put`.
+    """
+    store = store or get_alias_store()
+    next_name = store.begin_rebuild(name)
+
+    try:
+        results = Index(next_name, backend=backend).bulk_put(documents, **kwargs)
+        errors = [r.error for r in results if not r.ok]
+        if errors:
+            raise errors[0]
+    except:
+        store.cancel_rebuild(name)
+        raise
+
+    return store.finish_rebuild(name)
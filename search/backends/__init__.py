@@ -0,0 +1,31 @@
+from .base import Backend
+
+
+_default_backend = None
+
+
+def get_default_backend():
+    """Get the backend that `search.indexes.Index` uses when one isn't passed
+    to it explicitly. Unless `set_default_backend` has been called, this is
+    the App Engine Search API backend.
+    """
+    global _default_backend
+
+    if _default_backend is None:
+        from .appengine import AppEngineBackend
+        _default_backend = AppEngineBackend()
+    return _default_backend
+
+
+def set_default_backend(backend):
+    """Set the backend used by any `Index` instantiated without an explicit
+    `backend` argument from now on, e.g. in a test runner:
+
+    >>> from search.backends import set_default_backend
+    >>> from search.backends.memory import MemoryBackend
+    >>> set_default_backend(MemoryBackend())
+
+    Passing `None` reverts to the App Engine backend.
+    """
+    global _default_backend
+    _default_backend = backend
@@ -0,0 +1,11 @@
+from google.appengine.api import search as search_api
+
+from .base import Backend
+
+
+class AppEngineBackend(Backend):
+    """The default backend. Talks to the App Engine Search API (or the testbed
+    stub, in tests).
+    """
+    def get_index(self, name):
+        return search_api.Index(name=name)
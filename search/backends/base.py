@@ -0,0 +1,23 @@
+class Backend(object):
+    """Base class for search backends. A backend is responsible for handing out
+    the index objects that `search.indexes.Index` and `search.query.SearchQuery`
+    delegate to.
+
+    The index objects returned by `get_index` must behave like the Search API's
+    own `Index` class, i.e. they need to provide:
+
+        * `name`
+        * `put(documents)` and `put_async(documents)`
+        * `get(doc_id)`
+        * `get_range(start_id=None, include_start_object=True, limit=100,
+            ids_only=False)` and `get_range_async(...)`
+        * `delete(doc_ids)` and `delete_async(doc_ids)`
+        * `search(query)` and `search_async(query)`
+
+    taking and returning the Search API's `Document`, `Query`, `SearchResults`,
+    etc. objects, so that the rest of the library doesn't have to care which
+    backend it's talking to.
+    """
+    def get_index(self, name):
+        """Get the index object for the index named `name`"""
+        raise NotImplementedError()
@@ -0,0 +1,919 @@
+"""An in-process search backend, for test runs and benchmarking where going
+through the App Engine Search API (or its testbed stub) is too slow.
+
+Documents are kept in memory as the Search API's own `Document` objects, with
+inverted indexes over the tokens of text, HTML and atom fields and sorted
+value lists for number and date fields. The query parser understands
+everything `search.ql.Query.build_query` produces: keywords, quoted phrases,
+`AND`/`OR`/`NOT`, field restrictions (`field:value`, `field:"a phrase"`,
+`field:(some words)`), the `<`, `<=`, `>`, `>=` and `=` comparisons, and
+`distance(field, geopoint(lat, lon))` comparisons.
+
+Facets are counted exactly, over every document found. Facet discovery picks
+the facets that the most documents found have, and number facets are only
+bucketed by range when ranges are asked for.
+
+Nothing is persisted, and there's no scoring, stemming or query expressions
+beyond plain field names and `snippet()`.
+"""
+import bisect
+import math
+import re
+import sys
+import threading
+import uuid
+from datetime import date, datetime
+
+from google.appengine.api import search as search_api
+
+from .base import Backend
+
+
+TOKEN_REGEX = re.compile(ur'\w+', re.U)
+HTML_TAG_REGEX = re.compile(ur'<[^>]*>', re.U)
+SNIPPET_REGEX = re.compile(ur'^\s*snippet\(\s*"((?:[^"\\]|\\.)*)"\s*,\s*(\w+)\s*\)\s*$', re.U)
+QUERY_TOKEN_REGEX = re.compile(ur'''
+    \s*(?:
+        (?P<lparen>\() |
+        (?P<rparen>\)) |
+        (?P<comma>,) |
+        (?P<colon>:) |
+        (?P<op><=|>=|<|>|=) |
+        "(?P<quoted>(?:[^"\\]|\\.)*)" |
+        (?P<word>[^\s()",:<>=]+)
+    )''', re.U | re.X)
+
+TEXT = 'text'
+ATOM = 'atom'
+NUMBER = 'number'
+DATE = 'date'
+GEO = 'geo'
+
+# Maps Search API field classes to how the memory index treats them. Any
+# field types not in here are stored and returned, but can't be queried on.
+FIELD_KINDS = {
+    search_api.TextField: TEXT,
+    search_api.HtmlField: TEXT,
+    search_api.AtomField: ATOM,
+    search_api.NumberField: NUMBER,
+    search_api.DateField: DATE,
+    search_api.GeoField: GEO,
+}
+
+# Used for `distance()` queries
+EARTH_RADIUS_METRES = 6371010.0
+
+# How long snippets are allowed to get before they're truncated, roughly
+# matching the Search API
+MAX_SNIPPET_LENGTH = 160
+
+
+def tokenize(value):
+    """Split a text value into the lowercased tokens it's indexed under"""
+    return [t.lower() for t in TOKEN_REGEX.findall(value)]
+
+
+def to_date(value):
+    """Date fields are only indexed by date, so normalize any datetimes or
+    query strings of the form 'YYYY-MM-DD' to `date`s.
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def distance(point, lat, lon):
+    """Great circle distance in metres between `point` and (`lat`, `lon`)"""
+    lat1, lon1 = math.radians(point.latitude), math.radians(point.longitude)
+    lat2, lon2 = math.radians(lat), math.radians(lon)
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METRES * math.asin(min(1, math.sqrt(a)))
+
+
+def compare(left, op, right):
+    if op == '<':
+        return left < right
+    if op == '<=':
+        return left <= right
+    if op == '>':
+        return left > right
+    if op == '>=':
+        return left >= right
+    return left == right
+
+
+def facet_matches(value, refinement):
+    """Whether a document with facet `value` is kept by `refinement`"""
+    facet_range = refinement.facet_range
+    if facet_range is not None:
+        return in_range(value, facet_range)
+
+    if isinstance(value, (int, long, float)):
+        try:
+            return value == float(refinement.value)
+        except ValueError:
+            return False
+    return value == refinement.value
+
+
+def in_range(value, facet_range):
+    if not isinstance(value, (int, long, float)):
+        return False
+    if facet_range.start is not None and value < float(facet_range.start):
+        return False
+    if facet_range.end is not None and value >= float(facet_range.end):
+        return False
+    return True
+
+
+def range_label(facet_range):
+    return u'[%s,%s)' % (
+        u'' if facet_range.start is None else facet_range.start,
+        u'' if facet_range.end is None else facet_range.end,
+    )
+
+
+class Future(object):
+    """Stand-in for the Search API's RPC futures. The work is done straight
+    away, but any Search API errors are held back until `get_result` is called,
+    which is where an RPC would raise them.
+    """
+    def __init__(self, fn, *args, **kwargs):
+        self._result = None
+        self._exc_info = None
+        try:
+            self._result = fn(*args, **kwargs)
+        except search_api.Error:
+            self._exc_info = sys.exc_info()
+
+    def get_result(self):
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class All(object):
+    def evaluate(self, index):
+        return set(index._documents)
+
+
+class And(object):
+    def __init__(self, children):
+        self.children = children
+
+    def evaluate(self, index):
+        result = None
+        for child in self.children:
+            ids = child.evaluate(index)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+
+class Or(object):
+    def __init__(self, children):
+        self.children = children
+
+    def evaluate(self, index):
+        result = set()
+        for child in self.children:
+            result |= child.evaluate(index)
+        return result
+
+
+class Not(object):
+    def __init__(self, child):
+        self.child = child
+
+    def evaluate(self, index):
+        return set(index._documents) - self.child.evaluate(index)
+
+
+class Match(object):
+    """A bare term or phrase, either restricted to `field` or (if `field` is
+    None) matched against any field.
+    """
+    def __init__(self, field, value):
+        self.field, self.value = field, value
+
+    def evaluate(self, index):
+        return index._match(self.field, self.value)
+
+
+class Compare(object):
+    def __init__(self, field, op, value):
+        self.field, self.op, self.value = field, op, value
+
+    def evaluate(self, index):
+        return index._compare(self.field, self.op, self.value)
+
+
+class Distance(object):
+    def __init__(self, field, lat, lon, op, radius):
+        self.field, self.lat, self.lon = field, lat, lon
+        self.op, self.radius = op, radius
+
+    def evaluate(self, index):
+        return index._distance(self.field, self.lat, self.lon, self.op, self.radius)
+
+
+class QueryParser(object):
+    """Recursive descent parser turning a query string into a tree of the
+    node classes above. Adjacent terms without an explicit connector are
+    ANDed together, like the Search API does.
+    """
+    def __init__(self, query_string):
+        if isinstance(query_string, str):
+            query_string = query_string.decode('utf-8')
+        self.query_string = query_string
+        self.tokens = self.tokenize(query_string)
+        self.pos = 0
+
+    def tokenize(self, query_string):
+        tokens = []
+        pos = 0
+        end = len(query_string.rstrip())
+        while pos < end:
+            match = QUERY_TOKEN_REGEX.match(query_string, pos)
+            if not match:
+                self.error(u'unexpected character at position %d' % pos)
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'quoted':
+                value = re.sub(ur'\\(.)', ur'\1', value)
+            tokens.append((kind, value))
+            pos = match.end()
+        return tokens
+
+    def error(self, message):
+        raise search_api.QueryError(
+            u'Failed to parse query "%s": %s' % (self.query_string, message)
+        )
+
+    def peek(self, offset=0):
+        try:
+            return self.tokens[self.pos + offset]
+        except IndexError:
+            return (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            self.error(u'unexpected end of query')
+        self.pos += 1
+        return token
+
+    def expect(self, kind):
+        token = self.next()
+        if token[0] != kind:
+            self.error(u'expected %s, got %r' % (kind, token[1]))
+        return token[1]
+
+    def is_keyword(self, keyword):
+        return self.peek() == ('word', keyword)
+
+    def parse(self):
+        if not self.tokens:
+            return All()
+        node = self.parse_or(None)
+        if self.peek()[0] is not None:
+            self.error(u'unexpected %r' % self.peek()[1])
+        return node
+
+    def parse_or(self, field):
+        children = [self.parse_and(field)]
+        while self.is_keyword(u'OR'):
+            self.pos += 1
+            children.append(self.parse_and(field))
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self, field):
+        children = [self.parse_unary(field)]
+        while self.peek()[0] not in (None, 'rparen') and not self.is_keyword(u'OR'):
+            if self.is_keyword(u'AND'):
+                self.pos += 1
+            children.append(self.parse_unary(field))
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self, field):
+        if self.is_keyword(u'NOT'):
+            self.pos += 1
+            return Not(self.parse_unary(field))
+        return self.parse_primary(field)
+
+    def parse_primary(self, field):
+        kind, value = self.next()
+
+        if kind == 'lparen':
+            node = self.parse_or(field)
+            self.expect('rparen')
+            return node
+
+        if kind == 'quoted':
+            return Match(field, value)
+
+        if kind != 'word':
+            self.error(u'unexpected %r' % value)
+
+        if field is None:
+            next_kind = self.peek()[0]
+            if value == u'distance' and next_kind == 'lparen':
+                return self.parse_distance()
+            if next_kind == 'colon':
+                # Everything in a restriction, e.g. `field:(a OR b)`, applies
+                # to that field
+                self.pos += 1
+                return self.parse_unary(value)
+            if next_kind == 'op':
+                op = self.next()[1]
+                operand_kind, operand = self.next()
+                if operand_kind not in ('word', 'quoted'):
+                    self.error(u'expected a value after %s' % op)
+                return Compare(value, op, operand)
+
+        return Match(field, value)
+
+    def parse_distance(self):
+        """Parse `distance(field, geopoint(lat, lon)) < radius`"""
+        self.expect('lparen')
+        field = self.expect('word')
+        self.expect('comma')
+        if self.expect('word') != u'geopoint':
+            self.error(u'expected geopoint')
+        self.expect('lparen')
+        try:
+            lat = float(self.expect('word'))
+            self.expect('comma')
+            lon = float(self.expect('word'))
+            self.expect('rparen')
+            self.expect('rparen')
+            op = self.expect('op')
+            radius = float(self.expect('word'))
+        except ValueError:
+            self.error(u'invalid distance query')
+        return Distance(field, lat, lon, op, radius)
+
+
+class SortedValues(object):
+    """Values of a number or date field across the index, kept sorted so that
+    range queries are a couple of bisects.
+    """
+    def __init__(self):
+        self.keys = []
+        self.doc_ids = []
+
+    def add(self, value, doc_id):
+        i = bisect.bisect_right(self.keys, value)
+        self.keys.insert(i, value)
+        self.doc_ids.insert(i, doc_id)
+
+    def remove(self, value, doc_id):
+        i = bisect.bisect_left(self.keys, value)
+        while i < len(self.keys) and self.keys[i] == value:
+            if self.doc_ids[i] == doc_id:
+                del self.keys[i]
+                del self.doc_ids[i]
+                return
+            i += 1
+
+    def range(self, op, value):
+        if op == '<':
+            return set(self.doc_ids[:bisect.bisect_left(self.keys, value)])
+        if op == '<=':
+            return set(self.doc_ids[:bisect.bisect_right(self.keys, value)])
+        if op == '>':
+            return set(self.doc_ids[bisect.bisect_right(self.keys, value):])
+        if op == '>=':
+            return set(self.doc_ids[bisect.bisect_left(self.keys, value):])
+        return set(self.doc_ids[
+            bisect.bisect_left(self.keys, value):bisect.bisect_right(self.keys, value)
+        ])
+
+
+class MemoryIndex(object):
+    """In-memory equivalent of the Search API's `Index`"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.RLock()
+
+        # doc_id -> Document
+        self._documents = {}
+        # Sorted doc IDs, for `get_range`
+        self._doc_ids = []
+        # field name -> set of kinds (TEXT, ATOM...) it's been indexed as
+        self._field_kinds = {}
+        # doc_id -> field name -> [values], normalized for sorting, etc.
+        self._values = {}
+        # doc_id -> field name -> [[token, ...], ...], for phrase matching
+        self._tokens = {}
+        # Inverted indexes: token -> set of doc IDs, for any text field and per
+        # field, and lowercased atom value -> set of doc IDs per field
+        self._any_postings = {}
+        self._postings = {}
+        self._atoms = {}
+        # field name -> SortedValues for number and date fields
+        self._sorted = {}
+
+    def __repr__(self):
+        return '<MemoryIndex %s (%d documents)>' % (self.name, len(self._documents))
+
+    def _index_document(self, document):
+        doc_id = document.doc_id
+        values = self._values[doc_id] = {}
+        tokens = self._tokens[doc_id] = {}
+
+        for field in document.fields:
+            kind = FIELD_KINDS.get(type(field))
+            if kind is None:
+                continue
+
+            name, value = field.name, field.value
+            self._field_kinds.setdefault(name, set()).add(kind)
+
+            if kind == TEXT:
+                value = value or u''
+                if isinstance(field, search_api.HtmlField):
+                    value = HTML_TAG_REGEX.sub(u' ', value)
+                field_tokens = tokenize(value)
+                tokens.setdefault(name, []).append(field_tokens)
+                postings = self._postings.setdefault(name, {})
+                for token in field_tokens:
+                    postings.setdefault(token, set()).add(doc_id)
+                    self._any_postings.setdefault(token, set()).add(doc_id)
+            elif kind == ATOM:
+                value = value or u''
+                self._atoms.setdefault(name, {}).setdefault(value.lower(), set()).add(doc_id)
+            elif kind == NUMBER:
+                self._sorted.setdefault((name, kind), SortedValues()).add(value, doc_id)
+            elif kind == DATE:
+                value = to_date(value)
+                self._sorted.setdefault((name, kind), SortedValues()).add(value, doc_id)
+
+            values.setdefault(name, []).append(value)
+
+    def _unindex_document(self, document):
+        doc_id = document.doc_id
+
+        for field in document.fields:
+            kind = FIELD_KINDS.get(type(field))
+            if kind is None:
+                continue
+
+            name, value = field.name, field.value
+            if kind == ATOM:
+                ids = self._atoms[name].get((value or u'').lower(), set())
+                ids.discard(doc_id)
+            elif kind in (NUMBER, DATE):
+                if kind == DATE:
+                    value = to_date(value)
+                self._sorted[(name, kind)].remove(value, doc_id)
+
+        for name, token_lists in self._tokens.pop(doc_id).items():
+            for field_tokens in token_lists:
+                for token in field_tokens:
+                    self._postings[name].get(token, set()).discard(doc_id)
+                    self._any_postings.get(token, set()).discard(doc_id)
+
+        del self._values[doc_id]
+
+    def _kinds(self, field):
+        return self._field_kinds.get(field, ())
+
+    def _has_phrase(self, doc_id, field, phrase):
+        """Whether the list of tokens `phrase` appears, in order, in `field` of
+        the given document (or in any of its fields if `field` is None).
+        """
+        doc_tokens = self._tokens.get(doc_id, {})
+        if field is None:
+            token_lists = [t for tls in doc_tokens.values() for t in tls]
+        else:
+            token_lists = doc_tokens.get(field, [])
+
+        size = len(phrase)
+        for field_tokens in token_lists:
+            for i in xrange(len(field_tokens) - size + 1):
+                if field_tokens[i:i + size] == phrase:
+                    return True
+        return False
+
+    def _match_text(self, field, value):
+        postings = self._any_postings if field is None else self._postings.get(field, {})
+        phrase = tokenize(value)
+        if not phrase:
+            return set()
+
+        result = None
+        for token in phrase:
+            ids = postings.get(token, set())
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+
+        if len(phrase) > 1:
+            result = set(i for i in result if self._has_phrase(i, field, phrase))
+        return result
+
+    def _match(self, field, value):
+        if field is None:
+            result = self._match_text(None, value)
+            for atoms in self._atoms.values():
+                result |= atoms.get(value.lower(), set())
+            return result
+        return self._compare(field, '=', value)
+
+    def _compare(self, field, op, value):
+        # A field can be stored as different kinds in different documents, so
+        # each kind is matched on its own terms
+        kinds = self._kinds(field)
+        result = set()
+        for kind in kinds:
+            if kind in (TEXT, ATOM):
+                if op != '=':
+                    raise search_api.QueryError(
+                        u'Cannot use %s on text field %s' % (op, field)
+                    )
+                if kind == TEXT:
+                    result |= self._match_text(field, value)
+                else:
+                    result |= self._atoms[field].get(value.lower(), set())
+                continue
+
+            if kind not in (NUMBER, DATE):
+                continue
+
+            try:
+                converted = float(value) if kind == NUMBER else to_date(value)
+            except ValueError:
+                # Fine if it's text for the documents where the field is text
+                if op == '=' and (TEXT in kinds or ATOM in kinds):
+                    continue
+                raise search_api.QueryError(
+                    u'Invalid value %s for %s field %s' % (value, kind, field)
+                )
+            result |= self._sorted[(field, kind)].range(op, converted)
+        return result
+
+    def _distance(self, field, lat, lon, op, radius):
+        result = set()
+        if GEO not in self._kinds(field):
+            return result
+
+        for doc_id, values in self._values.items():
+            for point in values.get(field, ()):
+                if compare(distance(point, lat, lon), op, radius):
+                    result.add(doc_id)
+                    break
+        return result
+
+    def _sort(self, doc_ids, sort_options):
+        # The Search API's default ordering is by descending rank
+        doc_ids = sorted(doc_ids)
+        doc_ids.sort(key=lambda i: self._documents[i].rank, reverse=True)
+
+        expressions = sort_options.expressions if sort_options else []
+        # Sort by the least significant expression first, relying on the sort
+        # being stable to preserve the order of the previous ones
+        for expr in reversed(expressions):
+            name = expr.expression
+            if name == u'_rank':
+                key = lambda i: self._documents[i].rank
+            elif name in self._field_kinds:
+                def key(i, name=name, default=expr.default_value):
+                    values = self._values[i].get(name)
+                    return values[0] if values else default
+            else:
+                raise search_api.ExpressionError(
+                    u'Unsupported sort expression %s' % name
+                )
+            reverse = expr.direction == search_api.SortExpression.DESCENDING
+            doc_ids.sort(key=key, reverse=reverse)
+        return doc_ids
+
+    def _facet_values(self, doc_id, name):
+        return [f.value for f in self._documents[doc_id].facets if f.name == name]
+
+    def _refine(self, doc_ids, refinements):
+        """Keep the documents matching `refinements`. Refinements for the
+        same facet are ORed together, and those for different ones ANDed.
+        """
+        by_name = {}
+        for refinement in refinements:
+            if isinstance(refinement, basestring):
+                refinement = search_api.FacetRefinement.FromTokenString(refinement)
+            by_name.setdefault(refinement.name, []).append(refinement)
+
+        for name, group in by_name.items():
+            doc_ids = [
+                doc_id for doc_id in doc_ids
+                if any(
+                    facet_matches(value, refinement)
+                    for value in self._facet_values(doc_id, name)
+                    for refinement in group
+                )
+            ]
+        return doc_ids
+
+    def _facets(self, doc_ids, query):
+        requests = [
+            search_api.FacetRequest(r) if isinstance(r, basestring) else r
+            for r in query.return_facets
+        ]
+
+        if query.enable_facet_discovery:
+            options = query.facet_options or search_api.FacetOptions()
+            requested = set(r.name for r in requests)
+            counts = {}
+            for doc_id in doc_ids:
+                for name in set(f.name for f in self._documents[doc_id].facets):
+                    counts[name] = counts.get(name, 0) + 1
+            discovered = sorted(counts, key=lambda name: (-counts[name], name))
+            requests += [
+                search_api.FacetRequest(
+                    name,
+                    value_limit=options.discovery_value_limit or 10
+                )
+                for name in discovered[:options.discovery_limit]
+                if name not in requested
+            ]
+
+        return [self._facet_result(doc_ids, r) for r in requests]
+
+    def _facet_result(self, doc_ids, request):
+        name = request.name
+        values = []
+
+        if request.ranges:
+            for facet_range in request.ranges:
+                count = len([
+                    doc_id for doc_id in doc_ids
+                    if any(
+                        in_range(value, facet_range)
+                        for value in self._facet_values(doc_id, name)
+                    )
+                ])
+                if count:
+                    values.append(search_api.FacetResultValue(
+                        label=range_label(facet_range),
+                        count=count,
+                        refinement=search_api.FacetRefinement(
+                            name,
+                            facet_range=facet_range
+                        )
+                    ))
+        else:
+            counts = {}
+            for doc_id in doc_ids:
+                for value in set(self._facet_values(doc_id, name)):
+                    counts[value] = counts.get(value, 0) + 1
+            if request.values:
+                counts = dict(
+                    (value, count) for value, count in counts.items()
+                    if value in request.values
+                )
+
+            ordered = sorted(counts.items(), key=lambda (v, c): (-c, v))
+            for value, count in ordered[:request.value_limit]:
+                values.append(search_api.FacetResultValue(
+                    label=unicode(value),
+                    count=count,
+                    refinement=search_api.FacetRefinement(name, value=value)
+                ))
+
+        return search_api.FacetResult(name=name, values=values)
+
+    def _snippet(self, doc_id, words, field):
+        values = self._values[doc_id].get(field)
+        if not values or not isinstance(values[0], basestring):
+            return u''
+
+        value = HTML_TAG_REGEX.sub(u'', values[0])
+        words = set(tokenize(words))
+
+        def highlight(match):
+            if match.group(0).lower() in words:
+                return u'<b>%s</b>' % match.group(0)
+            return match.group(0)
+
+        snippet = TOKEN_REGEX.sub(highlight, value)
+        if len(value) > MAX_SNIPPET_LENGTH:
+            return snippet[:MAX_SNIPPET_LENGTH].rsplit(u' ', 1)[0] + u'...'
+        return snippet
+
+    def _expression(self, doc_id, expression):
+        match = SNIPPET_REGEX.match(expression.expression)
+        if match:
+            words, field = match.groups()
+            return search_api.HtmlField(
+                name=expression.name,
+                value=self._snippet(doc_id, words, field)
+            )
+
+        field = expression.expression.strip()
+        for f in self._documents[doc_id].fields:
+            if f.name == field:
+                return type(f)(name=expression.name, value=f.value)
+
+        raise search_api.ExpressionError(
+            u'Unsupported expression %s' % expression.expression
+        )
+
+    def _scored_document(self, doc_id, query, cursor=None):
+        options = query.options
+        document = self._documents[doc_id]
+        fields = []
+        expressions = []
+
+        if not options.ids_only:
+            returned = set(options.returned_fields or ())
+            fields = [
+                f for f in document.fields
+                if not returned or f.name in returned
+            ]
+            for name in options.snippeted_fields or ():
+                words = u' '.join(tokenize(query.query_string))
+                expressions.append(self._expression(doc_id, search_api.FieldExpression(
+                    name=name, expression=u'snippet("%s", %s)' % (words, name)
+                )))
+            for expr in options.returned_expressions or ():
+                expressions.append(self._expression(doc_id, expr))
+
+        return search_api.ScoredDocument(
+            doc_id=doc_id,
+            fields=fields,
+            language=document.language,
+            rank=document.rank,
+            expressions=expressions,
+            cursor=cursor,
+        )
+
+    def _search(self, query):
+        if query.options is None:
+            query = search_api.Query(
+                query_string=query.query_string,
+                options=search_api.QueryOptions()
+            )
+        options = query.options
+        doc_ids = QueryParser(query.query_string).parse().evaluate(self)
+        if query.facet_refinements:
+            doc_ids = self._refine(doc_ids, query.facet_refinements)
+        doc_ids = self._sort(doc_ids, options.sort_options)
+
+        start = options.offset or 0
+        cursor = options.cursor
+        if cursor is not None and cursor.web_safe_string:
+            try:
+                start = int(cursor.web_safe_string.split(u':', 1)[1])
+            except ValueError:
+                raise search_api.QueryError(u'Invalid cursor %s' % cursor.web_safe_string)
+
+        end = start + options.limit
+        results = []
+        for i, doc_id in enumerate(doc_ids[start:end], start + 1):
+            result_cursor = None
+            if cursor is not None and cursor.per_result:
+                result_cursor = search_api.Cursor(web_safe_string=u'True:%d' % i)
+            results.append(self._scored_document(doc_id, query, result_cursor))
+
+        next_cursor = None
+        if cursor is not None and not cursor.per_result and end < len(doc_ids):
+            next_cursor = search_api.Cursor(web_safe_string=u'False:%d' % end)
+
+        return search_api.SearchResults(
+            number_found=len(doc_ids),
+            results=results,
+            cursor=next_cursor,
+            facets=self._facets(doc_ids, query),
+        )
+
+    def put(self, documents, deadline=None):
+        return self.put_async(documents).get_result()
+
+    def put_async(self, documents, deadline=None):
+        if isinstance(documents, search_api.Document):
+            documents = [documents]
+        documents = list(documents)
+
+        if len(documents) > search_api.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST:
+            raise ValueError(
+                'too many documents to index, max is %d' %
+                search_api.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST
+            )
+
+        results = []
+        with self._lock:
+            for document in documents:
+                if document.doc_id is None:
+                    # The Search API assigns IDs to documents that don't
+                    # have one
+                    document = search_api.Document(
+                        doc_id=uuid.uuid4().hex,
+                        fields=document.fields,
+                        language=document.language,
+                        rank=document.rank,
+                        facets=document.facets,
+                    )
+
+                doc_id = document.doc_id
+                if doc_id in self._documents:
+                    self._unindex_document(self._documents[doc_id])
+                else:
+                    bisect.insort(self._doc_ids, doc_id)
+
+                self._documents[doc_id] = document
+                self._index_document(document)
+                results.append(search_api.PutResult(
+                    code=search_api.OperationResult.OK,
+                    id=doc_id
+                ))
+        return Future(lambda: results)
+
+    def get(self, doc_id, deadline=None):
+        return self.get_async(doc_id).get_result()
+
+    def get_async(self, doc_id, deadline=None):
+        with self._lock:
+            return Future(lambda: self._documents.get(doc_id))
+
+    def get_range(self, start_id=None, include_start_object=True, limit=100,
+            ids_only=False, deadline=None, **kwargs):
+        return self.get_range_async(
+            start_id=start_id,
+            include_start_object=include_start_object,
+            limit=limit,
+            ids_only=ids_only
+        ).get_result()
+
+    def get_range_async(self, start_id=None, include_start_object=True,
+            limit=100, ids_only=False, deadline=None, **kwargs):
+        with self._lock:
+            i = 0
+            if start_id:
+                if include_start_object:
+                    i = bisect.bisect_left(self._doc_ids, start_id)
+                else:
+                    i = bisect.bisect_right(self._doc_ids, start_id)
+
+            doc_ids = self._doc_ids[i:i + limit]
+            if ids_only:
+                results = [search_api.Document(doc_id=d) for d in doc_ids]
+            else:
+                results = [self._documents[d] for d in doc_ids]
+        return Future(lambda: search_api.GetResponse(results=results))
+
+    def delete(self, document_ids, deadline=None):
+        return self.delete_async(document_ids).get_result()
+
+    def delete_async(self, document_ids, deadline=None):
+        if isinstance(document_ids, basestring):
+            document_ids = [document_ids]
+
+        results = []
+        with self._lock:
+            for doc_id in document_ids:
+                document = self._documents.pop(doc_id, None)
+                if document is not None:
+                    self._unindex_document(document)
+                    del self._doc_ids[bisect.bisect_left(self._doc_ids, doc_id)]
+                results.append(search_api.DeleteResult(
+                    code=search_api.OperationResult.OK,
+                    id=doc_id
+                ))
+        return Future(lambda: results)
+
+    def search(self, query, deadline=None, **kwargs):
+        return self.search_async(query).get_result()
+
+    def search_async(self, query, deadline=None, **kwargs):
+        if isinstance(query, basestring):
+            query = search_api.Query(query_string=query)
+
+        with self._lock:
+            return Future(self._search, query)
+
+
+class MemoryBackend(Backend):
+    """Backend that keeps every index in memory, in this process. Indexes are
+    shared between all `Index` objects with the same name that use the same
+    `MemoryBackend` instance.
+    """
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, name):
+        with self._lock:
+            if name not in self._indexes:
+                self._indexes[name] = MemoryIndex(name)
+            return self._indexes[name]
+
+    def reset(self):
+        """Throw away all indexes and their documents"""
+        with self._lock:
+            self._indexes.clear()
@@ -0,0 +1,254 @@
+import collections
+import logging
+import sys
+
+from google.appengine.api import search as search_api
+
+from .fingerprints import fingerprint
+
+
+# The Search API won't take more than this many documents in one put call
+MAX_BATCH_SIZE = search_api.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST
+
+# How many put RPCs a `BulkWriter` keeps running at once by default
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+class BatchResult(object):
+    """The outcome of putting one batch of documents. `results` is the list of
+    `search_api.PutResult`s for the batch if it succeeded, `error` is the
+    exception raised if it didn't. `skipped` lists the IDs of documents that
+    weren't sent because they hadn't changed (see `search.fingerprints`).
+    """
+    def __init__(self, doc_ids, results=None, error=None, skipped=None):
+        self.doc_ids = doc_ids
+        self.results = results or []
+        self.error = error
+        self.skipped = skipped or []
+
+    def __repr__(self):
+        return '<BatchResult: %d documents%s, %s>' % (
+            len(self.doc_ids),
+            ' (%d skipped)' % len(self.skipped) if self.skipped else '',
+            'failed with %r' % self.error if self.error else 'ok'
+        )
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BulkWriter(object):
+    """Puts documents to an index in batches of up to `batch_size`, keeping up
+    to `max_in_flight` put RPCs running at once rather than waiting on each
+    batch in turn. Documents are only converted to Search API documents when
+    their batch is sent, so it's fine to feed it from a generator.
+
+    >>> with BulkWriter(index) as writer:
+    ...     for film in Film.objects.all():
+    ...         writer.put(FilmDocument(...))
+    >>> writer.results
+    [<BatchResult: 200 documents, ok>, ...]
+
+    If given, `callback` is called with each `BatchResult` as its RPC finishes.
+    Failed batches are recorded on their `BatchResult` rather than raised,
+    unless `raise_errors` is True.
+
+    If the index has a `fingerprint_store`, documents that are the same as
+    when they were last put are skipped, unless `skip_unchanged` is False.
+    """
+    def __init__(self, index, batch_size=MAX_BATCH_SIZE,
+            max_in_flight=DEFAULT_MAX_IN_FLIGHT, callback=None, raise_errors=False,
+            skip_unchanged=True):
+        if not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(
+                'batch_size must be between 1 and %s' % MAX_BATCH_SIZE
+            )
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1')
+
+        self.index = index
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.callback = callback
+        self.raise_errors = raise_errors
+        self.skip_unchanged = skip_unchanged
+
+        self.results = []
+        self._batch = []
+        self._in_flight = collections.deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            # Don't send any more, but let whatever is already running finish
+            self._batch = []
+            self._wait_all()
+
+    def put(self, document):
+        """Queue `document` to be put to the index"""
+        self._batch.append(document)
+        if len(self._batch) >= self.batch_size:
+            self._send()
+
+    def put_many(self, documents):
+        """Queue every document in the iterable `documents`"""
+        for document in documents:
+            self.put(document)
+
+    def send(self):
+        """Send any queued documents, without waiting for the put"""
+        if self._batch:
+            self._send()
+
+    def flush(self):
+        """Send any queued documents and wait for every running put to
+        finish. Returns the results of all batches sent so far.
+        """
+        self.send()
+        self._wait_all()
+        return self.results
+
+    @property
+    def errors(self):
+        return [r for r in self.results if not r.ok]
+
+    def _send(self):
+        batch, self._batch = self._batch, []
+
+        # Wait for a slot before converting the batch, so that we're never
+        # holding more than `max_in_flight` batches of converted documents
+        while len(self._in_flight) >= self.max_in_flight:
+            self._wait_oldest()
+
+        try:
+            self._start(batch)
+        except Exception:
+            # E.g. a document that couldn't be converted
+            self._raise_after_waiting(sys.exc_info())
+
+    def _start(self, batch):
+        search_docs = [self.index.to_search_document(d) for d in batch]
+        fingerprints, skipped = {}, []
+        if self.skip_unchanged and self.index.fingerprint_store is not None:
+            search_docs, fingerprints, skipped = self._drop_unchanged(
+                batch, search_docs
+            )
+
+        doc_ids = [d.doc_id for d in search_docs]
+        if not search_docs:
+            self._finish(BatchResult(doc_ids, skipped=skipped))
+            return
+
+        try:
+            future = self.index._index.put_async(search_docs)
+        except search_api.Error as e:
+            self._finish(BatchResult(doc_ids, error=e, skipped=skipped))
+        else:
+            self._in_flight.append((doc_ids, future, fingerprints, skipped))
+
+    def _drop_unchanged(self, batch, search_docs):
+        """Split off the documents in `batch` whose fingerprints match the
+        ones stored when they were last put. Returns the Search API documents
+        still to put, their fingerprints by doc ID, and the skipped doc IDs.
+        """
+        fingerprints = {}
+        for document, search_doc in zip(batch, search_docs):
+            # Documents without an ID get a new one from the Search API, so
+            # there's nothing to compare them with
+            if search_doc.doc_id:
+                fingerprints[search_doc.doc_id] = fingerprint(
+                    search_doc,
+                    rank=document._rank
+                )
+
+        stored = self.index.fingerprint_store.get_many(
+            self.index.name,
+            fingerprints.keys()
+        )
+        skipped = [
+            d.doc_id for d in search_docs
+            if d.doc_id in stored and stored[d.doc_id] == fingerprints[d.doc_id]
+        ]
+        for doc_id in skipped:
+            del fingerprints[doc_id]
+
+        unchanged = set(skipped)
+        search_docs = [d for d in search_docs if d.doc_id not in unchanged]
+        return search_docs, fingerprints, skipped
+
+    def _wait_oldest(self):
+        doc_ids, future, fingerprints, skipped = self._in_flight.popleft()
+        try:
+            result = BatchResult(
+                doc_ids,
+                results=future.get_result(),
+                skipped=skipped
+            )
+        except search_api.Error as e:
+            result = BatchResult(doc_ids, error=e, skipped=skipped)
+        except Exception:
+            self._raise_after_waiting(sys.exc_info())
+        self._finish(result, fingerprints)
+
+    def _wait_all(self):
+        while self._in_flight:
+            self._wait_oldest()
+
+    def _raise_after_waiting(self, exc_info):
+        """Wait for every put still running, then raise `exc_info`. Nothing
+        is raised while puts are in flight, since nobody would wait on them
+        after, and behind a pooled index each holds an RPC slot until it's
+        waited on (see `pool.RPCLimiter`). Their results are recorded as
+        usual, but only the first error is raised.
+        """
+        raise_errors, self.raise_errors = self.raise_errors, False
+        try:
+            while self._in_flight:
+                try:
+                    self._wait_oldest()
+                except Exception:
+                    logging.exception(
+                        u'Failed waiting for a put to index %s', self.index.name
+                    )
+        finally:
+            self.raise_errors = raise_errors
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+    def _finish(self, result, fingerprints=None):
+        try:
+            self._record(result, fingerprints)
+        except Exception:
+            self._raise_after_waiting(sys.exc_info())
+
+        if result.error is not None and self.raise_errors:
+            self._raise_after_waiting((type(result.error), result.error, None))
+
+    def _record(self, result, fingerprints):
+        self.results.append(result)
+        if result.doc_ids:
+            # Only once the put's finished, so that nothing fetched and
+            # cached while it ran outlives it. A failed put may still have
+            # written some documents, so they lose their fingerprints
+            self.index._documents_changed(
+                result.doc_ids,
+                fingerprints=fingerprints if result.ok else None
+            )
+
+        self.index._count_put(
+            written=len(result.doc_ids) if result.ok else 0,
+            skipped=len(result.skipped)
+        )
+
+        if result.error is not None:
+            logging.warning(
+                u'Failed to put %d documents to index %s: %s',
+                len(result.doc_ids), self.index.name, result.error
+            )
+
+        if self.callback:
+            self.callback(result)
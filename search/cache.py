@@ -0,0 +1,244 @@
+import collections
+import threading
+import time
+
+
+class MISSING(object):
+    """Returned by caches for keys they don't have a value for (since `None`
+    is a perfectly good value to cache)
+    """
+    pass
+
+
+class LRUCache(object):
+    """A thread-safe, size-bounded, least-recently-used cache. Entries older
+    than `ttl` seconds (if given) are treated as missing.
+
+    As well as holding at most `max_size` entries, the cache can be bounded
+    by `max_bytes`, going by the sizes given to `set`.
+    """
+    def __init__(self, max_size=1000, ttl=None, clock=time.time,
+            max_bytes=None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            try:
+                entry = self._entries.pop(key)
+            except KeyError:
+                return default
+
+            value, expires, size = entry
+            if expires is not None and expires <= self.clock():
+                self.size -= size
+                return default
+
+            # Re-insert to mark it as the most recently used
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, size=0):
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.delete(key)
+            return
+
+        expires = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, expires, size)
+            self.size += size
+            while len(self._entries) > self.max_size or (
+                    self.max_bytes is not None and self.size > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DocumentCache(object):
+    """Caches documents fetched by `Index.get`, including misses, for a single
+    index. Writes through `Index` invalidate the documents they touch.
+    """
+    def __init__(self, max_size=1000, ttl=60):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        # Bumped on every invalidation, so that a fetch which raced with a
+        # write doesn't cache what it fetched
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self, doc_id):
+        """Get the cached Search API document for `doc_id`. Returns `None` if
+        it's cached as not existing, or `MISSING` if it isn't cached.
+        """
+        return self._cache.get(doc_id)
+
+    def set(self, doc_id, document, version=None):
+        """Cache `document` (which can be `None`) for `doc_id`, unless the
+        cache has been invalidated since `version`.
+        """
+        with self._lock:
+            if version is None or version == self._version:
+                self._cache.set(doc_id, document)
+
+    def invalidate(self, doc_ids):
+        with self._lock:
+            self._version += 1
+            for doc_id in doc_ids:
+                self._cache.delete(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._cache.clear()
+
+
+# Document caches by index name. They're per process rather than per `Index`
+# object so that writes through any `Index` invalidate them
+document_caches = {}
+
+
+def enable_document_cache(index_name, max_size=1000, ttl=60):
+    """Cache the documents fetched by `Index.get` from the index named
+    `index_name`, in this process. Returns the `DocumentCache`.
+    """
+    return document_caches.setdefault(
+        index_name,
+        DocumentCache(max_size=max_size, ttl=ttl)
+    )
+
+
+def disable_document_cache(index_name):
+    document_caches.pop(index_name, None)
+
+
+def get_document_cache(index_name):
+    """Get the `DocumentCache` for `index_name`, or `None` if caching isn't
+    enabled for it.
+    """
+    return document_caches.get(index_name)
+
+
+class SearchResultCache(object):
+    """Caches the results of searches run by `SearchQuery` on a single index,
+    keyed by the index's generation (see `get_index_generation`), the query
+    string and the query's options. Bounded by both the number of results
+    cached, `max_size`, and their approximate total size, `max_bytes`.
+    """
+    def __init__(self, max_size=100, max_bytes=1024 * 1024, ttl=60):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl, max_bytes=max_bytes)
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def size(self):
+        return self._cache.size
+
+    def get(self, key):
+        """Get the cached `SearchResults` for `key`, or `MISSING`"""
+        return self._cache.get(key)
+
+    def set(self, key, results):
+        self._cache.set(key, results, size=search_results_size(results))
+
+    def clear(self):
+        self._cache.clear()
+
+
+def search_results_size(results):
+    """Roughly how many bytes the Search API's `results` take up, going by
+    the lengths of their doc IDs, fields and expressions.
+    """
+    size = 0
+    for document in results:
+        size += len(document.doc_id or '')
+        for field in document.fields or ():
+            size += len(field.name) + len(unicode(field.value))
+        for expression in getattr(document, 'expressions', None) or ():
+            size += len(expression.name) + len(unicode(expression.value))
+    return size
+
+
+# Web-safe cursors for the start of pages of search results, by index name,
+# query string, sort order, page size and page number. See `SearchQuery.page`
+page_cursor_cache = LRUCache(max_size=10000, ttl=60 * 60)
+
+
+# Search result caches by index name, see `enable_search_cache`
+search_caches = {}
+
+# How many times each index has been written to in this process, see
+# `get_index_generation`
+index_generations = collections.defaultdict(int)
+index_generations_lock = threading.Lock()
+
+
+def enable_search_cache(index_name, max_size=100, max_bytes=1024 * 1024,
+        ttl=60):
+    """Cache the results of searches on the index named `index_name`, in
+    this process. Returns the `SearchResultCache`.
+
+    Puts and deletes through any `Index` in this process drop all the cached
+    results for its index, but writes from other processes only show up
+    once the results have been cached for `ttl` seconds.
+    """
+    return search_caches.setdefault(
+        index_name,
+        SearchResultCache(max_size=max_size, max_bytes=max_bytes, ttl=ttl)
+    )
+
+
+def disable_search_cache(index_name):
+    search_caches.pop(index_name, None)
+
+
+def get_search_cache(index_name):
+    """Get the `SearchResultCache` for `index_name`, or `None` if caching
+    isn't enabled for it.
+    """
+    return search_caches.get(index_name)
+
+
+def get_index_generation(index_name):
+    """Get the generation of the index named `index_name`. It changes every
+    time anything is written to or deleted from the index in this process, so
+    results cached under an older generation are known to be stale.
+    """
+    return index_generations[index_name]
+
+
+def bump_index_generation(index_name):
+    """Mark the index named `index_name` as changed, dropping any search
+    results cached for it.
+    """
+    with index_generations_lock:
+        index_generations[index_name] += 1
+
+    cache = get_search_cache(index_name)
+    if cache is not None:
+        cache.clear()
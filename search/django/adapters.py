@@ -260,6 +260,13 @@ class SearchQueryAdapter(object):
         else:
             return self._query.__getitem__(s)
 
+    def page(self, number, per_page):
+        """Get page `number` of the results, see `SearchQuery.page`"""
+        clone = self._clone()
+        if not self._is_none:
+            clone._query = self._query.page(number, per_page)
+        return clone
+
     def filter(self, *args, **kwargs):
         args, kwargs = self._transform_filters(*args, **kwargs)
         args = args or []
@@ -278,6 +285,16 @@ class SearchQueryAdapter(object):
     def count(self):
         return 0 if self._is_none else len(self._query)
 
+    def count_accuracy(self, accuracy):
+        clone = self._clone()
+        clone._query = self._query.count_accuracy(accuracy)
+        return clone
+
+    def approximate_count(self):
+        clone = self._clone()
+        clone._query = self._query.approximate_count()
+        return clone
+
     def order_by(self, *fields):
         qs = self._query.order_by(*fields)
         clone = self._clone()
@@ -0,0 +1,56 @@
+from djangae.db import transaction
+
+from ..aliases import Alias, AliasStore, same_alias
+from ..cache import MISSING, LRUCache
+
+from .models import IndexAlias
+
+
+class DjangoAliasStore(AliasStore):
+    """Keeps index aliases in the `IndexAlias` model, so that every instance
+    sees the same ones.
+
+    Aliases are looked up every time a searchable model is saved or
+    searched, so lookups are cached in each process for `cache_ttl` seconds.
+    Any rebuild has to wait that long after `begin_rebuild` before copying
+    documents, so that every process is writing to the new version by then
+    (`search.django.tasks.rebuild_index` does).
+
+    Args:
+        cache_ttl: How long, in seconds, to cache aliases for
+    """
+    def __init__(self, cache_ttl=10):
+        self.cache_ttl = cache_ttl
+        self._cache = LRUCache(ttl=cache_ttl)
+
+    def _to_alias(self, instance):
+        if instance is None:
+            return None
+        return Alias(instance.name, instance.current, instance.next or None)
+
+    def _get(self, name):
+        try:
+            return IndexAlias.objects.get(pk=name)
+        except IndexAlias.DoesNotExist:
+            return None
+
+    def get_alias(self, name):
+        alias = self._cache.get(name)
+        if alias is MISSING:
+            alias = self._to_alias(self._get(name))
+            self._cache.set(name, alias)
+        return alias
+
+    def compare_and_set(self, name, expected, alias):
+        with transaction.atomic():
+            instance = self._get(name)
+            if not same_alias(self._to_alias(instance), expected):
+                return False
+
+            IndexAlias.objects.update_or_create(
+                pk=name,
+                defaults={"current": alias.current, "next": alias.next or ""}
+            )
+
+        self._cache.set(name, alias)
+        return True
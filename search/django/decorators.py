@@ -81,7 +81,9 @@ def searchable(
             subclass must be defined on the model.
         index_name: The name of the search index to add the documents to. It's
             valid for the same object to be added to multiple indexes.
-            Default: lowercase {app_label}_{model_name}.
+            Default: lowercase {app_label}_{model_name}. It's resolved through
+            the index aliases on every save and search, so the index can be
+            rebuilt with `search.django.tasks.rebuild_index`.
         rank: Either:
 
             * The name of a field on the model instance
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.core.cache import caches
+
+from ..fingerprints import FingerprintStore
+
+
+class DjangoCacheFingerprintStore(FingerprintStore):
+    """Keeps document fingerprints in one of Django's caches, so that they're
+    shared between all the instances writing to an index.
+
+    Args:
+        cache_alias: The name of the cache in the `CACHES` setting
+        timeout: How long to keep fingerprints for, in seconds. `None` means
+            forever, if the cache backend allows it
+    """
+    def __init__(self, cache_alias="default", timeout=None):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def make_key(self, index_name, doc_id):
+        # Doc IDs can be longer than memcache allows keys to be
+        key = u"{}:{}".format(index_name, doc_id).encode("utf-8")
+        return "search-fingerprint:{}".format(hashlib.sha1(key).hexdigest())
+
+    def get_many(self, index_name, doc_ids):
+        keys = {self.make_key(index_name, doc_id): doc_id for doc_id in doc_ids}
+        found = self.cache.get_many(keys.keys())
+        return {keys[key]: value for key, value in found.items()}
+
+    def set_many(self, index_name, fingerprints):
+        self.cache.set_many(
+            {
+                self.make_key(index_name, doc_id): value
+                for doc_id, value in fingerprints.items()
+            },
+            timeout=self.timeout
+        )
+
+    def delete_many(self, index_name, doc_ids):
+        self.cache.delete_many(
+            [self.make_key(index_name, doc_id) for doc_id in doc_ids]
+        )
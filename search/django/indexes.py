@@ -1,16 +1,19 @@
 from .registry import registry
-from .utils import get_rank
-
-from ..indexes import Index
+from .utils import get_alias_store, get_index, get_rank
 
 
 def get_index_for_doc(document_cls):
     """Return a search index based on a Document class"""
     parts = document_cls.__module__.split('.')
-    return Index('_'.join([parts[0], parts[2]]))
+    index_name = '_'.join([parts[0], parts[2]])
+    return get_index(get_alias_store().resolve(index_name))
 
 
-def index_instance(instance):
+def index_instance(instance, index_names=None):
+    """Put the document for `instance` to its index. If the index is being
+    rebuilt, it goes to both the current and the new version, unless
+    `index_names` says which physical indexes to put it to.
+    """
     model = type(instance)
     search_meta = registry.get(model)
 
@@ -21,8 +24,11 @@ def index_instance(instance):
             _rank=get_rank(instance, rank=rank)
         )
         doc.build_base(instance)
-        index = Index(index_name)
-        index.put(doc)
+
+        if index_names is None:
+            index_names = get_alias_store().get_write_names(index_name)
+        for name in index_names:
+            get_index(name).put(doc)
 
         return True
 
@@ -34,5 +40,5 @@ def unindex_instance(instance):
     if search_meta:
         index_name = search_meta[0]
 
-        index = Index(index_name)
-        index.delete(str(instance.pk))
+        for name in get_alias_store().get_write_names(index_name):
+            get_index(name).delete(str(instance.pk))
@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class IndexAlias(models.Model):
+    """Where an index name currently points. See `search.aliases`."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    current = models.CharField(max_length=100)
+    next = models.CharField(max_length=100, blank=True, default="")
+
+    def __unicode__(self):
+        return u"{} -> {}".format(self.name, self.current)
@@ -49,9 +49,23 @@ class SearchPaginator(django_paginator.Paginator, IsSearchingMixin):
         assert not self.orphans, "SearchPaginator does not support orphans"
 
         number = self.validate_number(number)
-        bottom = (number - 1) * self.per_page
-        top = bottom + self.per_page
-        self._page = self._get_page(self.object_list[bottom:top], number, self)
+        if self.is_searching():
+            # Reached with cursors, so that deep pages cost the same as the
+            # first one, or by offset for queries too long to run as one
+            # search, e.g. filtering on a long `pk__in` (see
+            # `SearchQuery.page`)
+            try:
+                object_list = self.object_list.page(number, self.per_page)
+            except IndexError:
+                # Paging by offset can't go past the first 1000 results
+                raise django_paginator.EmptyPage(
+                    'That page is further than this search can reach'
+                )
+        else:
+            bottom = (number - 1) * self.per_page
+            top = bottom + self.per_page
+            object_list = self.object_list[bottom:top]
+        self._page = self._get_page(object_list, number, self)
 
         # force evaluation at this point as we need to get the counts from the meta
         self._page.load_objects(lazy=False)
@@ -5,11 +5,14 @@ from google.appengine.ext import deferred
 
 from django.apps import apps
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 from djangae.contrib.mappers.pipes import MapReduceTask
 
+from ..purge import Purger
 from .indexes import get_index_for_doc, index_instance
 from .registry import registry
+from .utils import get_alias_store
 
 
 # We can delete up to 200 search documents in one RPC call.
@@ -19,6 +22,12 @@ DELETE_BATCH_SIZE = 200
 # datatore __in query limit.
 RETRIEVE_BATCH_SIZE = 500
 
+# How many delete RPCs a purge task keeps running at once, and for how many
+# seconds it runs before handing over to the next task (deferred tasks get
+# 10 minutes)
+PURGE_MAX_IN_FLIGHT = 8
+PURGE_TASK_DEADLINE = 8 * 60
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,6 +53,85 @@ class ReindexMapReduceTask(MapReduceTask):
             )
 
 
+class RebuildIndexMapReduceTask(MapReduceTask):
+    """Indexes every instance of a model into the new version of an index
+    that's being rebuilt. Once done, it starts on the next model in the
+    index, and after the last one, points the index's alias at the new
+    version.
+    """
+    target = property(get_deferred_target)
+
+    @staticmethod
+    def map(instance, *args, **kwargs):
+        index_instance(instance, index_names=[kwargs["next_name"]])
+
+    @staticmethod
+    def finish(*args, **kwargs):
+        rebuild_next_model(
+            kwargs["index_name"],
+            kwargs["next_name"],
+            kwargs["model_labels"]
+        )
+
+
+def rebuild_index(index_name):
+    """Rebuild `index_name` into a new version of the index, e.g. after
+    changing its document class, without searches ever seeing an incomplete
+    index. Saves and deletes go to both versions until the rebuild is done,
+    then the alias is swapped over to the new version. The old version is
+    left as it is.
+
+    Returns the name of the new version.
+
+    The aliases have to be shared by every instance, so this needs the
+    `SEARCH_INDEX_ALIASES` setting to be True.
+    """
+    if not getattr(settings, "SEARCH_INDEX_ALIASES", False):
+        raise ImproperlyConfigured(
+            "Rebuilding indexes needs SEARCH_INDEX_ALIASES = True, so that "
+            "every instance sees the rebuild and writes to both versions"
+        )
+
+    store = get_alias_store()
+    next_name = store.begin_rebuild(index_name)
+
+    model_labels = [
+        (model._meta.app_label, model._meta.model_name)
+        for model, (name, _, _) in registry.iteritems()
+        if name == index_name
+    ]
+
+    # Give every instance time to see the new alias, and so to be writing to
+    # both versions, before copying anything over
+    deferred.defer(
+        rebuild_next_model,
+        index_name,
+        next_name,
+        model_labels,
+        _target=get_deferred_target(),
+        _countdown=getattr(store, "cache_ttl", 0),
+    )
+    logger.info(u'Rebuilding index %r into %r', index_name, next_name)
+    return next_name
+
+
+def rebuild_next_model(index_name, next_name, model_labels):
+    if not model_labels:
+        old_name = get_alias_store().finish_rebuild(index_name)
+        logger.info(
+            u'Rebuilt index %r, now %r (was %r)', index_name, next_name, old_name
+        )
+        return
+
+    app_label, model_name = model_labels[0]
+    model = apps.get_model(app_label, model_name)
+    RebuildIndexMapReduceTask(model).start(
+        index_name=index_name,
+        next_name=next_name,
+        model_labels=model_labels[1:],
+    )
+
+
 def get_models_for_actions(app_label, model_name):
     app_label = app_label and app_label.lower()
     model_name = model_name and model_name.lower()
@@ -87,22 +175,34 @@ def batch_delete_docs(index, doc_ids, batch_size=None):
     logger.info(u'Removed doc_ids %r', batch)
 
 
-def purge_index_for_doc(doc_class, batch_size=None):
-    batch_size = batch_size or RETRIEVE_BATCH_SIZE
+def purge_index_for_doc(doc_class, batch_size=None, start_id=None):
+    """Purge the index for `doc_class`, for as long as a task is allowed to
+    run, then defer another task to carry on from the last deleted ID.
+    """
+    batch_size = min(batch_size or DELETE_BATCH_SIZE, DELETE_BATCH_SIZE)
     index = get_index_for_doc(doc_class)
-    doc_ids = index.get_range(limit=batch_size, ids_only=True)
+    purger = Purger(
+        index,
+        batch_size=batch_size,
+        max_in_flight=PURGE_MAX_IN_FLIGHT,
+        start_id=start_id,
+        deadline=PURGE_TASK_DEADLINE,
+    )
+    result = purger.run()
 
-    if doc_ids:
-        target = get_deferred_target()
+    if result.finished:
+        logger.info(u'Purge index %r complete.', index.name)
+    else:
         deferred.defer(
             purge_index_for_doc, doc_class,
             batch_size=batch_size,
-            _target=target,
+            start_id=result.last_id,
+            _target=get_deferred_target(),
+        )
+        logger.info(
+            u'Defer purge %r index after %r (%.0f docs/s).',
+            index.name, result.last_id, result.rate
         )
-        logger.info(u'Defer purge %r index for next batch.', index.name)
-        batch_delete_docs(index, doc_ids)
-    else:
-        logger.info(u'Purge index %r complete.', index.name)
 
 
 def purge_indexes():
@@ -0,0 +1,113 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+from djangae.test import TestCase
+
+from ...aliases import Alias
+
+from .. import utils
+from ..aliases import DjangoAliasStore
+from ..models import IndexAlias
+from ..tasks import rebuild_index
+from ..utils import get_index, get_search_query
+
+from .models import Foo, FooDocument
+
+
+class TestIndexAlias(TestCase):
+
+    def test_unicode(self):
+        alias = IndexAlias.objects.create(name="foo", current="foo_v2")
+        self.assertEqual(u"foo -> foo_v2", unicode(alias))
+        self.assertEqual("", alias.next)
+
+
+class TestDjangoAliasStore(TestCase):
+
+    def test_no_alias(self):
+        store = DjangoAliasStore()
+        self.assertIsNone(store.get_alias("foo"))
+        self.assertEqual("foo", store.resolve("foo"))
+        self.assertEqual(["foo"], store.get_write_names("foo"))
+
+    def test_rebuild(self):
+        store = DjangoAliasStore()
+
+        self.assertEqual("foo_v2", store.begin_rebuild("foo"))
+        instance = IndexAlias.objects.get(pk="foo")
+        self.assertEqual(("foo", "foo_v2"), (instance.current, instance.next))
+        self.assertEqual("foo", store.resolve("foo"))
+        self.assertEqual(["foo", "foo_v2"], store.get_write_names("foo"))
+
+        self.assertEqual("foo", store.finish_rebuild("foo"))
+        instance = IndexAlias.objects.get(pk="foo")
+        self.assertEqual(("foo_v2", ""), (instance.current, instance.next))
+        self.assertEqual("foo_v2", store.resolve("foo"))
+
+    def test_shared_between_stores(self):
+        DjangoAliasStore().begin_rebuild("foo")
+
+        alias = DjangoAliasStore().get_alias("foo")
+        self.assertEqual(("foo", "foo", "foo_v2"), (alias.name, alias.current, alias.next))
+
+    def test_compare_and_set_conflict(self):
+        store = DjangoAliasStore()
+        other = DjangoAliasStore()
+        store.point("foo", "foo_v1")
+
+        # Another instance swaps the alias over after this one has read it
+        expected = store.get_alias("foo")
+        self.assertTrue(
+            other.compare_and_set("foo", other.get_alias("foo"), Alias("foo", "foo_v3"))
+        )
+
+        self.assertFalse(store.compare_and_set("foo", expected, Alias("foo", "foo_v2")))
+        self.assertEqual("foo_v3", IndexAlias.objects.get(pk="foo").current)
+
+    def test_compare_and_set_missing(self):
+        store = DjangoAliasStore()
+        self.assertFalse(
+            store.compare_and_set("foo", Alias("foo", "foo_v1"), Alias("foo", "foo_v2"))
+        )
+        self.assertFalse(IndexAlias.objects.filter(pk="foo").exists())
+
+        self.assertTrue(store.compare_and_set("foo", None, Alias("foo", "foo_v2")))
+        self.assertEqual("foo_v2", IndexAlias.objects.get(pk="foo").current)
+
+
+class TestRebuildIndex(TestCase):
+
+    def setUp(self):
+        super(TestRebuildIndex, self).setUp()
+        utils._django_alias_store = None
+
+    def tearDown(self):
+        utils._django_alias_store = None
+        super(TestRebuildIndex, self).tearDown()
+
+    def test_needs_shared_aliases(self):
+        with override_settings(SEARCH_INDEX_ALIASES=False):
+            self.assertRaises(ImproperlyConfigured, rebuild_index, "django_foo")
+
+    @override_settings(SEARCH_INDEX_ALIASES=True)
+    def test_rebuild(self):
+        Foo.objects.create(name="David")
+        Foo.objects.create(name="Bill")
+
+        next_name = rebuild_index("django_foo")
+        self.assertEqual("django_foo_v2", next_name)
+        self.assertEqual("django_foo_v2", IndexAlias.objects.get(pk="django_foo").next)
+
+        # Deferred to the next model, which maps every instance into the new
+        # version, then finishes the rebuild
+        self.process_task_queues()
+
+        instance = IndexAlias.objects.get(pk="django_foo")
+        self.assertEqual(("django_foo_v2", ""), (instance.current, instance.next))
+
+        new_index = get_index(next_name)
+        self.assertEqual(2, new_index.search(document_class=FooDocument).count())
+
+        query = get_search_query(Foo)
+        self.assertEqual(next_name, query.index.name)
+        self.assertEqual(2, query.count())
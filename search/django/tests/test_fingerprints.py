@@ -0,0 +1,68 @@
+from django.core.cache import caches
+from django.test import override_settings
+
+from djangae.test import TestCase
+
+from ..fingerprints import DjangoCacheFingerprintStore
+
+
+@override_settings(CACHES={
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "fingerprints": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fingerprints",
+    },
+})
+class TestDjangoCacheFingerprintStore(TestCase):
+
+    def setUp(self):
+        super(TestDjangoCacheFingerprintStore, self).setUp()
+        self.store = DjangoCacheFingerprintStore("fingerprints")
+
+    def tearDown(self):
+        caches["default"].clear()
+        caches["fingerprints"].clear()
+        super(TestDjangoCacheFingerprintStore, self).tearDown()
+
+    def test_get_set_delete(self):
+        self.store.set_many("foo", {"1": "aaa", "2": "bbb"})
+        self.assertEqual(
+            {"1": "aaa", "2": "bbb"},
+            self.store.get_many("foo", ["1", "2"])
+        )
+
+        self.store.delete_many("foo", ["1"])
+        self.assertEqual({"2": "bbb"}, self.store.get_many("foo", ["1", "2"]))
+
+    def test_missing(self):
+        self.store.set_many("foo", {"1": "aaa"})
+        self.assertEqual({"1": "aaa"}, self.store.get_many("foo", ["1", "3"]))
+        self.assertEqual({}, self.store.get_many("foo", ["3"]))
+        self.assertEqual({}, self.store.get_many("foo", []))
+
+        # Deleting something that isn't there is fine
+        self.store.delete_many("foo", ["3"])
+
+    def test_keys(self):
+        self.store.set_many("foo", {"1": "aaa"})
+        self.store.set_many("bar", {"1": "bbb"})
+
+        # Indexes have their own fingerprints for the same doc ID
+        self.assertEqual({"1": "aaa"}, self.store.get_many("foo", ["1"]))
+        self.assertEqual({"1": "bbb"}, self.store.get_many("bar", ["1"]))
+
+        key = self.store.make_key("foo", "1")
+        self.assertTrue(key.startswith("search-fingerprint:"))
+        self.assertNotEqual(key, self.store.make_key("bar", "1"))
+        self.assertEqual("aaa", caches["fingerprints"].get(key))
+        self.assertIsNone(caches["default"].get(key))
+
+    def test_long_doc_ids(self):
+        doc_id = u"\u2603" * 500
+        self.store.set_many("foo", {doc_id: "aaa"})
+        self.assertEqual({doc_id: "aaa"}, self.store.get_many("foo", [doc_id]))
+        # Hashed to fit in a memcache key
+        self.assertLess(len(self.store.make_key("foo", doc_id)), 250)
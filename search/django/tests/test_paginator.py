@@ -0,0 +1,69 @@
+from django.core.paginator import EmptyPage
+
+from djangae.test import TestCase
+
+from ...cache import page_cursor_cache
+
+from ..adapters import SearchQueryAdapter
+from ..paginator import SearchPaginator
+from .models import Foo
+
+
+class TestSearchPaginator(TestCase):
+
+    def setUp(self):
+        super(TestSearchPaginator, self).setUp()
+        page_cursor_cache.clear()
+
+    def tearDown(self):
+        page_cursor_cache.clear()
+        super(TestSearchPaginator, self).tearDown()
+
+    def get_names(self, page):
+        return [foo.name for foo in page]
+
+    def test_pages(self):
+        for name in ['Bill', 'David', 'Fred', 'Harry', 'Jane']:
+            Foo.objects.create(name=name)
+
+        search_qs = SearchQueryAdapter.from_queryset(Foo.objects.all()).order_by('name')
+        paginator = SearchPaginator(search_qs, 2)
+
+        self.assertEqual(['Bill', 'David'], self.get_names(paginator.page(1)))
+        self.assertEqual(5, paginator.count)
+        self.assertEqual(['Jane'], self.get_names(paginator.page(3)))
+        self.assertRaises(EmptyPage, paginator.page, 0)
+
+    def test_writes_forget_cursors(self):
+        for name in ['Bill', 'David', 'Fred', 'Harry']:
+            Foo.objects.create(name=name)
+
+        search_qs = SearchQueryAdapter.from_queryset(Foo.objects.all()).order_by('name')
+        paginator = SearchPaginator(search_qs, 2)
+        self.assertEqual(['Bill', 'David'], self.get_names(paginator.page(1)))
+
+        # The cursor remembered for page 2 would skip over David now
+        Foo.objects.create(name='Alice')
+        self.assertEqual(['David', 'Fred'], self.get_names(paginator.page(2)))
+
+    def test_split_query_past_offset_limit(self):
+        search_qs = SearchQueryAdapter.from_queryset(Foo.objects.all()).filter(
+            name=['name%04d' % i for i in range(400)]
+        )
+        paginator = SearchPaginator(search_qs, 10)
+
+        self.assertEqual([], list(paginator.page(1)))
+        # Split queries are paged by offset, which stops at 1000
+        self.assertRaises(EmptyPage, paginator.page, 102)
+
+    def test_none(self):
+        Foo.objects.create(name='Bill')
+        search_qs = SearchQueryAdapter.from_queryset(Foo.objects.all()).none()
+
+        def page(*args, **kwargs):
+            self.fail("Searched for the page of an empty query")
+        search_qs._query.page = page
+
+        paginator = SearchPaginator(search_qs, 10)
+        self.assertEqual([], list(paginator.page(1)))
+        self.assertEqual(0, paginator.count)
@@ -78,6 +78,33 @@ class TestSearchQueryAdapter(TestCase):
 
         self.assertEqual(1, search_qs.count())
 
+    def test_count_accuracy(self):
+        for name in ['Tom', 'John', 'Joan']:
+            Foo.objects.create(name=name)
+
+        search_qs = SearchQueryAdapter.from_queryset(Foo.objects.all())
+        accurate_qs = search_qs.count_accuracy(5000)
+
+        options = accurate_qs._query._build_search_query().options
+        self.assertEqual(5000, options.number_found_accuracy)
+        self.assertEqual(3, accurate_qs.count())
+        # The original is left as it was
+        self.assertEqual(
+            search_qs._query.DEFAULT_COUNT_ACCURACY,
+            search_qs._query._count_accuracy
+        )
+
+    def test_approximate_count(self):
+        for name in ['Tom', 'John', 'Joan']:
+            Foo.objects.create(name=name)
+
+        search_qs = SearchQueryAdapter.from_queryset(Foo.objects.all()).approximate_count()
+
+        # Only an approximate count is asked for
+        options = search_qs._query._build_search_query().options
+        self.assertIsNone(options.number_found_accuracy)
+        self.assertEqual(3, search_qs.count())
+
     @unittest.skip("TODO")
     def test_ordering_copied(self):
         asc_qs = FooWithMeta.objects.order_by('name')
@@ -0,0 +1,58 @@
+import base64
+import pickle
+
+from google.appengine.api import apiproxy_stub_map
+
+from djangae.test import TestCase
+
+from .. import tasks
+from ..indexes import get_index_for_doc
+from .models import FooDocument
+
+
+class TestPurgeIndexForDoc(TestCase):
+
+    def setUp(self):
+        super(TestPurgeIndexForDoc, self).setUp()
+        self.index = get_index_for_doc(FooDocument)
+        self.index.put([
+            FooDocument(doc_id=str(i), name="foo", relation="", tags="")
+            for i in range(5)
+        ])
+        self.deadline = tasks.PURGE_TASK_DEADLINE
+
+    def tearDown(self):
+        tasks.PURGE_TASK_DEADLINE = self.deadline
+        super(TestPurgeIndexForDoc, self).tearDown()
+
+    def get_deferred_calls(self):
+        stub = apiproxy_stub_map.apiproxy.GetStub("taskqueue")
+        return [
+            pickle.loads(base64.b64decode(task["body"]))
+            for task in stub.GetTasks("default")
+        ]
+
+    def test_finishes(self):
+        tasks.purge_index_for_doc(FooDocument, batch_size=2)
+        self.assertEqual([], self.index.get_range(ids_only=True))
+        self.assertEqual([], self.get_deferred_calls())
+
+    def test_requeues_at_deadline(self):
+        # Stop after the first batch, every time
+        tasks.PURGE_TASK_DEADLINE = 0
+
+        doc_ids = self.index.get_range(ids_only=True)
+        tasks.purge_index_for_doc(FooDocument, batch_size=2)
+        self.assertEqual(doc_ids[2:], self.index.get_range(ids_only=True))
+
+        calls = self.get_deferred_calls()
+        self.assertEqual(1, len(calls))
+        fn, args, kwargs = calls[0]
+        self.assertEqual(tasks.purge_index_for_doc, fn)
+        self.assertEqual((FooDocument,), args)
+        self.assertEqual(doc_ids[1], kwargs["start_id"])
+        self.assertEqual(2, kwargs["batch_size"])
+
+        # Each task carries on from where the last one stopped
+        self.process_task_queues()
+        self.assertEqual([], self.index.get_range(ids_only=True))
@@ -10,9 +10,11 @@ except ImportError:
 else:
     HAS_UNIDECODE = True
 
-from .. import fields
-from ..indexes import Index
+from .. import aliases, fields
+from ..pool import pool
 
+from .aliases import DjangoAliasStore
+from .fingerprints import DjangoCacheFingerprintStore
 from .registry import registry
 
 
@@ -223,5 +225,51 @@ def get_search_query(model_class, ids_only=False):
         raise registry.RegisterError(u"This model isn't registered with @searchable")
 
     index_name, document_class, _ = search_meta
-    index = Index(index_name)
+    index = get_index(get_alias_store().resolve(index_name))
     return index.search(document_class=document_class, ids_only=ids_only)
+
+
+def get_index(index_name):
+    """Get the `Index` object for `index_name` from the process-wide pool,
+    rather than building a new one each time.
+
+    If the `SEARCH_MAX_CONCURRENT_RPCS` setting is set, at most that many RPCs
+    will be in flight on the index at once, across all request threads.
+
+    If the `SEARCH_FINGERPRINT_CACHE` setting names one of the `CACHES`,
+    document fingerprints are kept there and puts of documents that haven't
+    changed are skipped.
+    """
+    fingerprint_store = None
+    fingerprint_cache = getattr(settings, "SEARCH_FINGERPRINT_CACHE", None)
+    if fingerprint_cache:
+        fingerprint_store = DjangoCacheFingerprintStore(fingerprint_cache)
+
+    return pool.get(
+        index_name,
+        max_concurrent_rpcs=getattr(settings, "SEARCH_MAX_CONCURRENT_RPCS", None),
+        fingerprint_store=fingerprint_store
+    )
+
+
+_django_alias_store = None
+
+
+def get_alias_store():
+    """Get the store of index aliases that searchable models' index names are
+    resolved through (see `search.aliases`).
+
+    If the `SEARCH_INDEX_ALIASES` setting is True, that's the `IndexAlias`
+    model, so that all instances share the aliases. Otherwise it's the
+    process-wide default store.
+    """
+    global _django_alias_store
+
+    if not getattr(settings, "SEARCH_INDEX_ALIASES", False):
+        return aliases.get_alias_store()
+
+    if _django_alias_store is None:
+        _django_alias_store = DjangoAliasStore(
+            cache_ttl=getattr(settings, "SEARCH_INDEX_ALIAS_CACHE_TTL", 10)
+        )
+    return _django_alias_store
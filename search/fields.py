@@ -65,13 +65,25 @@ class Field(object):
     'some value'
 
     Each Field sub-class must declare what class it uses from the search API by
-    setting the Field.search_api_field attribute.
+    setting the Field.search_api_field attribute. Fields that can be faceted
+    on (see `facet`) also set Field.search_api_facet.
+
+    If `facet` is True, documents are put with a facet for the field's value
+    as well, so that searches can count the documents found by its values
+    (see `search.query.SearchQuery.facets`).
     """
     search_api_field = None
-
-    def __init__(self, default=NOT_SET, null=True):
+    search_api_facet = None
+    facet = False
+
+    def __init__(self, default=NOT_SET, null=True, facet=False):
+        if facet and self.search_api_facet is None:
+            raise FieldError(
+                "%s can't be faceted on" % type(self).__name__
+            )
         self.default = default
         self.null = null
+        self.facet = facet
 
     def none_value(self):
         return None
@@ -101,6 +113,14 @@ class Field(object):
         """Convert the value to its python equivalent"""
         return value
 
+    def to_search_facet(self, value):
+        """Make the Search API facet for `value`, a search value, or return
+        None if there shouldn't be one (e.g. for empty values).
+        """
+        if value is None or value == self.none_value():
+            return None
+        return self.search_api_facet(name=self.name, value=value)
+
     def prep_value_from_search(self, value):
         """Values that come directly from the result of a search may need
         pre-processing before being able to be put through either `to_python`
@@ -123,8 +143,11 @@ class TextField(Field):
     to the search API.
     """
     search_api_field = search_api.TextField
+    search_api_facet = search_api.AtomFacet
 
     def __init__(self, indexer=None, **kwargs):
+        if indexer and kwargs.get('facet'):
+            raise FieldError("Fields with an indexer can't be faceted on")
         self.indexer = indexer
         super(TextField, self).__init__(**kwargs)
 
@@ -146,6 +169,15 @@ class TextField(Field):
 
         return value
 
+    def to_search_facet(self, value):
+        """Values too long to be atoms aren't faceted on, rather than
+        failing the put of the whole batch the document's in.
+        """
+        encoded = value.encode('utf-8') if isinstance(value, unicode) else value
+        if encoded is not None and len(encoded) > search_api.MAXIMUM_FIELD_ATOM_LENGTH:
+            return None
+        return super(TextField, self).to_search_facet(value)
+
     def to_python(self, value):
         if value in (None, 'None', self.none_value()):
             return None
@@ -183,6 +215,7 @@ class AtomField(TextField):
 class FloatField(Field):
     """A field representing a floating point value"""
     search_api_field = search_api.NumberField
+    search_api_facet = search_api.NumberFacet
 
     def __init__(self, minimum=None, maximum=None, **kwargs):
         """If minimum and maximum are given, any value assigned to this field
@@ -223,6 +256,7 @@ class FloatField(Field):
 class IntegerField(Field):
     """A field representing an integer value"""
     search_api_field = search_api.NumberField
+    search_api_facet = search_api.NumberFacet
 
     def __init__(self, minimum=None, maximum=None, **kwargs):
         """If minimum and maximum are given, any value assigned to this field
@@ -263,6 +297,7 @@ class IntegerField(Field):
 class BooleanField(Field):
     """A field representing a True/False value"""
     search_api_field = search_api.NumberField
+    search_api_facet = search_api.NumberFacet
 
     def none_value(self):
         return MIN_SEARCH_API_INT
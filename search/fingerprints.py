@@ -0,0 +1,96 @@
+import hashlib
+
+from google.appengine.api import search as search_api
+
+from .cache import LRUCache
+
+
+def fingerprint(search_document, rank=None):
+    """A stable hash of a Search API document's fields, facets and the `rank`
+    it was given. Two documents with the same fingerprint would be indexed
+    identically.
+
+    The rank is passed separately because the Search API fills in a
+    time-based rank on documents created without one.
+    """
+    digest = hashlib.sha1()
+    digest.update(repr(rank))
+
+    fields = sorted(search_document.fields, key=lambda f: f.name)
+    for field in fields:
+        value = field.value
+        if isinstance(value, search_api.GeoPoint):
+            value = (value.latitude, value.longitude)
+
+        digest.update('\x00'.join([
+            field.name.encode('utf-8'),
+            type(field).__name__,
+            repr(field.language),
+            repr(value),
+        ]))
+        digest.update('\x01')
+
+    # Only mixed in when there are facets, so that documents without any
+    # keep the fingerprints they had before facets were supported
+    facets = sorted(
+        search_document.facets,
+        key=lambda f: (f.name, type(f).__name__, f.value)
+    )
+    for facet in facets:
+        digest.update('\x02'.join([
+            facet.name.encode('utf-8'),
+            type(facet).__name__,
+            repr(facet.value),
+        ]))
+        digest.update('\x03')
+
+    return digest.hexdigest()
+
+
+class FingerprintStore(object):
+    """Base class for stores of document fingerprints, by index name and doc
+    ID. Set one as an `Index`'s `fingerprint_store` to make puts skip
+    documents whose fingerprint hasn't changed since they were last put.
+    """
+    def get_many(self, index_name, doc_ids):
+        """Returns a dict of doc ID to fingerprint, for those of `doc_ids`
+        that have one stored.
+        """
+        raise NotImplementedError()
+
+    def set_many(self, index_name, fingerprints):
+        """Store `fingerprints`, a dict of doc ID to fingerprint"""
+        raise NotImplementedError()
+
+    def delete_many(self, index_name, doc_ids):
+        raise NotImplementedError()
+
+
+class MemoryFingerprintStore(FingerprintStore):
+    """Keeps the fingerprints of the `max_size` most recently put documents
+    in this process.
+
+    Only use this where this process is the only thing writing to the index.
+    Otherwise, a put here could be skipped because it matches what this
+    process last wrote, even though another process has written something
+    different since. Use a shared store instead, e.g.
+    `search.django.fingerprints.DjangoCacheFingerprintStore`.
+    """
+    def __init__(self, max_size=10000, ttl=None):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+
+    def get_many(self, index_name, doc_ids):
+        fingerprints = {}
+        for doc_id in doc_ids:
+            value = self._cache.get((index_name, doc_id), None)
+            if value is not None:
+                fingerprints[doc_id] = value
+        return fingerprints
+
+    def set_many(self, index_name, fingerprints):
+        for doc_id, value in fingerprints.items():
+            self._cache.set((index_name, doc_id), value)
+
+    def delete_many(self, index_name, doc_ids):
+        for doc_id in doc_ids:
+            self._cache.delete((index_name, doc_id))
@@ -0,0 +1,108 @@
+"""Futures for results that are worked out from one or more RPCs.
+
+Like the Search API's own async methods, everything that returns one of these
+starts its RPCs straight away, and `get_result` waits for them. So several
+operations can be started and then waited on together with `wait_all`, taking
+as long as the slowest one rather than the sum of all of them:
+
+>>> futures = [index.search().filter(genre=genre)[:10].fetch_async()
+...     for genre in genres]
+>>> results = wait_all(futures)
+"""
+import sys
+
+
+class Future(object):
+    """Base class for futures whose result is computed once, by `_compute`,
+    the first time it's asked for. Exceptions are raised again on every call
+    to `get_result`.
+    """
+    _done = False
+    _result = None
+    _exc_info = None
+
+    def _compute(self):
+        raise NotImplementedError()
+
+    def done(self):
+        return self._done
+
+    def get_result(self):
+        if not self._done:
+            try:
+                self._result = self._compute()
+            except Exception:
+                self._exc_info = sys.exc_info()
+            self._done = True
+
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class DoneFuture(Future):
+    """A future for a result that's already known, e.g. a cache hit"""
+    def __init__(self, result):
+        self._result = result
+        self._done = True
+
+
+class CallbackFuture(Future):
+    """Future for the result of calling `fn`, for work that's already been
+    started and which `fn` waits for.
+    """
+    def __init__(self, fn):
+        self._fn = fn
+
+    def _compute(self):
+        return self._fn()
+
+
+class MappedFuture(Future):
+    """Future for `fn` applied to the result of `future`"""
+    def __init__(self, future, fn):
+        self._future = future
+        self._fn = fn
+
+    def _compute(self):
+        return self._fn(self._future.get_result())
+
+
+class ResultFuture(Future):
+    """Future for the combined result of several RPCs. `combine` is called
+    with the list of futures when the result is needed.
+    """
+    def __init__(self, combine, futures):
+        self._combine = combine
+        self._futures = futures
+
+    def _compute(self):
+        return self._combine(self._futures)
+
+
+def wait_quietly(future):
+    """Wait for `future` when its result is no longer wanted, e.g. a prefetch
+    left over when iteration stops early, ignoring any error. This lets its
+    RPC finish and give back its slot (see `search.pool`).
+    """
+    try:
+        future.get_result()
+    except Exception:
+        pass
+
+
+def wait_all(futures):
+    """Wait for all of `futures` and return the list of their results. If any
+    of them fail, the first failure is raised once all of them have finished.
+    """
+    futures = list(futures)
+    exc_info = None
+    for future in futures:
+        try:
+            future.get_result()
+        except Exception:
+            exc_info = exc_info or sys.exc_info()
+
+    if exc_info:
+        raise exc_info[0], exc_info[1], exc_info[2]
+    return [future.get_result() for future in futures]
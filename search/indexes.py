@@ -1,16 +1,193 @@
+import threading
+
 from google.appengine.api import search as search_api
 
+from .backends import get_default_backend
+from .bulk import BulkWriter, DEFAULT_MAX_IN_FLIGHT, MAX_BATCH_SIZE
+from .cache import (
+    MISSING,
+    bump_index_generation,
+    get_document_cache,
+    get_index_generation,
+)
 from .errors import DocumentClassRequiredError
 from .fields import Field
+from .futures import CallbackFuture, DoneFuture, MappedFuture, wait_quietly
+from .metrics import MeteredIndex
+from .purge import Purger
 from .query import SearchQuery, construct_document
 
 
+class UNSET(object):
+    """Stored for fields that haven't been given a value"""
+    pass
+
+
+def load_from_source(instance, name, field, position):
+    """Set the value of a field on a lazily constructed document from its
+    search result (see `DocumentModel._from_source`) and return it. Raises
+    AttributeError if the document wasn't constructed lazily, or if the field
+    wasn't fetched with it.
+    """
+    source = getattr(instance, '_source', None)
+    if source is None or not source.was_fetched(name):
+        raise AttributeError(name)
+
+    value = source.values.get(name, UNSET)
+    value = None if value is UNSET else field.prep_value_from_search(value)
+    value = instance._values[position] = field.to_search_value(value)
+    return value
+
+
+class FieldDescriptor(object):
+    """Installed on document classes in place of each of their fields. Values
+    are stored in the instance's `_values` list, at the field's `position`,
+    converted to their search values. They're converted back to Python the
+    first time they're read, and cached in `_python_values` until the next
+    time they're set. Documents constructed lazily from search results load
+    each value from the result the first time it's read.
+    """
+    __slots__ = ('field', 'name', 'position')
+
+    def __init__(self, field, name, position):
+        self.field = field
+        self.name = name
+        self.position = position
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            raise AttributeError(
+                "type object '%s' has no attribute '%s'" % (owner.__name__, self.name)
+            )
+
+        position = self.position
+        python_values = instance._python_values
+        if position >= len(python_values):
+            # The field was added to the class after this instance was made
+            raise AttributeError(self.name)
+
+        value = python_values[position]
+        if value is UNSET:
+            value = instance._values[position]
+            if value is UNSET:
+                value = load_from_source(instance, self.name, self.field, position)
+            value = python_values[position] = self.field.to_python(value)
+        return value
+
+    def __set__(self, instance, value):
+        value = self.field.to_search_value(value)
+
+        position = self.position
+        values = instance._values
+        if position >= len(values):
+            padding = [UNSET] * (position + 1 - len(values))
+            values.extend(padding)
+            instance._python_values.extend(padding)
+
+        values[position] = value
+        instance._python_values[position] = UNSET
+
+    def __delete__(self, instance):
+        if self.position < len(instance._values):
+            instance._values[self.position] = UNSET
+            instance._python_values[self.position] = UNSET
+
+
+def compile_serializer(meta, trusted=True):
+    """Build a function that converts an instance of the document class with
+    options `meta` into a Search API document.
+
+    Everything that's the same for every document (the field classes and
+    conversion methods) is looked up once, here, rather than per document.
+    Field values are stored on documents already converted to search values
+    (see `FieldDescriptor`), so if `trusted` is True they're put to the
+    index as they are. Otherwise they're converted back to Python and to
+    search values again, which is what happens when a document class
+    overrides how its attributes are read.
+
+    Fields declared with `facet=True` are put as facets too.
+    """
+    specs = [
+        (position, name, field, field.search_api_field, field.to_python,
+            field.to_search_value, field.to_search_facet if field.facet else None)
+        for position, (name, field) in enumerate(
+            (name, meta.fields[name]) for name in meta.field_names
+        )
+    ]
+    make_document = search_api.Document
+
+    def serialize(document):
+        values = document._values
+        count = len(values)
+        lazy = getattr(document, '_source', None) is not None
+        api_fields = []
+        append = api_fields.append
+        facets = []
+
+        for (position, name, field, api_field, to_python, to_search_value,
+                to_search_facet) in specs:
+            value = values[position] if position < count else UNSET
+            if value is UNSET:
+                if lazy and position < count:
+                    try:
+                        value = load_from_source(document, name, field, position)
+                    except AttributeError:
+                        # Not fetched with the document
+                        pass
+                if value is UNSET:
+                    value = to_search_value(None)
+            elif not trusted:
+                value = to_search_value(to_python(value))
+            append(api_field(name=name, value=value))
+
+            if to_search_facet is not None:
+                facet = to_search_facet(value)
+                if facet is not None:
+                    facets.append(facet)
+
+        return make_document(
+            doc_id=document.doc_id,
+            rank=document._rank,
+            fields=api_fields,
+            facets=facets
+        )
+
+    return serialize
+
+
 class Options(object):
     """Similar to Django's Options class, holds metadata about a class with
     `__metaclass__ = MetaClass`.
     """
-    def __init__(self, fields):
-        self.fields = fields
+    def __init__(self, cls, fields, trusted=True):
+        self.cls = cls
+        self.fields = {}
+        # Field names in the order their values are stored in
+        self.field_names = []
+        self.trusted = trusted
+        self._serializer = None
+
+        for name, field in fields.items():
+            self.add_field(name, field)
+
+    def add_field(self, name, field):
+        """Add a field to the class, which can be done after it's created"""
+        if name not in self.fields:
+            self.field_names.append(name)
+        self.fields[name] = field
+
+        position = self.field_names.index(name)
+        setattr(self.cls, name, FieldDescriptor(field, name, position))
+        self._serializer = None
+
+    @property
+    def serializer(self):
+        """The function that converts instances of the class into Search API
+        documents, see `compile_serializer`.
+        """
+        if self._serializer is None:
+            self._serializer = compile_serializer(self, self.trusted)
+        return self._serializer
 
 
 class MetaClass(type):
@@ -29,8 +206,14 @@ class MetaClass(type):
     AttributeError: type object 'Thing' has no attribute 'prop'
     >>> Thing._meta.fields['prop']
     <search.Field object at 0xXXXXXXXX>
+
+    Fields are replaced on the class by `FieldDescriptor`s.
     """
     def __new__(cls, name, bases, dct):
+        meta = dct.get('Meta')
+        if getattr(meta, 'slots', False):
+            dct.setdefault('__slots__', ())
+
         new_cls = super(MetaClass, cls).__new__(cls, name, bases, dct)
 
         fields = {}
@@ -57,20 +240,52 @@ class MetaClass(type):
             if isinstance(field, Field):
                 field.add_to_class(new_cls, name)
                 fields[name] = field
-                delattr(new_cls, name)
 
-        new_cls._meta = Options(fields)
+        # Stored values can only be put as they are if reading them back
+        # goes through the field descriptors as normal
+        trusted = new_cls.__getattribute__ is object.__getattribute__
+
+        # Every class gets its own descriptors, since the positions of
+        # inherited fields can differ from the parent's
+        new_cls._meta = Options(new_cls, fields, trusted=trusted)
         return new_cls
 
 
 class DocumentModel(object):
-    """Base class for documents added to search indexes"""
+    """Base class for documents added to search indexes.
+
+    Field values are kept in a list on each instance rather than in its
+    `__dict__`. Document classes can go without a `__dict__` altogether,
+    which makes e.g. a page of 1000 search results a lot smaller, by
+    declaring:
+
+    >>> class FilmDocument(search.Document):
+    ...     class Meta:
+    ...         slots = True
+
+    Instances of such classes can't have any attributes set on them other
+    than their fields. Every class they inherit from needs to do the same
+    (or declare `__slots__` itself) for it to make a difference.
+    """
 
     __metaclass__ = MetaClass
+    __slots__ = (
+        'doc_id',
+        '_rank',
+        '_values',
+        '_python_values',
+        '_snippets',
+        '_snippets_or_values',
+        '_source',
+    )
 
     def __init__(self, **kwargs):
+        field_count = len(self._meta.field_names)
+        self._values = [UNSET] * field_count
+        self._python_values = [UNSET] * field_count
+
         # No fancy Django `*args` mangling here, just use `**kwargs`
-        for name, field in self._meta.fields.items():
+        for name in self._meta.field_names:
             val = kwargs.pop(name, None)
             setattr(self, name, val)
 
@@ -79,27 +294,53 @@ class DocumentModel(object):
         # define a nicer API for setting the value
         self._rank = kwargs.get("_rank")
 
-    def __getattribute__(self, name):
-        """Make sure that any attribute accessed on document classes returns the
-        python representation of its value.
+    @classmethod
+    def _from_source(cls, doc_id, source):
+        """Make an instance whose field values are only read from `source`,
+        a `query.SearchResultSource`, when they're first accessed. It doesn't
+        go through `__init__`.
         """
-        # TODO: Probably use `Field`s as descriptors and leave this to them
-        val = object.__getattribute__(self, name)
-        meta = object.__getattribute__(self, '_meta')
-        if name in meta.fields:
-            f = meta.fields[name]
-            val = f.to_python(val)
-        return val
-
-    def __setattr__(self, name, val):
-        """Make sure that any attibutes set on document class instances get the
-        value converted to the search API accepted value.
+        document = cls.__new__(cls)
+        field_count = len(cls._meta.field_names)
+        document._values = [UNSET] * field_count
+        document._python_values = [UNSET] * field_count
+        document._source = source
+        document.doc_id = doc_id
+        document._rank = None
+        return document
+
+    def __getstate__(self):
+        """Pickle the slot values (and `__dict__`, if there is one), since
+        pickle can't with protocols 0 and 1. Lazily constructed documents
+        load all their fetched values and snippets first, and are pickled
+        without their search result.
         """
-        # TODO: Probably use `Field`s as descriptors and leave this to them
-        if name in self._meta.fields:
-            f = self._meta.fields[name]
-            val = f.to_search_value(val)
-        super(DocumentModel, self).__setattr__(name, val)
+        source = getattr(self, '_source', None)
+        if source is not None:
+            for position, name in enumerate(self._meta.field_names):
+                if self._values[position] is UNSET:
+                    try:
+                        load_from_source(self, name, self._meta.fields[name], position)
+                    except AttributeError:
+                        # Not fetched with the document
+                        pass
+
+        state = dict(getattr(self, '__dict__', ()))
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__') and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        if source is not None:
+            del state['_source']
+            state['_snippets'] = source.snippets
+        # Converted back to Python when they're next read
+        state.pop('_python_values', None)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        self._python_values = [UNSET] * len(self._values)
 
     def get_snippets(self):
         """Get the snippets for this document as a dictionary of the form:
@@ -109,7 +350,11 @@ class DocumentModel(object):
         Returns an empty dict if this document hasn't been returned as part of
         a search query (since it can only be populated then.)
         """
-        return {}
+        snippets = getattr(self, '_snippets', None)
+        if snippets is None:
+            source = getattr(self, '_source', None)
+            snippets = source.snippets if source is not None else {}
+        return snippets
 
     def snippet_or_value(self):
         """Goes through each of this document's snippeted fields and constructs
@@ -129,8 +374,17 @@ class DocumentModel(object):
 class Index(object):
     """A search index. Provides methods for adding, removing and searching
     documents in this index.
+
+    The index lives in `backend` (see `search.backends`), which defaults to
+    the App Engine Search API.
+
+    If it's given a `fingerprint_store` (see `search.fingerprints`), puts skip
+    documents that haven't changed since they were last put. The numbers of
+    documents written and skipped are counted in `documents_written` and
+    `documents_skipped`.
     """
-    def __init__(self, name=None, document_class=None):
+    def __init__(self, name=None, document_class=None, backend=None,
+            fingerprint_store=None):
         # Mandatory keyword argument... right. Mainly for compatibility with
         # the Search API's `Index` class
         if not name:
@@ -141,9 +395,23 @@ class Index(object):
 
         self.name = name
         self.document_class = document_class
-
-        # The actual index object from the Search API
-        self._index = search_api.Index(name=name)
+        self.backend = backend or get_default_backend()
+        self.fingerprint_store = fingerprint_store
+        self.documents_written = 0
+        self.documents_skipped = 0
+        # Pooled indexes are shared by every thread putting to them
+        self._counts_lock = threading.Lock()
+
+        # The actual index object from the backend, by default the Search
+        # API, with its RPCs measured by any hooks in `search.metrics`
+        self._index = MeteredIndex(self.backend.get_index(name), name)
+
+    @property
+    def generation(self):
+        """Changes whenever documents are put to or deleted from this index
+        in this process. See `search.cache.get_index_generation`.
+        """
+        return get_index_generation(self.name)
 
     def list_documents(self, **kwargs):
         """Deprecated. Use `get_range` instead"""
@@ -181,73 +449,217 @@ class Index(object):
             return [construct_document(document_class, doc) for doc in docs]
         return docs
 
+    def iter_documents(self, document_class=None, page_size=100,
+            ids_only=False, start_id=None):
+        """Iterate over every document in this index, in order of doc ID,
+        fetching `page_size` documents at a time. The next page is requested
+        before the current one is handed out, so it's on its way while the
+        caller works through this one, and no more than two pages are ever
+        held in memory.
+
+        Like `get_range`, yields instances of `document_class`, or plain
+        Search API documents if there isn't one, or just doc IDs if
+        `ids_only` is True. If `start_id` is given, iteration starts with
+        the document after it.
+        """
+        document_class = document_class or self.document_class
+
+        def fetch_page(start_id=None):
+            return self._index.get_range_async(
+                start_id=start_id,
+                include_start_object=False,
+                limit=page_size,
+                ids_only=ids_only
+            )
+
+        next_page = fetch_page(start_id)
+        try:
+            while next_page is not None:
+                docs = next_page.get_result()
+
+                # A short page means there's nothing after it
+                next_page = None
+                if len(docs) == page_size:
+                    next_page = fetch_page(docs[len(docs) - 1].doc_id)
+
+                for doc in docs:
+                    if ids_only:
+                        yield doc.doc_id
+                    elif document_class:
+                        yield construct_document(document_class, doc)
+                    else:
+                        yield doc
+        finally:
+            # If the caller stopped early, don't leave the next page's RPC
+            # holding on to a slot
+            if next_page is not None:
+                wait_quietly(next_page)
+
     def get(self, doc_id, document_class=None):
         """Get a document from this index by its ID. It'll be returned as an
         instance of the given `document_class`. Returns `None` if there's no
         document by that ID.
+
+        If a document cache is enabled for this index (see `search.cache`),
+        it's checked first, and whatever is fetched is cached.
         """
-        doc = self._index.get(doc_id)
+        return self.get_async(doc_id, document_class).get_result()
+
+    def get_async(self, doc_id, document_class=None):
+        """Like `get`, but returns a future for the document"""
+        return MappedFuture(
+            self._get_document_async(doc_id),
+            lambda doc: self._construct(doc, document_class)
+        )
+
+    def _get_document_async(self, doc_id):
+        """Get a future for the Search API document with `doc_id` (or `None`),
+        going through the document cache if there is one.
+        """
+        cache = get_document_cache(self.name)
+        version = None
+        if cache is not None:
+            doc = cache.get(doc_id)
+            if doc is not MISSING:
+                return DoneFuture(doc)
+            version = cache.version
+
+        future = self._index.get_async(doc_id)
+        if cache is None:
+            return future
+
+        def cache_document(doc):
+            cache.set(doc_id, doc, version=version)
+            return doc
+        return MappedFuture(future, cache_document)
+
+    def _construct(self, doc, document_class=None):
         document_class = document_class or self.document_class
         if doc and document_class:
             return construct_document(document_class, doc)
         return doc
 
-    def put(self, documents):
-        """Add `documents` to this index"""
-
-        def get_fields(doc):
-            """Convenience function for getting the search API fields list
-            from the given document `d`.
-            """
-            api_fields = []
-
-            for name, field in doc._meta.fields.items():
-                value = field.to_search_value(getattr(doc, name, None))
-                api_field = field.search_api_field(name=name, value=value)
-                api_fields.append(api_field)
+    def to_search_document(self, document):
+        """Convert `document`, a `DocumentModel` instance, to the Search API
+        document that gets put to the underlying index.
+        """
+        return document._meta.serializer(document)
 
-            return api_fields
+    def put(self, documents, skip_unchanged=True):
+        """Add `documents` to this index. Returns a list of the Search API's
+        `PutResult`s, one per document written.
 
+        If this index has a fingerprint store, documents which haven't changed
+        since they were last put aren't written (and get no `PutResult`),
+        unless `skip_unchanged` is False.
+        """
+        return self.put_async(documents, skip_unchanged=skip_unchanged).get_result()
 
+    def put_async(self, documents, skip_unchanged=True):
+        """Like `put`, but returns a future for the list of `PutResult`s"""
         # If documents is actually just a single document, stick it in a list
-        try:
-            len(documents)
-        except TypeError:
+        if isinstance(documents, DocumentModel):
             documents = [documents]
 
-        # Construct the actual search API documents to add to the underlying
-        # search API index
-        search_docs = [
-            search_api.Document(
-                doc_id=d.doc_id,
-                rank=d._rank,
-                fields=get_fields(d)
-            )
-            for d in documents
-        ]
-        return self._index.put(search_docs)
+        # Anything over the Search API's limit for a single put gets split
+        # into several batches, which are sent concurrently
+        writer = BulkWriter(
+            self,
+            raise_errors=True,
+            skip_unchanged=skip_unchanged
+        )
+        writer.put_many(documents)
+        writer.send()
+        return CallbackFuture(
+            lambda: [r for batch in writer.flush() for r in batch.results]
+        )
 
-    def delete(self, doc_ids):
-        """Delete documents with the given `doc_ids` from this index"""
-        return self._index.delete(doc_ids)
+    def bulk_put(self, documents, batch_size=MAX_BATCH_SIZE,
+            max_in_flight=DEFAULT_MAX_IN_FLIGHT, callback=None,
+            skip_unchanged=True):
+        """Put an iterable (e.g. a generator) of any number of documents to
+        this index, in batches of `batch_size`, keeping up to `max_in_flight`
+        put RPCs running at once. See `search.bulk.BulkWriter`.
 
-    def purge(self):
-        """Deletes all documents from this index.
+        Returns a list of `search.bulk.BatchResult`s, one for each batch.
+        Failed batches don't stop the rest being sent, so check them for
+        errors.
+        """
+        writer = BulkWriter(
+            self,
+            batch_size=batch_size,
+            max_in_flight=max_in_flight,
+            callback=callback,
+            skip_unchanged=skip_unchanged
+        )
+        writer.put_many(documents)
+        return writer.flush()
 
-        Probably don't use this on production unless the index only holds
-        a really small number of documents. Use App Engine's tasks to delete
-        documents in batches instead.
+    def delete(self, doc_ids):
+        """Delete documents with the given `doc_ids` from this index"""
+        return self.delete_async(doc_ids).get_result()
+
+    def delete_async(self, doc_ids):
+        """Like `delete`, but returns a future to wait on"""
+        if isinstance(doc_ids, basestring):
+            doc_ids = [doc_ids]
+        self._documents_changed(doc_ids)
+        future = self._index.delete_async(doc_ids)
+
+        def wait():
+            try:
+                return future.get_result()
+            finally:
+                # Again, in case anything was fetched and cached while the
+                # delete ran
+                self._documents_changed(doc_ids)
+        return CallbackFuture(wait)
+
+    def _documents_changed(self, doc_ids, fingerprints=None):
+        """Called with the IDs of documents about to be, or just, written to
+        or deleted from this index, so that anything cached about them can be
+        dropped. `fingerprints`, by doc ID, are stored for any of them that
+        were just put, and the rest lose theirs.
         """
-        doc_ids = self.get_range(ids_only=True)
-        while doc_ids:
-            self.delete(doc_ids)
-            doc_ids = self.get_range(
-                ids_only=True,
-                start_id=doc_ids[-1],
-                include_start_object=False
-            )
+        doc_ids = [doc_id for doc_id in doc_ids if doc_id]
+        bump_index_generation(self.name)
+
+        cache = get_document_cache(self.name)
+        if cache is not None:
+            cache.invalidate(doc_ids)
+
+        if self.fingerprint_store is not None:
+            fingerprints = fingerprints or {}
+            if fingerprints:
+                self.fingerprint_store.set_many(self.name, fingerprints)
+            stale = [doc_id for doc_id in doc_ids if doc_id not in fingerprints]
+            if stale:
+                self.fingerprint_store.delete_many(self.name, stale)
+
+    def _count_put(self, written, skipped):
+        with self._counts_lock:
+            self.documents_written += written
+            self.documents_skipped += skipped
+
+    def purge(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, start_id=None,
+            checkpoint=None):
+        """Deletes all documents from this index, keeping up to
+        `max_in_flight` delete RPCs running while the next doc IDs are
+        listed. See `search.purge.Purger` for resuming from `start_id` and
+        `checkpoint`. Returns a `search.purge.PurgeResult`.
+
+        This still runs in the one request, so for really big indexes use
+        App Engine's tasks instead (see `search.django.tasks.purge_indexes`).
+        """
+        purger = Purger(
+            self,
+            max_in_flight=max_in_flight,
+            start_id=start_id,
+            checkpoint=checkpoint
+        )
+        return purger.run()
 
-    def search(self, document_class=None, ids_only=False):
+    def search(self, document_class=None, ids_only=False, lazy=False):
         """Initialise the search query for this index and document class"""
         document_class = document_class or self.document_class
         if not document_class:
@@ -260,5 +672,6 @@ class Index(object):
         return SearchQuery(
             self._index,
             document_class=document_class,
-            ids_only=ids_only
+            ids_only=ids_only,
+            lazy=lazy
         )
@@ -0,0 +1,76 @@
+from .query import construct_document
+
+
+class PendingDocument(object):
+    """Handle for a document requested from a `DocumentLoader`. Calling
+    `get_result` fetches it, along with everything else queued on the loader.
+    """
+    def __init__(self, loader, doc_id):
+        self.loader = loader
+        self.doc_id = doc_id
+
+    def get_result(self):
+        return self.loader.get(self.doc_id)
+
+
+class DocumentLoader(object):
+    """Collects the documents wanted from an index over the course of a
+    request and fetches them together, with all the RPCs in flight at once,
+    instead of one blocking `Index.get` after another. Documents are only
+    fetched once per loader, and go through the index's document cache if
+    it has one.
+
+    >>> loader = DocumentLoader(index, FilmDocument)
+    >>> die_hard = loader.load('die-hard')
+    >>> alien = loader.load('alien')
+    >>> die_hard.get_result()  # Fetches both
+    <FilmDocument object at 0xXXXXXXXXXX>
+    >>> alien.get_result()  # Already fetched
+    <FilmDocument object at 0xXXXXXXXXXX>
+
+    Like `Index.get`, documents that don't exist come back as `None`.
+    """
+    def __init__(self, index, document_class=None):
+        self.index = index
+        self.document_class = document_class or index.document_class
+        self._queued = []
+        # doc_id -> Search API document, or None if it doesn't exist
+        self._documents = {}
+
+    def load(self, doc_id):
+        """Queue `doc_id` to be fetched with the next batch"""
+        if doc_id not in self._documents and doc_id not in self._queued:
+            self._queued.append(doc_id)
+        return PendingDocument(self, doc_id)
+
+    def load_many(self, doc_ids):
+        return [self.load(doc_id) for doc_id in doc_ids]
+
+    def get(self, doc_id):
+        """Get the document for `doc_id`, fetching anything queued first"""
+        self.load(doc_id)
+        self.dispatch()
+        return self._construct(self._documents[doc_id])
+
+    def get_many(self, doc_ids):
+        """Get a list of the documents for `doc_ids`, fetching them together"""
+        self.load_many(doc_ids)
+        self.dispatch()
+        return [self._construct(self._documents[doc_id]) for doc_id in doc_ids]
+
+    def dispatch(self):
+        """Fetch all queued documents, starting every RPC before waiting on
+        any of them.
+        """
+        queued, self._queued = self._queued, []
+        futures = [
+            (doc_id, self.index._get_document_async(doc_id))
+            for doc_id in queued
+        ]
+        for doc_id, future in futures:
+            self._documents[doc_id] = future.get_result()
+
+    def _construct(self, document):
+        if document is not None and self.document_class:
+            return construct_document(self.document_class, document)
+        return document
@@ -0,0 +1,221 @@
+import collections
+import functools
+import heapq
+import re
+
+from google.appengine.api import search as search_api
+
+
+# The most results the Search API returns from one search call
+MAX_RESULTS_PER_SEARCH = search_api.MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH
+
+# Merging results means reading the values sorted on from the documents, so
+# only field names (and `_rank`) can be sorted on
+FIELD_NAME_REGEX = re.compile(r'^(_rank|[A-Za-z][A-Za-z0-9_]*)$')
+
+
+@functools.total_ordering
+class Descending(object):
+    """Wraps a sort key so that it sorts in reverse"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def merge_facets(search_facets):
+    """Merge the facet results from each search, adding up the counts for
+    each value. Values are ordered by their total count (then label), but
+    as each search only counts its own most common values, the totals for
+    less common values can be low.
+    """
+    facets = collections.OrderedDict()
+    for results in search_facets:
+        for result in results:
+            values = facets.setdefault(result.name, collections.OrderedDict())
+            for value in result.values:
+                label, count, token = values.get(
+                    value.label, (value.label, 0, value.refinement_token)
+                )
+                values[value.label] = (label, count + value.count, token)
+
+    return [
+        search_api.FacetResult(name=name, values=[
+            search_api.FacetResultValue(
+                label=label,
+                count=count,
+                refinement=search_api.FacetRefinement.FromTokenString(token)
+            )
+            for label, count, token in sorted(
+                values.values(), key=lambda value: (-value[1], value[0])
+            )
+        ])
+        for name, values in facets.items()
+    ]
+
+
+class MergedSearch(object):
+    """Runs several searches at once, each a `(backend index, query string)`
+    pair with the options of `query`, then merges their results as if they
+    came from one search.
+
+    Every document the merged search could return at offset `o` with limit
+    `l` is in the first `o + l` results of a search that finds it, so each
+    search is asked for that many, starting from 0. The results are then
+    merged by the query's sort expressions (or by rank if it has none),
+    dropping any document that's already been found by another search, and
+    the merged list is sliced at `o` and `o + l`. `number_found` is the sum
+    of the searches' counts.
+
+    The Search API only returns up to 1000 results per call, so beyond
+    that, the searches are paged through with cursors. Cursors can't be used
+    with the merged results, so queries with a cursor are rejected.
+    """
+    def __init__(self, searches, query):
+        options = query.options or search_api.QueryOptions()
+        if options.cursor is not None:
+            raise ValueError(
+                "Cursors can't be used with the merged results of %s"
+                % self.describe()
+            )
+
+        self.searches = searches
+        self.query = query
+        self.options = options
+        self.offset = options.offset or 0
+        self.limit = options.limit
+
+        sort_options = options.sort_options
+        self.sorts = list(sort_options.expressions) if sort_options else []
+        self.match_scorer = sort_options and sort_options.match_scorer
+        for sort in self.sorts:
+            if not FIELD_NAME_REGEX.match(sort.expression):
+                raise ValueError(
+                    "The merged results of %s can only be sorted by field "
+                    "names, not %r" % (self.describe(), sort.expression)
+                )
+
+    def describe(self):
+        """What's being merged, for error messages"""
+        return "several searches"
+
+    def start(self):
+        wanted = self.offset + self.limit
+        # Only ask for a cursor if the searches will need paging through
+        cursor = search_api.Cursor() if wanted > MAX_RESULTS_PER_SEARCH else None
+        self._futures = [
+            self._search(index, query_string, min(wanted, MAX_RESULTS_PER_SEARCH), cursor)
+            for index, query_string in self.searches
+        ]
+        return self
+
+    def _search(self, index, query_string, limit, cursor):
+        options = self.options
+        ids_only = options.ids_only
+        returned_fields = list(options.returned_fields)
+
+        # The values being sorted on are needed to merge the results. IDs
+        # only queries can't ask for fields, so ask for just those instead
+        sort_fields = [s.expression for s in self.sorts if s.expression != '_rank']
+        if sort_fields and (ids_only or returned_fields):
+            ids_only = False
+            returned_fields += [f for f in sort_fields if f not in returned_fields]
+
+        search_options = search_api.QueryOptions(
+            limit=limit,
+            number_found_accuracy=options.number_found_accuracy,
+            cursor=cursor,
+            sort_options=options.sort_options,
+            returned_fields=returned_fields,
+            ids_only=ids_only,
+            snippeted_fields=options.snippeted_fields,
+            returned_expressions=options.returned_expressions
+        )
+        search_query = search_api.Query(
+            query_string=query_string,
+            options=search_options,
+            enable_facet_discovery=self.query.enable_facet_discovery,
+            return_facets=self.query.return_facets,
+            facet_options=self.query.facet_options,
+            facet_refinements=self.query.facet_refinements
+        )
+        return index.search_async(search_query)
+
+    def get_result(self):
+        wanted = self.offset + self.limit
+        number_found = 0
+        search_results = []
+        search_facets = []
+
+        for (index, query_string), future in zip(self.searches, self._futures):
+            response = future.get_result()
+            number_found += response.number_found
+            search_facets.append(response.facets or [])
+            results = list(response.results)
+
+            # Page through the rest of the search's share with cursors
+            while len(results) < wanted and response.cursor is not None:
+                limit = min(wanted - len(results), MAX_RESULTS_PER_SEARCH)
+                response = self._search(
+                    index, query_string, limit, response.cursor
+                ).get_result()
+                if not response.results:
+                    break
+                results.extend(response.results)
+
+            search_results.append([
+                (self.sort_key(d), position, d)
+                for position, d in enumerate(results[:wanted])
+            ])
+
+        merged = []
+        seen = set()
+        for _, _, d in heapq.merge(*search_results):
+            if d.doc_id not in seen:
+                seen.add(d.doc_id)
+                merged.append(d)
+                if len(merged) == wanted:
+                    break
+
+        return search_api.SearchResults(
+            number_found=number_found,
+            results=merged[self.offset:wanted],
+            facets=merge_facets(search_facets)
+        )
+
+    def sort_key(self, document):
+        """The key to merge `document` by, matching the order in which the
+        Search API returns results.
+        """
+        key = []
+        for sort in self.sorts:
+            if sort.expression == '_rank':
+                value = document.rank
+            else:
+                value = sort.default_value
+                for field in document.fields:
+                    if field.name == sort.expression:
+                        value = field.value
+                        break
+
+            if sort.direction == search_api.SortExpression.DESCENDING:
+                value = Descending(value)
+            key.append(value)
+
+        if self.match_scorer and document.sort_scores:
+            key.append(Descending(document.sort_scores[0]))
+
+        # Ties are returned in descending order of rank, then doc ID to make
+        # the merge deterministic
+        key.append(Descending(document.rank))
+        key.append(document.doc_id)
+        return key
@@ -0,0 +1,370 @@
+"""Hooks around every RPC an `Index` makes, for measuring how the Search API
+is used and how long it takes.
+
+Every backend index is wrapped in a `MeteredIndex`, which calls the
+`before` and `after` methods of the registered hooks with an `RPCEvent` for
+each put, get, get_range, delete and search. Two hooks come with it:
+`HistogramAggregator`, which keeps latency histograms per index and
+operation in the process, and `StatsdExporter`, which sends each event to a
+statsd server over UDP:
+
+>>> histograms = register_hook(HistogramAggregator())
+>>> register_hook(StatsdExporter('127.0.0.1', 8125))
+>>> index.search().filter(genre='action')[:20].fetch_async().get_result()
+>>> histograms.percentiles('films', 'search')
+{'p50': 12.1, 'p95': 30.9, 'p99': 45.2}
+"""
+import collections
+import logging
+import math
+import re
+import socket
+import threading
+import time
+
+from .futures import Future
+
+
+# The registered hooks. It's replaced rather than changed, so it can be
+# iterated over while hooks are (un)registered in another thread
+hooks = ()
+hooks_lock = threading.Lock()
+
+
+def register_hook(hook):
+    """Call the `before` and `after` methods of `hook` around every RPC.
+    Returns the hook.
+    """
+    global hooks
+    with hooks_lock:
+        hooks = hooks + (hook,)
+    return hook
+
+
+def unregister_hook(hook):
+    global hooks
+    with hooks_lock:
+        hooks = tuple(h for h in hooks if h is not hook)
+
+
+class RPCEvent(object):
+    """One RPC made by an index.
+
+        * index_name: The name of the backend index.
+        * operation: 'put', 'get', 'get_range', 'delete' or 'search'.
+        * batch_size: How many documents were asked for, i.e. the number put
+            or deleted, or the limit of a get_range or search.
+        * documents: How many documents were put, deleted or returned.
+        * error: The name of the class of the exception the RPC raised, if
+            it failed.
+        * latency: Seconds from starting the RPC until its result was
+            waited for, which for async RPCs can be later than it arrived.
+
+    Hooks' `before` methods see the event before it has `documents`,
+    `error` or `latency`.
+    """
+    __slots__ = (
+        'index_name', 'operation', 'batch_size', 'documents', 'error',
+        'latency', 'started',
+    )
+
+    def __init__(self, index_name, operation, batch_size):
+        self.index_name = index_name
+        self.operation = operation
+        self.batch_size = batch_size
+        self.documents = None
+        self.error = None
+        self.latency = None
+        self.started = None
+
+
+class MetricsHook(object):
+    """Base class for hooks, see `register_hook`"""
+    def before(self, event):
+        pass
+
+    def after(self, event):
+        pass
+
+
+def call_hooks(method, event):
+    for hook in hooks:
+        try:
+            getattr(hook, method)(event)
+        except Exception:
+            # Measuring RPCs mustn't break them
+            logging.exception("Metrics hook %r failed", hook)
+
+
+def count_documents(operation, result, batch_size):
+    """How many documents an RPC put, deleted or returned"""
+    if operation == 'get':
+        return 0 if result is None else 1
+    if operation in ('get_range', 'search'):
+        return len(result.results)
+    return batch_size
+
+
+def get_batch_size(operation, args, kwargs):
+    if operation == 'get':
+        return 1
+    if operation == 'get_range':
+        return kwargs.get('limit', 100)
+    if operation == 'search':
+        query = args[0] if args else kwargs.get('query')
+        options = getattr(query, 'options', None)
+        return options.limit if options is not None else 20
+
+    # Puts and deletes take a document (ID) or a list of them
+    items = args[0] if args else kwargs.values()[0]
+    if isinstance(items, (list, tuple)):
+        return len(items)
+    return 1
+
+
+class MeteredFuture(Future):
+    """Future for the result of an async RPC, which calls the hooks' `after`
+    methods once the result's been waited for.
+    """
+    def __init__(self, future, event):
+        self._future = future
+        self._event = event
+
+    def _compute(self):
+        event = self._event
+        try:
+            result = self._future.get_result()
+        except Exception as e:
+            event.error = type(e).__name__
+            raise
+        else:
+            event.documents = count_documents(
+                event.operation, result, event.batch_size
+            )
+            return result
+        finally:
+            event.latency = time.time() - event.started
+            call_hooks('after', event)
+
+
+class MeteredIndex(object):
+    """Wraps a backend index so that all its RPCs call the registered hooks.
+    Without any hooks it calls straight through to the index.
+    """
+    def __init__(self, index, name):
+        self._index = index
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+    def _start(self, operation, args, kwargs):
+        event = RPCEvent(
+            self._name,
+            operation,
+            get_batch_size(operation, args, kwargs)
+        )
+        call_hooks('before', event)
+        event.started = time.time()
+        return event
+
+    def _call(self, operation, *args, **kwargs):
+        fn = getattr(self._index, operation)
+        if not hooks:
+            return fn(*args, **kwargs)
+
+        event = self._start(operation, args, kwargs)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            event.error = type(e).__name__
+            raise
+        else:
+            event.documents = count_documents(operation, result, event.batch_size)
+            return result
+        finally:
+            event.latency = time.time() - event.started
+            call_hooks('after', event)
+
+    def _call_async(self, operation, *args, **kwargs):
+        fn = getattr(self._index, operation + '_async')
+        if not hooks:
+            return fn(*args, **kwargs)
+
+        event = self._start(operation, args, kwargs)
+        try:
+            future = fn(*args, **kwargs)
+        except Exception as e:
+            event.error = type(e).__name__
+            event.latency = time.time() - event.started
+            call_hooks('after', event)
+            raise
+        return MeteredFuture(future, event)
+
+    def put(self, *args, **kwargs):
+        return self._call('put', *args, **kwargs)
+
+    def put_async(self, *args, **kwargs):
+        return self._call_async('put', *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._call('get', *args, **kwargs)
+
+    def get_async(self, *args, **kwargs):
+        return self._call_async('get', *args, **kwargs)
+
+    def get_range(self, *args, **kwargs):
+        return self._call('get_range', *args, **kwargs)
+
+    def get_range_async(self, *args, **kwargs):
+        return self._call_async('get_range', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', *args, **kwargs)
+
+    def delete_async(self, *args, **kwargs):
+        return self._call_async('delete', *args, **kwargs)
+
+    def search(self, *args, **kwargs):
+        return self._call('search', *args, **kwargs)
+
+    def search_async(self, *args, **kwargs):
+        return self._call_async('search', *args, **kwargs)
+
+
+class LatencyHistogram(object):
+    """Counts latencies in buckets that grow exponentially, by `GROWTH`
+    times, from `MIN_LATENCY` milliseconds. Percentiles are the upper bound
+    of the bucket they fall in (but no more than the largest latency seen),
+    so they're within `GROWTH` of the exact value.
+    """
+    MIN_LATENCY = 0.1
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.buckets = collections.defaultdict(int)
+        self.count = 0
+        self.errors = 0
+        self.documents = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def bucket(self, latency):
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return int(math.ceil(
+            math.log(latency / self.MIN_LATENCY) / math.log(self.GROWTH)
+        ))
+
+    def add(self, latency, documents=0, error=False):
+        """Add a latency, in milliseconds"""
+        self.buckets[self.bucket(latency)] += 1
+        self.count += 1
+        self.errors += bool(error)
+        self.documents += documents or 0
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def percentile(self, percent):
+        """The latency that `percent` percent of latencies are at or under"""
+        if not self.count:
+            return None
+
+        wanted = self.count * percent / 100.0
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= wanted:
+                break
+        return min(self.MIN_LATENCY * self.GROWTH ** bucket, self.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class HistogramAggregator(MetricsHook):
+    """Keeps a `LatencyHistogram` of each operation on each index"""
+    def __init__(self):
+        self.histograms = collections.defaultdict(LatencyHistogram)
+        self._lock = threading.Lock()
+
+    def after(self, event):
+        with self._lock:
+            self.histograms[(event.index_name, event.operation)].add(
+                event.latency * 1000,
+                documents=event.documents,
+                error=event.error
+            )
+
+    def get_histogram(self, index_name, operation):
+        return self.histograms.get((index_name, operation))
+
+    def percentiles(self, index_name, operation, percents=(50, 95, 99)):
+        """The given percentiles of the latencies of `operation` on
+        `index_name`, in milliseconds, keyed by 'p50', etc. They're None if
+        there haven't been any.
+        """
+        histogram = self.get_histogram(index_name, operation)
+        with self._lock:
+            return {
+                'p%s' % percent: histogram and histogram.percentile(percent)
+                for percent in percents
+            }
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+# Statsd metric names can't have these in them
+STATSD_FORBIDDEN_REGEX = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class StatsdExporter(MetricsHook):
+    """Sends each RPC to a statsd server as lines like:
+
+        search.films.search.latency:12.300|ms
+        search.films.search.calls:1|c
+        search.films.search.documents:20|c
+        search.films.search.errors.Timeout:1|c
+
+    Sending is best effort, so nothing's raised if the server can't be
+    reached.
+    """
+    def __init__(self, host='127.0.0.1', port=8125, prefix='search'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = None
+
+    def get_name(self, event, metric):
+        name = u'.'.join(
+            part for part in (self.prefix, event.index_name, event.operation, metric)
+            if part
+        )
+        return str(STATSD_FORBIDDEN_REGEX.sub('_', name))
+
+    def format(self, event):
+        """Get the statsd lines for `event`"""
+        lines = [
+            '%s:%.3f|ms' % (self.get_name(event, 'latency'), event.latency * 1000),
+            '%s:1|c' % self.get_name(event, 'calls'),
+        ]
+        if event.documents:
+            lines.append('%s:%d|c' % (self.get_name(event, 'documents'), event.documents))
+        if event.error:
+            lines.append('%s:1|c' % self.get_name(event, 'errors.' + event.error))
+        return '\n'.join(lines)
+
+    def after(self, event):
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.sendto(self.format(event), self.address)
+        except (socket.error, EnvironmentError):
+            pass
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
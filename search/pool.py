@@ -0,0 +1,224 @@
+import sys
+import threading
+import weakref
+
+from .backends import get_default_backend
+from .indexes import Index
+
+
+class LimitedFuture(object):
+    """Wraps the future for an RPC started through an `RPCLimiter`, giving its
+    slot back to the limiter as soon as the RPC has finished.
+
+    If the future is dropped without anything waiting on it, nothing ever
+    will, so its slot is given back then instead (the RPC itself is left to
+    finish on its own).
+    """
+    def __init__(self, limiter, future):
+        self._limiter = limiter
+        self._future = future
+        self._done = False
+        self._result = None
+        self._exc_info = None
+
+    def wait(self):
+        if self._done:
+            return
+
+        try:
+            self._result = self._future.get_result()
+        except Exception:
+            self._exc_info = sys.exc_info()
+        finally:
+            self._done = True
+            self._limiter.release()
+
+    def __del__(self):
+        if not self._done:
+            self._done = True
+            self._limiter.release()
+
+    def done(self):
+        return self._done
+
+    def get_result(self):
+        self.wait()
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class RPCLimiter(object):
+    """Caps how many RPCs can be in flight at once, across all threads.
+
+    Async RPCs hold their slot until their result has been fetched. So that a
+    thread that has started as many async RPCs as there are slots doesn't wait
+    forever on itself, a thread that needs a slot first waits on its own
+    oldest outstanding RPC (keeping the result for when it's asked for) before
+    waiting on other threads. Only weak references to those RPCs are kept, so
+    ones that have been dropped unfinished don't hold on to their slots.
+    """
+    def __init__(self, max_concurrent):
+        if max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1')
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._local = threading.local()
+
+    def _get_pending(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = []
+        return self._local.pending
+
+    def acquire(self):
+        pending = self._get_pending()
+        while not self._semaphore.acquire(False):
+            future = self._pop_oldest(pending)
+            if future is not None:
+                future.wait()
+            else:
+                self._semaphore.acquire()
+                break
+
+    def _pop_oldest(self, pending):
+        while pending:
+            future = pending.pop(0)()
+            if future is not None and not future.done():
+                return future
+        return None
+
+    def _add_pending(self, future):
+        # Forget about RPCs that have finished or been dropped as we go, so
+        # the list doesn't grow in threads that never have to wait for a slot
+        pending = self._get_pending()
+        live = []
+        for ref in pending:
+            other = ref()
+            if other is not None and not other.done():
+                live.append(ref)
+        pending[:] = live + [weakref.ref(future)]
+
+    def release(self):
+        self._semaphore.release()
+
+    def call(self, fn, *args, **kwargs):
+        """Call `fn`, a blocking RPC, once there's a free slot"""
+        self.acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release()
+
+    def call_async(self, fn, *args, **kwargs):
+        """Call `fn`, which starts an RPC and returns its future, once there's
+        a free slot.
+        """
+        self.acquire()
+        try:
+            future = fn(*args, **kwargs)
+        except:
+            self.release()
+            raise
+
+        future = LimitedFuture(self, future)
+        self._add_pending(future)
+        return future
+
+
+class LimitedIndex(object):
+    """Wraps a backend index so that all its RPCs go through `limiter`"""
+
+    def __init__(self, index, limiter):
+        self._index = index
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+    def put(self, *args, **kwargs):
+        return self.limiter.call(self._index.put, *args, **kwargs)
+
+    def put_async(self, *args, **kwargs):
+        return self.limiter.call_async(self._index.put_async, *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self.limiter.call(self._index.get, *args, **kwargs)
+
+    def get_async(self, *args, **kwargs):
+        return self.limiter.call_async(self._index.get_async, *args, **kwargs)
+
+    def get_range(self, *args, **kwargs):
+        return self.limiter.call(self._index.get_range, *args, **kwargs)
+
+    def get_range_async(self, *args, **kwargs):
+        return self.limiter.call_async(self._index.get_range_async, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.limiter.call(self._index.delete, *args, **kwargs)
+
+    def delete_async(self, *args, **kwargs):
+        return self.limiter.call_async(self._index.delete_async, *args, **kwargs)
+
+    def search(self, *args, **kwargs):
+        return self.limiter.call(self._index.search, *args, **kwargs)
+
+    def search_async(self, *args, **kwargs):
+        return self.limiter.call_async(self._index.search_async, *args, **kwargs)
+
+
+class IndexPool(object):
+    """Process-wide pool of `Index` objects, so that code which needs an index
+    by name (e.g. on every model save) can reuse one instead of building a
+    new `Index`, and backend index, each time.
+
+    If `max_concurrent_rpcs` is set, each pooled index allows at most that
+    many of its RPCs to be in flight at once, across all threads.
+    """
+    def __init__(self, max_concurrent_rpcs=None):
+        self.max_concurrent_rpcs = max_concurrent_rpcs
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, backend=None, max_concurrent_rpcs=None,
+            fingerprint_store=None):
+        """Get the pooled `Index` called `name`. Pooled indexes don't have a
+        document class, so pass one to their methods where it's needed.
+
+        `max_concurrent_rpcs` overrides the pool's default, and
+        `fingerprint_store` is given to the index, but only when the index is
+        first added to the pool.
+        """
+        backend = backend or get_default_backend()
+        key = (name, backend)
+
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        with self._lock:
+            if key not in self._indexes:
+                index = Index(
+                    name,
+                    backend=backend,
+                    fingerprint_store=fingerprint_store
+                )
+                max_concurrent_rpcs = max_concurrent_rpcs or self.max_concurrent_rpcs
+                if max_concurrent_rpcs:
+                    index._index = LimitedIndex(
+                        index._index,
+                        RPCLimiter(max_concurrent_rpcs)
+                    )
+                self._indexes[key] = index
+            return self._indexes[key]
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+pool = IndexPool()
+
+
+def get_index(name, **kwargs):
+    """Shortcut to get an index from the process-wide pool"""
+    return pool.get(name, **kwargs)
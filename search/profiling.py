@@ -0,0 +1,165 @@
+"""Profiles of where the time goes when running a search query, see
+`SearchQuery.profile` and `SearchQuery.explain`:
+
+>>> profile = index.search().filter(genre='action')[:20].explain()
+>>> print profile
+query: (genre:"action")
+...
+"""
+import collections
+import contextlib
+import time
+
+from .cache import search_results_size
+from .futures import Future
+
+
+class Phase(object):
+    """The wall clock and CPU time spent in one phase of running a query"""
+    __slots__ = ('wall', 'cpu', 'calls')
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+
+
+class QueryProfile(object):
+    """What happened when a query was run: the query strings and options it
+    was run with, how many RPCs it made, how many documents they returned
+    and roughly how many bytes those took up, and the time spent in each
+    phase:
+
+        * compile: building the query string(s).
+        * snippets: building the snippet expressions for the query, and
+            the snippets for each result from them.
+        * rpc: starting the Search API calls and waiting for their results.
+        * construct: constructing document objects from the results, not
+            counting their snippets.
+
+    Phases don't overlap, so time spent in one phase while in another (e.g.
+    snippets while constructing a document) only counts towards the inner
+    one.
+    """
+    PHASES = ('compile', 'snippets', 'rpc', 'construct')
+
+    def __init__(self):
+        self.query_strings = []
+        self.options = None
+        self.rpcs = 0
+        self.documents = 0
+        self.payload_bytes = 0
+        self.phases = collections.OrderedDict(
+            (name, Phase()) for name in self.PHASES
+        )
+        # The time spent in phases nested in the ones currently running
+        self._nested = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Add the time spent in the `with` block to the phase `name`"""
+        wall, cpu = time.time(), time.clock()
+        self._nested.append((0.0, 0.0))
+        try:
+            yield
+        finally:
+            wall, cpu = time.time() - wall, time.clock() - cpu
+            nested_wall, nested_cpu = self._nested.pop()
+            phase = self.phases[name]
+            phase.wall += wall - nested_wall
+            phase.cpu += cpu - nested_cpu
+            phase.calls += 1
+            if self._nested:
+                outer_wall, outer_cpu = self._nested[-1]
+                self._nested[-1] = (outer_wall + wall, outer_cpu + cpu)
+
+    def record_search(self, search_query):
+        if search_query.query_string not in self.query_strings:
+            self.query_strings.append(search_query.query_string)
+        if self.options is None:
+            self.options = search_query.options
+
+    def record_response(self, response):
+        self.documents += len(response.results)
+        self.payload_bytes += search_results_size(response.results)
+
+    def as_dict(self):
+        return {
+            'query_strings': list(self.query_strings),
+            'options': self.options,
+            'rpcs': self.rpcs,
+            'documents': self.documents,
+            'payload_bytes': self.payload_bytes,
+            'phases': collections.OrderedDict(
+                (name, {'wall': p.wall, 'cpu': p.cpu, 'calls': p.calls})
+                for name, p in self.phases.items()
+            ),
+        }
+
+    def __unicode__(self):
+        lines = [u'query: %s' % q for q in self.query_strings]
+        lines.append(u'options: %r' % (self.options,))
+        lines.append(
+            u'rpcs: %d, documents: %d, payload: %d bytes'
+            % (self.rpcs, self.documents, self.payload_bytes)
+        )
+        for name, p in self.phases.items():
+            lines.append(
+                u'%s: %.2fms wall, %.2fms cpu (%d calls)'
+                % (name, p.wall * 1000, p.cpu * 1000, p.calls)
+            )
+        return u'\n'.join(lines)
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+
+class NullProfile(object):
+    """Stands in for a `QueryProfile` when a query isn't being profiled, so
+    that phases can be timed the same way either way. It records nothing.
+    """
+    def phase(self, name):
+        return self
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NULL_PROFILE = NullProfile()
+
+
+class ProfiledFuture(Future):
+    """Future for the results of a Search API call, recording the time spent
+    waiting for them and what came back in `profile`.
+    """
+    def __init__(self, future, profile):
+        self._future = future
+        self._profile = profile
+
+    def _compute(self):
+        with self._profile.phase('rpc'):
+            response = self._future.get_result()
+        self._profile.record_response(response)
+        return response
+
+
+class ProfiledIndex(object):
+    """Wraps a backend index to record the searches made with it in
+    `profile`.
+    """
+    def __init__(self, index, profile):
+        self._index = index
+        self._profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+    def search_async(self, query, deadline=None):
+        self._profile.rpcs += 1
+        self._profile.record_search(query)
+        with self._profile.phase('rpc'):
+            future = self._index.search_async(query)
+        return ProfiledFuture(future, self._profile)
@@ -0,0 +1,148 @@
+import collections
+import logging
+import time
+
+from google.appengine.api import search as search_api
+
+from .bulk import DEFAULT_MAX_IN_FLIGHT, MAX_BATCH_SIZE
+
+
+# The most doc IDs we can list with one get_range call
+LIST_PAGE_SIZE = search_api.MAXIMUM_DOCUMENTS_RETURNED_PER_SEARCH
+
+
+class PurgeResult(object):
+    """The outcome of a `Purger` run. `last_id` is the last doc ID deleted
+    (or the ID the run started after, if it didn't delete anything), and
+    `finished` is False if the run stopped at its deadline before the index
+    was empty.
+    """
+    def __init__(self, deleted, elapsed, last_id, finished):
+        self.deleted = deleted
+        self.elapsed = elapsed
+        self.last_id = last_id
+        self.finished = finished
+
+    def __repr__(self):
+        return '<PurgeResult: %d documents in %.1fs (%.0f/s), %s>' % (
+            self.deleted,
+            self.elapsed,
+            self.rate,
+            'finished' if self.finished else 'stopped after %r' % self.last_id
+        )
+
+    @property
+    def rate(self):
+        """Documents deleted per second"""
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+
+class Purger(object):
+    """Deletes every document in an index. The next page of doc IDs is
+    listed while the current one is being deleted. Up to `max_in_flight`
+    delete RPCs, of `batch_size` documents each, run at once.
+
+    Batches are waited on in the order they were sent. After each one, the
+    last doc ID in it is passed to `checkpoint` (if given). By then every
+    document up to and including that ID has been deleted. Pass a checkpointed
+    ID back in as `start_id` to pick up where a failed run left off.
+
+    If `deadline` is set, no more batches are sent once that many seconds
+    have passed. The run then returns with `finished` set to False, so that
+    e.g. a task can hand the rest of the work on to another task. Progress
+    is logged every `report_interval` seconds.
+
+    >>> Purger(index, max_in_flight=8).run()
+    <PurgeResult: 1000000 documents in 503.2s (1987/s), finished>
+    """
+    def __init__(self, index, batch_size=MAX_BATCH_SIZE,
+            max_in_flight=DEFAULT_MAX_IN_FLIGHT, start_id=None, checkpoint=None,
+            deadline=None, report_interval=10, clock=time.time):
+        if not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(
+                'batch_size must be between 1 and %s' % MAX_BATCH_SIZE
+            )
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1')
+
+        self.index = index
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.start_id = start_id
+        self.checkpoint = checkpoint
+        self.deadline = deadline
+        self.report_interval = report_interval
+        self.clock = clock
+
+        self.deleted = 0
+        self.last_id = start_id
+        self._in_flight = collections.deque()
+
+    def run(self):
+        """Delete documents until the index is empty or the deadline passes.
+        Returns a `PurgeResult`.
+        """
+        self._started = self._last_report = self.clock()
+        finished = True
+
+        doc_ids = self.index.iter_documents(
+            ids_only=True,
+            page_size=LIST_PAGE_SIZE,
+            start_id=self.start_id
+        )
+
+        batch = []
+        for doc_id in doc_ids:
+            batch.append(doc_id)
+            if len(batch) < self.batch_size:
+                continue
+
+            self._send(batch)
+            batch = []
+            if self.deadline is not None and self._elapsed() >= self.deadline:
+                finished = False
+                break
+
+        if batch:
+            self._send(batch)
+        self._wait_all()
+
+        result = PurgeResult(
+            self.deleted, self._elapsed(), self.last_id, finished
+        )
+        logging.info(u'Purge of index %s: %r', self.index.name, result)
+        return result
+
+    def _elapsed(self):
+        return self.clock() - self._started
+
+    def _send(self, batch):
+        while len(self._in_flight) >= self.max_in_flight:
+            self._wait_oldest()
+
+        self.index._documents_changed(batch)
+        future = self.index._index.delete_async(batch)
+        self._in_flight.append((batch, future))
+
+    def _wait_oldest(self):
+        batch, future = self._in_flight.popleft()
+        future.get_result()
+
+        self.deleted += len(batch)
+        self.last_id = batch[-1]
+        if self.checkpoint:
+            self.checkpoint(self.last_id)
+
+        now = self.clock()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            elapsed = now - self._started
+            logging.info(
+                u'Purged %d documents from index %s so far (%.0f/s), up to %r',
+                self.deleted, self.index.name,
+                self.deleted / elapsed if elapsed else 0.0, self.last_id
+            )
+
+    def _wait_all(self):
+        while self._in_flight:
+            self._wait_oldest()
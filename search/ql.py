@@ -1,10 +1,16 @@
 import re
 
+from .cache import MISSING, LRUCache
 from .errors import FieldLookupError, BadValueError
 
 
 FORBIDDEN_VALUE_REGEX = re.compile(ur'([^_.@ \w-]+)', re.UNICODE)
 
+# Compiled filters, by document class, field lookup and value. The same
+# filters tend to be used over and over (e.g. on every page of a listing), so
+# this saves converting their values for every query
+filter_cache = LRUCache(max_size=10000)
+
 
 class GeoQueryArguments(object):
     def __init__(self, lat, lon, radius):
@@ -116,9 +122,18 @@ class Q(object):
                 v_is_list = False
 
             if v_is_list:
-                q = Q(**{k:v[0]})
-                for value in v[1:]:
-                    q |= Q(**{k:value})
+                # A list of values matches any of them. The values are all
+                # children of the one node rather than a chain of nested ones,
+                # which would be as deep as the list is long
+                values = list(v)
+                if not values:
+                    # It would compile to "()", which isn't a valid query
+                    raise BadValueError(
+                        u"Can't filter on %s with an empty list of values" % k
+                    )
+                q = Q()
+                q.conn = self.OR
+                q.children = [(k, value) for value in values]
                 self.children.append(q)
             else:
                 self.children.append((k, v))
@@ -126,6 +141,10 @@ class Q(object):
         self.conn = self.DEFAULT
         self.inverted = False
 
+        # The document class and query string this was last compiled to by
+        # `Query.unparse_filter`
+        self._compiled = None
+
     def __and__(self, other):
         return self._combine(other, self.AND)
 
@@ -133,7 +152,10 @@ class Q(object):
         return self._combine(other, self.OR)
 
     def __invert__(self):
-        obj = type(self)(**self.kwargs)
+        obj = type(self)()
+        obj.kwargs = self.kwargs
+        obj.children = list(self.children)
+        obj.conn = self.conn
         obj.inverted = not self.inverted
         return obj
 
@@ -181,7 +203,11 @@ class Q(object):
         return obj
 
     def add(self, child):
+        """Add a child to this node. Nodes are shared between cloned queries
+        and compiled once, so this is only for building new ones.
+        """
         self.children.append(child)
+        self._compiled = None
 
     def get_filters(self):
         filters = []
@@ -206,10 +232,16 @@ class Query(object):
     OR = 'OR'
     NOT = 'NOT'
 
+    # Comparisons whose converted value might be more than one term (e.g.
+    # `DateField`'s) need parentheses to be joined with other filters
+    COMPARISON_OPS = ('lt', 'lte', 'gt', 'gte')
+
     def __init__(self, document_class):
         self.document_class = document_class
         self._gathered_q = None
         self._keywords = []
+        # The query string, once it's been built
+        self._compiled = None
 
     def __str__(self):
         return self.__unicode__()
@@ -230,7 +262,8 @@ class Query(object):
         )
 
         new_q._gathered_q = self._gathered_q
-        new_q._keywords = self._keywords
+        new_q._keywords = list(self._keywords)
+        new_q._compiled = self._compiled
 
         return new_q
 
@@ -238,6 +271,7 @@ class Query(object):
         """Add a `Q` object to the internal reduction of gathered Qs,
         effectively adding a filter clause to the querystring.
         """
+        self._compiled = None
         if self._gathered_q is None:
             self._gathered_q = q
             return self
@@ -253,6 +287,7 @@ class Query(object):
     def add_keywords(self, keywords):
         """Add keywords to the querystring"""
         self._keywords.append(keywords)
+        self._compiled = None
         return self
 
     def get_filters(self):
@@ -270,27 +305,213 @@ class Query(object):
         >>> q = Q(title__contains="die hard") & Q(rating__gte=7)
         >>> query = Query(FilmDocument)
         >>> query.unparse(q)
-        "((title:'die hard') AND (rating >= 7))"
+        "(title:(die hard) AND rating >= 7)"
         """
-        # If we have a `Q` object, recursively unparse its children
         if isinstance(child, Q):
-            tmpl = u'(%s)'
-            if child.inverted:
-                tmpl = u'%s (%s)' % (child.NOT, '%s')
-
-            conn = u' %s ' % child.conn
-            return tmpl % (
-                conn.join([self.unparse_filter(c) for c in child.children])
-            )
+            return self._render_q(child, self._unparse_q(child))
 
         if child is None:
             return None
         # `child` is a tuple of the form `(field__lookup, value)`
+        return unicode(self.get_filter_expr(child).get_value())
 
-        # TODO: Move this checking to SearchQuery.filter
-
+    def _render_q(self, q, parts):
+        tmpl = u'(%s)'
+        # A single part that's already in parentheses doesn't need any more
+        if len(parts) == 1 and parts[0].startswith(u'('):
+            tmpl = u'%s'
+        if q.inverted:
+            tmpl = u'%s %s' % (q.NOT, tmpl)
+        return tmpl % (u' %s ' % q.conn).join(parts)
+
+    def _flatten_q(self, q):
+        """Get the children of `q`, with the children of any nested nodes
+        that are joined the same way (or that only have one child) in place
+        of those nodes. E.g. `(a OR (b OR c))` has the children `a`, `b` and
+        `c`.
+        """
+        children = []
+        stack = list(reversed(q.children))
+        while stack:
+            child = stack.pop()
+            if child is None:
+                continue
+            if (isinstance(child, Q) and not child.inverted and
+                    (child.conn == q.conn or len(child.children) == 1)):
+                stack.extend(reversed(child.children))
+            else:
+                children.append(child)
+        return children
+
+    def _unparse_q(self, q):
+        """Unparse the children of `q` into the list of filters it joins
+        together. Duplicate filters are dropped, and exact matches on the same
+        field in an OR are folded together, e.g. `(foo:"a" OR foo:"b")` is
+        `foo:("a" OR "b")`. Single filters aren't parenthesized, only nodes
+        with more than one.
+        """
+        # Nodes are shared between queries, so keep the result for the next
+        # time this one's compiled for the same document class
+        compiled = q._compiled
+        if compiled is not None and compiled[0] is self.document_class:
+            return compiled[1]
+
+        parts = []
+        seen = set()
+        # Values of exact filters in an OR, by field name
+        folded = {}
+
+        for child in self._flatten_q(q):
+            if isinstance(child, Q):
+                child_parts = self._unparse_q(child)
+                if len(child_parts) == 1 and not child.inverted:
+                    part = child_parts[0]
+                else:
+                    part = self._render_q(child, child_parts)
+            else:
+                expr = self.get_filter_expr(child)
+                part = unicode(expr.get_value())
+                if q.conn == q.OR and expr.op == 'exact':
+                    values = folded.get(expr.prop_name)
+                    if values is None:
+                        folded[expr.prop_name] = values = []
+                        # Keep the place of the first value for the lot
+                        parts.append((expr.prop_name, values))
+                    if part not in seen:
+                        seen.add(part)
+                        values.append(expr.value)
+                    continue
+
+                if expr.op in self.COMPARISON_OPS and u' ' in unicode(expr.value):
+                    part = u'(%s)' % part
+
+            if part not in seen:
+                seen.add(part)
+                parts.append(part)
+
+        for i, part in enumerate(parts):
+            if isinstance(part, tuple):
+                prop_name, values = part
+                if len(values) == 1:
+                    parts[i] = FilterExpr.OPS['exact'] % (prop_name, values[0])
+                else:
+                    parts[i] = u'%s:(%s)' % (
+                        prop_name,
+                        u' OR '.join(u'"%s"' % value for value in values)
+                    )
+
+        q._compiled = (self.document_class, parts)
+        return parts
+
+    def _find_or_groups(self):
+        """Find the OR nodes in the gathered filters that the query can be
+        split on, as `(path, children)` pairs where `path` is the list of
+        nodes from the root to the OR node and `children` are its flattened
+        children. Nodes under a NOT can't be split, since NOT (a OR b) isn't
+        NOT a or NOT b.
+        """
+        groups = []
+        stack = [[self._gathered_q]] if isinstance(self._gathered_q, Q) else []
+        while stack:
+            path = stack.pop()
+            q = path[-1]
+            if q.inverted:
+                continue
+
+            children = self._flatten_q(q)
+            if q.conn == q.OR and len(children) > 1:
+                groups.append((path, children))
+                # Anything under an OR node is smaller than it
+                continue
+            stack.extend(path + [c] for c in children if isinstance(c, Q))
+        return groups
+
+    def _replace_q(self, path, replacement):
+        """Get a copy of this query with the last node of `path` replaced by
+        `replacement`, copying its ancestors rather than changing them.
+        """
+        for i in range(len(path) - 2, -1, -1):
+            old, target = path[i], path[i + 1]
+            new = Q()
+            new.kwargs = old.kwargs
+            new.conn = old.conn
+            new.inverted = old.inverted
+            new.children = [
+                replacement if c is target else c for c in self._flatten_q(old)
+            ]
+            replacement = new
+
+        query = self._clone()
+        query._gathered_q = replacement
+        query._compiled = None
+        return query
+
+    def split(self, max_length):
+        """Split this query into queries whose strings are at most
+        `max_length` bytes long and which between them find the same
+        documents, by splitting its largest OR group (e.g. a long list of
+        values for a field) into several smaller ones. Returns `[self]` if
+        it's short enough already.
+
+        Queries that can't be split any further are returned as they are,
+        even if they're too long.
+        """
+        length = len(str(self))
+        if length <= max_length:
+            return [self]
+
+        groups = self._find_or_groups()
+        if not groups:
+            return [self]
+
+        def group_length(group):
+            q = group[0][-1]
+            return len(self._render_q(q, self._unparse_q(q)).encode('utf-8'))
+        path, children = max(groups, key=group_length)
+
+        # Split the group into as many pieces as it takes for each to fit
+        # beside the rest of the query. If the rest of it's too long by
+        # itself (e.g. there's another long OR group), halve this one and
+        # split the pieces again
+        size = group_length((path, children))
+        space = max_length - (length - size)
+        count = -(-size // space) if space > 0 else 2
+        count = max(2, min(count, len(children)))
+
+        queries = []
+        for n in range(count):
+            group = Q()
+            group.conn = Q.OR
+            group.children = children[
+                n * len(children) // count:(n + 1) * len(children) // count
+            ]
+            queries.extend(self._replace_q(path, group).split(max_length))
+        return queries
+
+    def get_filter_expr(self, child):
+        """Get the `FilterExpr` for the `(field__lookup, value)` tuple `child`,
+        with its value converted for the field being filtered on.
+        """
         filter_lookup, value = child
-        expr = FilterExpr(*child)
+        try:
+            key = (self.document_class, filter_lookup, type(value), value)
+            expr = filter_cache.get(key)
+        except TypeError:
+            # Unhashable values aren't cached
+            key, expr = None, MISSING
+
+        if expr is MISSING:
+            expr = self.compile_filter(filter_lookup, value)
+            if key is not None:
+                filter_cache.set(key, expr)
+        return expr
+
+    def compile_filter(self, filter_lookup, value):
+        """Compile the filter `field__lookup=value` to a `FilterExpr` with a
+        value for the Search API query syntax.
+        """
+        # TODO: Move this checking to SearchQuery.filter
+        expr = FilterExpr(filter_lookup, value)
         # Get the field name to lookup without any comparison operators that
         # might be present in the field name string
         doc_fields = self.document_class._meta.fields
@@ -311,9 +532,9 @@ class Query(object):
                     expr.prop_name,
                     type(field))
                 )
-        # Create a new filter expression with the old filter lookup but with
-        # the newly converted value
-        return unicode(FilterExpr(filter_lookup, value).get_value())
+        # Use the filter expression with the newly converted value
+        expr.value = value
+        return expr
 
     def build_filters(self):
         """Get the search API querystring representation for all gathered
@@ -329,14 +550,19 @@ class Query(object):
             return self._clean(u' '.join(self._keywords))
 
     def build_query(self):
-        """Build the full querystring"""
-        filters = self.build_filters()
-        keywords = self.build_keywords()
-
-        if filters and keywords:
-            return u'%s %s %s' % (keywords, self.AND, filters)
-        if filters:
-            return filters
-        if keywords:
-            return keywords
-        return u''
+        """Build the full querystring. It's only built once, until more
+        filters or keywords are added.
+        """
+        if self._compiled is None:
+            filters = self.build_filters()
+            keywords = self.build_keywords()
+
+            if filters and keywords:
+                self._compiled = u'%s %s %s' % (keywords, self.AND, filters)
+            elif filters:
+                self._compiled = filters
+            elif keywords:
+                self._compiled = keywords
+            else:
+                self._compiled = u''
+        return self._compiled
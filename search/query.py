@@ -1,8 +1,19 @@
+import collections
+
 from google.appengine.api import search as search_api
 
 from . import ql
+from .cache import (
+    MISSING,
+    get_index_generation,
+    get_search_cache,
+    page_cursor_cache,
+)
+from .futures import DoneFuture, MappedFuture, wait_quietly
 from .fields import NOT_SET
 from .indexers import PUNCTUATION_REGEX
+from .merging import MergedSearch
+from .profiling import NULL_PROFILE, ProfiledIndex, QueryProfile
 
 
 def quote_if_special_characters(value):
@@ -31,13 +42,66 @@ def clean_snippet(snippet_value):
     return snippet_value
 
 
-def construct_document(document_class, document):
+def build_snippets(values, expressions):
+    """Build the dict of snippets for a search result from its returned
+    `expressions`, given its dict of field `values`.
+    """
+    snippets = {}
+    for expr in expressions or []:
+        # Only add the snippet if the document has a value for that field
+        # (otherwise some snippets come back as '__NONE__', etc.)
+        if values.get(expr.name):
+            snippets[expr.name] = clean_snippet(expr.value)
+        else:
+            snippets[expr.name] = None
+    return snippets
+
+
+class SearchResultSource(object):
+    """The raw field values and expressions of one search result, which a
+    lazily constructed document reads its fields and snippets from as
+    they're needed.
+    """
+    __slots__ = ('values', 'expressions', 'returned_fields', '_snippets')
+
+    def __init__(self, document, returned_fields=None):
+        self.values = {f.name: f.value for f in document.fields}
+        self.expressions = getattr(document, 'expressions', None)
+        self.returned_fields = returned_fields
+        self._snippets = None
+
+    def was_fetched(self, name):
+        return self.returned_fields is None or name in self.returned_fields
+
+    @property
+    def snippets(self):
+        if self._snippets is None:
+            self._snippets = build_snippets(self.values, self.expressions)
+        return self._snippets
+
+
+def construct_lazy_document(document_class, document, returned_fields=None):
+    """Like `construct_document`, but each field's value is only converted
+    from the search result the first time it's accessed. Snippets are only
+    built when they're asked for.
+    """
+    doc_id = unicode(document.doc_id or '').encode('utf-8') or None
+    return document_class._from_source(
+        doc_id,
+        SearchResultSource(document, returned_fields)
+    )
+
+
+def construct_document(document_class, document, returned_fields=None,
+        profile=None):
     """Construct a document object of type `document_class` from `document`, a
     document returned from an App Engine Search API query.
 
     This sets all the correct values for the fields on the new document and
-    annotates it with a function `get_snippets` that returns a list of
-    expressions returned for the original document.
+    stores the snippets returned for the original document, for its
+    `get_snippets` method. If the query only fetched some fields, given by
+    `returned_fields`, the rest are left unset. The time spent building the
+    snippets is recorded in `profile`, if it's given.
 
     TODO: Make all expressions available (not just snippets).
     """
@@ -50,23 +114,85 @@ def construct_document(document_class, document):
             values[f.name] = value
 
     doc = document_class(doc_id=document.doc_id, **values)
+    if returned_fields is not None:
+        for name in fields:
+            if name not in returned_fields:
+                delattr(doc, name)
+
+    expressions = getattr(document, 'expressions', None)
+    with (profile or NULL_PROFILE).phase('snippets'):
+        doc._snippets = build_snippets(values, expressions)
+    return doc
 
-    snippets = {}
-    if getattr(document, 'expressions', None):
-        for expr in document.expressions:
-            # Only add the snippet if the document has a value for that field
-            # (otherwise some snippets come back as '__NONE__', etc.)
-            if values.get(expr.name):
-                snippets[expr.name] = clean_snippet(expr.value)
-            else:
-                snippets[expr.name] = None
 
-    # This is hacky as hell - TODO: Make this a proper thing
-    def get_snippets():
-        return snippets
-    doc.get_snippets = get_snippets
+def get_sort_key(sort_options):
+    """Make a hashable key for the order the Search API `SortOptions`,
+    `sort_options`, put results in.
+    """
+    if sort_options is None:
+        return (), None
+
+    sorts = tuple(
+        (e.expression, e.direction, e.default_value)
+        for e in sort_options.expressions
+    )
+    scorer = None
+    if sort_options.match_scorer is not None:
+        scorer = type(sort_options.match_scorer).__name__
+    return sorts, scorer
+
+
+def get_facets_key(query):
+    """Make a hashable key for the facets asked for by the Search API `Query`,
+    `query`. The first item is the key for its refinements, which change the
+    results found.
+    """
+    refinements = tuple(sorted(
+        r if isinstance(r, basestring) else r.ToTokenString()
+        for r in query.facet_refinements
+    ))
+
+    requests = []
+    for request in query.return_facets:
+        if isinstance(request, basestring):
+            requests.append(request)
+        else:
+            requests.append((
+                request.name,
+                request.value_limit,
+                tuple((r.start, r.end) for r in request.ranges),
+                tuple(request.values),
+            ))
 
-    return doc
+    discovery = None
+    if query.enable_facet_discovery:
+        options = query.facet_options or search_api.FacetOptions()
+        discovery = (options.discovery_limit, options.discovery_value_limit)
+
+    return refinements, tuple(requests), discovery
+
+
+def get_options_key(options):
+    """Make a hashable key for the Search API `QueryOptions`, `options`, to
+    cache the results of a search by.
+    """
+    sorts, scorer = get_sort_key(options.sort_options)
+
+    cursor = options.cursor
+    if cursor is not None:
+        cursor = (cursor.web_safe_string, cursor.per_result)
+
+    return (
+        options.offset,
+        options.limit,
+        options.ids_only,
+        options.number_found_accuracy,
+        tuple(options.returned_fields or ()),
+        tuple((e.name, e.expression) for e in options.returned_expressions or ()),
+        sorts,
+        scorer,
+        cursor,
+    )
 
 
 class SearchQuery(object):
@@ -87,10 +213,13 @@ class SearchQuery(object):
     MAX_LIMIT = 1000
     MAX_OFFSET = 1000
 
+    DEFAULT_COUNT_ACCURACY = 100
+    MAX_COUNT_ACCURACY = search_api.MAXIMUM_NUMBER_FOUND_ACCURACY
+
     ASC = search_api.SortExpression.ASCENDING
     DESC = search_api.SortExpression.DESCENDING
 
-    def __init__(self, index, document_class=None, ids_only=False):
+    def __init__(self, index, document_class=None, ids_only=False, lazy=False):
         """Arguments:
 
             * index: The Google search API index object to act on.
@@ -98,10 +227,13 @@ class SearchQuery(object):
                 from search results.
             * ids_only: Whether or not this query should return only the IDs of
                 the documents found, or the full documents themselves.
+            * lazy: Whether to only convert each field of the results when
+                it's first accessed. See `lazy`.
         """
         self.index = index
         self.document_class = document_class
         self.ids_only = ids_only
+        self._lazy = lazy
 
         # Actual search query string
         self.query = ql.Query(self.document_class)
@@ -117,8 +249,21 @@ class SearchQuery(object):
         self._snippeted_fields = []
         self._returned_expressions = []
 
+        # See `facets`, `discover_facets` and `facet_refine`
+        self._facet_requests = []
+        self._facet_refinements = []
+        self._facet_options = None
+
+        # Fields to fetch, see `only` and `defer`
+        self._only_fields = None
+        self._deferred_fields = ()
+
         self._offset = 0
         self._limit = self.MAX_LIMIT
+        self._count_accuracy = self.DEFAULT_COUNT_ACCURACY
+
+        # Where to remember the cursor for the next page, see `page`
+        self._next_page_key = None
 
         # Results
         self._iter = None
@@ -129,17 +274,18 @@ class SearchQuery(object):
         # XXX: raw query
         self._raw_query = None
 
+        # See `profile`
+        self._profiling = False
+        self._profile = None
+
     def __nonzero__(self):
         return bool(self.query)
 
     def __len__(self):
-        if self._number_found is None:
-            clone = self._clone()
-            clone._set_limits(0, 1)
-            clone._run_query()
-            clone.ids_only = True
-            return clone._number_found
-        return self._number_found
+        """The number of documents found by this query, which is only as
+        accurate as `count_accuracy` asks for.
+        """
+        return self.count_async().get_result()
 
     def __iter__(self):
         if self._results_cache is None:
@@ -177,14 +323,23 @@ class SearchQuery(object):
         new_query = type(self)(
             self.index,
             document_class=self.document_class,
-            ids_only=self.ids_only
+            ids_only=self.ids_only,
+            lazy=self._lazy
         )
         new_query._set_limits(self._offset, self._limit-self._offset)
+        new_query._has_set_limits = self._has_set_limits
+        new_query._count_accuracy = self._count_accuracy
         new_query._cursor = self._cursor
         new_query._next_cursor = self._next_cursor
         new_query._sorts = self._sorts
         new_query._snippeted_fields = self._snippeted_fields
         new_query._returned_expressions = self._returned_expressions
+        new_query._facet_requests = list(self._facet_requests)
+        new_query._facet_refinements = list(self._facet_refinements)
+        new_query._facet_options = self._facet_options
+        new_query._only_fields = self._only_fields
+        new_query._deferred_fields = self._deferred_fields
+        new_query._profiling = self._profiling
         new_query.query = self.query._clone()
 
         # XXX: Copy raw query in clone
@@ -201,11 +356,177 @@ class SearchQuery(object):
                 self._results_cache.append(d.doc_id)
                 yield d.doc_id
         else:
+            returned_fields = self.get_returned_fields()
+            if returned_fields is not None:
+                returned_fields = frozenset(returned_fields)
+
+            profile = self._get_profile() or NULL_PROFILE
             for d in self._results_response:
-                doc = construct_document(self.document_class, d)
+                with profile.phase('construct'):
+                    if self._lazy:
+                        doc = construct_lazy_document(
+                            self.document_class, d, returned_fields
+                        )
+                    else:
+                        doc = construct_document(
+                            self.document_class, d, returned_fields, profile
+                        )
                 self._results_cache.append(doc)
                 yield doc
 
+    def iterator(self, chunk_size=100):
+        """Iterate over every document (or ID) found by this query, fetching
+        them `chunk_size` at a time by following cursors, so unlike slicing
+        it isn't limited to the first 1000 results. The next chunk is fetched
+        while the current one is being iterated over. Nothing is kept on the
+        query, so memory use doesn't grow with the number of results.
+
+        If the query has been sliced, only as many results as the slice asks
+        for are returned, but the slice can't have a start.
+        """
+        if not 0 < chunk_size <= self.MAX_LIMIT:
+            raise ValueError(
+                "chunk_size must be between 1 and %s" % self.MAX_LIMIT
+            )
+        if self._offset:
+            raise ValueError(
+                "Can't iterate over a query with an offset, since it's paged "
+                "through with cursors"
+            )
+
+        remaining = self._limit if self._has_set_limits else None
+        return self._iter_chunks(chunk_size, remaining)
+
+    def _start_chunk(self, cursor, size):
+        chunk = self._clone()
+        chunk._profile = self._get_profile()
+        chunk._set_limits(0, size)
+        chunk._cursor = cursor
+        return chunk, chunk._run_query_async()
+
+    def _iter_chunks(self, chunk_size, remaining):
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk, future = self._start_chunk(
+            self._cursor or search_api.Cursor(),
+            size
+        )
+
+        try:
+            while chunk is not None:
+                found = len(future.get_result().results)
+                if remaining is not None:
+                    remaining -= found
+
+                # Start on the next chunk before handing out this one
+                next_chunk = None
+                if chunk.next_cursor and found == size and remaining != 0:
+                    size = chunk_size if remaining is None else min(chunk_size, remaining)
+                    next_chunk, future = self._start_chunk(chunk.next_cursor, size)
+
+                for result in chunk:
+                    yield result
+                chunk = next_chunk
+        finally:
+            # If the caller stopped early, don't leave the next chunk's search
+            # holding on to a slot
+            wait_quietly(future)
+
+    def page(self, number, per_page):
+        """Get the query for page `number` (counting from 1) of this query's
+        results, with `per_page` documents to a page.
+
+        Pages are fetched with cursors rather than offsets, so they aren't
+        limited to the first 1000 results. The cursor for the start of each
+        page is remembered (in `search.cache.page_cursor_cache`), so the page
+        after one that's been fetched, or any page fetched before, is fetched
+        with a single search. Otherwise, the IDs of the documents on the pages
+        in between are fetched first, starting from the nearest page there's
+        a cursor for.
+
+        Queries that have to be split (see `get_query_strings`) can't use
+        cursors, so their pages are fetched by offset instead, which only
+        reaches the first 1000 results. Pages past that raise `IndexError`.
+        """
+        if number < 1:
+            raise ValueError("Page numbers start at 1")
+        if not 0 < per_page <= self.MAX_LIMIT:
+            raise ValueError("per_page must be between 1 and %s" % self.MAX_LIMIT)
+
+        query_strings = self.get_query_strings()
+        if len(query_strings) > 1:
+            bottom = (number - 1) * per_page
+            return self[bottom:bottom + per_page]
+
+        key = self._get_page_key(per_page, query_strings)
+
+        # Find the nearest page at or before this one with a cursor
+        first, cursor = number, None
+        while first > 1:
+            cursor = page_cursor_cache.get(key + (first,), None)
+            if cursor is not None:
+                break
+            first -= 1
+
+        if first < number:
+            cursor = self._skip_pages(key, first, cursor, number, per_page)
+
+        page = self._clone()
+        page._set_limits(0, per_page)
+        page._cursor = search_api.Cursor(web_safe_string=cursor)
+        page._next_page_key = key + (number + 1,)
+        return page
+
+    def _get_page_key(self, per_page, query_strings):
+        search_query = self._build_search_query(query_strings[0])
+        refinements = get_facets_key(search_query)[0]
+        # The generation is part of the key, so that writes to the index
+        # don't leave cursors pointing at the wrong documents
+        return (
+            self.index.name,
+            get_index_generation(self.index.name),
+            tuple(query_strings),
+            get_sort_key(search_query.options.sort_options),
+            refinements,
+            per_page,
+        )
+
+    def _skip_pages(self, key, page, cursor, number, per_page):
+        """Get the cursor for the start of page `number`, going from `cursor`,
+        the one for the start of `page`. Remembers the cursors for each page
+        in between.
+        """
+        pages_per_search = self.MAX_LIMIT // per_page
+
+        while page < number:
+            pages = min(number - page, pages_per_search)
+            skipped = self._clone()
+            skipped._profile = self._get_profile()
+            skipped.ids_only = True
+            skipped._snippeted_fields = []
+            skipped._returned_expressions = []
+            skipped._facet_requests = []
+            skipped._facet_options = None
+            skipped._set_limits(0, pages * per_page)
+            skipped._cursor = search_api.Cursor(
+                web_safe_string=cursor,
+                per_result=True
+            )
+            results = skipped._run_query().results
+
+            for i in range(1, pages + 1):
+                position = i * per_page - 1
+                if position >= len(results):
+                    # Past the last page, so the page asked for is empty
+                    if results:
+                        cursor = results[-1].cursor.web_safe_string
+                    return cursor
+
+                cursor = results[position].cursor.web_safe_string
+                page_cursor_cache.set(key + (page + i,), cursor)
+            page += pages
+
+        return cursor
+
     def _fill_cache(self, how_many):
         for i in range(how_many):
             try:
@@ -238,6 +559,41 @@ class SearchQuery(object):
     def count(self):
         return len(self)
 
+    def count_async(self):
+        """Like `count`, but returns a future for the count"""
+        if self._number_found is not None:
+            return DoneFuture(self._number_found)
+
+        if self._has_set_limits:
+            # A sliced query is a page that's about to be fetched anyway (and
+            # `list()` asks for its length first), so fetch it now and take
+            # the count from that
+            return MappedFuture(
+                self._run_query_async(),
+                lambda response: self._number_found
+            )
+
+        clone = self._clone()
+        clone._profile = self._get_profile()
+        clone.ids_only = True
+        clone._set_limits(0, 1)
+        clone._facet_requests = []
+        clone._facet_options = None
+
+        def set_number_found(response):
+            self._number_found = clone._number_found
+            return self._number_found
+        return MappedFuture(clone._run_query_async(), set_number_found)
+
+    def fetch_async(self):
+        """Start running this query, returning a future for the list of
+        documents (or IDs) found. Several queries can be run at once this way
+        and waited for together (see `search.futures.wait_all`).
+        """
+        if self._results_response is not None:
+            return DoneFuture(list(self))
+        return MappedFuture(self._run_query_async(), lambda response: list(self))
+
     def filter(self, *args, **kwargs):
         """Add a filter constraint to the query from the `(prop name, value)`
         pairs in kwargs, similar to Django syntax:
@@ -277,6 +633,201 @@ class SearchQuery(object):
             )
         return cloned
 
+    def _check_field_names(self, fields, action):
+        for field_name in fields:
+            if field_name not in self.document_class._meta.fields:
+                raise ValueError(
+                    "Can't {} field {} since {} has no field by that name"
+                    .format(action, field_name, self.document_class.__name__)
+                )
+
+    def only(self, *fields):
+        """Only fetch the given fields of the documents found, leaving the
+        others unset on the results. Replaces any fields given to a previous
+        call.
+
+        Putting a document fetched this way writes its unfetched fields as
+        empty, so only use it for results that are just displayed.
+        """
+        self._check_field_names(fields, "fetch")
+        cloned = self._clone()
+        cloned._only_fields = tuple(fields)
+        return cloned
+
+    def defer(self, *fields):
+        """Don't fetch the given fields of the documents found, e.g. large
+        corpus fields that are only there to be searched, leaving them unset
+        on the results. `defer(None)` clears the deferred fields.
+
+        As with `only`, don't put the documents fetched.
+        """
+        cloned = self._clone()
+        if fields == (None,):
+            cloned._deferred_fields = ()
+        else:
+            self._check_field_names(fields, "defer")
+            cloned._deferred_fields = self._deferred_fields + tuple(fields)
+        return cloned
+
+    def get_returned_fields(self):
+        """The names of the fields to fetch for each document found, or None
+        to fetch all of them.
+        """
+        if self._only_fields is None and not self._deferred_fields:
+            return None
+
+        names = self._only_fields
+        if names is None:
+            names = self.document_class._meta.field_names
+        returned_fields = [
+            name for name in names if name not in self._deferred_fields
+        ]
+        if not returned_fields:
+            # An empty list would have the Search API return every field
+            raise ValueError("Every field of the query's documents is deferred")
+        return returned_fields
+
+    def count_accuracy(self, accuracy):
+        """Have the count of documents found be accurate up to at least
+        `accuracy` documents (up to `MAX_COUNT_ACCURACY`), rather than the
+        default of `DEFAULT_COUNT_ACCURACY`. More accurate counts make
+        searches slower. `None` asks for an approximate count, which is the
+        quickest; see `approximate_count`.
+        """
+        if accuracy is not None and not 0 < accuracy <= self.MAX_COUNT_ACCURACY:
+            raise ValueError(
+                "Count accuracy must be between 1 and %s" % self.MAX_COUNT_ACCURACY
+            )
+        cloned = self._clone()
+        cloned._count_accuracy = accuracy
+        return cloned
+
+    def approximate_count(self):
+        """Only ask the Search API for an approximate count of the documents
+        found, e.g. for large result sets where the exact number isn't shown.
+        """
+        return self.count_accuracy(None)
+
+    def _get_facet_field(self, name):
+        field = self.document_class._meta.fields.get(name)
+        if field is None or not field.facet:
+            raise ValueError(
+                "{} has no faceted field {}"
+                .format(self.document_class.__name__, name)
+            )
+        return field
+
+    def facets(self, *facets, **kwargs):
+        """Count the documents found by the values of the given facets, in
+        the same search as the results themselves. Each facet is either the
+        name of a field declared with `facet=True`, or a Search API
+        `FacetRequest` for one (e.g. to bucket a number field into ranges).
+        Up to `value_limit` (default 10) of the most common values are
+        counted for facets given by name.
+
+        The counts are available from `get_facets` once the query's run.
+        """
+        value_limit = kwargs.pop('value_limit', 10)
+        if kwargs:
+            raise TypeError("Unexpected arguments %s" % ", ".join(kwargs))
+
+        cloned = self._clone()
+        for facet in facets:
+            if isinstance(facet, basestring):
+                facet = search_api.FacetRequest(facet, value_limit=value_limit)
+            self._get_facet_field(facet.name)
+            cloned._facet_requests.append(facet)
+        return cloned
+
+    def discover_facets(self, limit=10, value_limit=None):
+        """Also have the Search API count the values of the `limit` facets
+        that are most relevant to the documents found.
+        """
+        cloned = self._clone()
+        cloned._facet_options = search_api.FacetOptions(
+            discovery_limit=limit,
+            discovery_value_limit=value_limit
+        )
+        return cloned
+
+    def facet_refine(self, *refinements, **values):
+        """Only find documents with the given facet values. `refinements` are
+        Search API `FacetRefinement`s, or their tokens (as given by
+        `get_facets`, e.g. for links in the page), and `values` map facet
+        field names to a value, or a list of values, to keep documents with.
+        Refinements for the same facet are ORed together, while those for
+        different facets are ANDed.
+        """
+        cloned = self._clone()
+        for refinement in refinements:
+            if isinstance(refinement, basestring):
+                refinement = search_api.FacetRefinement.FromTokenString(refinement)
+            cloned._facet_refinements.append(refinement)
+
+        for name, value in values.items():
+            field = self._get_facet_field(name)
+            if not isinstance(value, (list, tuple, set)):
+                value = [value]
+            for v in value:
+                cloned._facet_refinements.append(
+                    search_api.FacetRefinement(name, value=field.to_search_value(v))
+                )
+        return cloned
+
+    def get_facets(self):
+        """Get the facet counts that came back with the results of this query,
+        as an ordered dict of facet name to lists of Search API
+        `FacetResultValue`s (with `label`, `count` and `refinement_token`).
+        Runs the query if it hasn't been already.
+        """
+        if self._results_response is None:
+            self._run_query()
+
+        return collections.OrderedDict(
+            (facet.name, facet.values)
+            for facet in self._results_response.facets or ()
+        )
+
+    def profile(self, profile=True):
+        """Record where the time goes when this query is run: compiling it,
+        the RPCs, constructing documents and snippets. The record is available
+        from `get_profile` once the query's been run, and includes any searches
+        made to count the results, by `iterator`, etc. See
+        `search.profiling.QueryProfile`.
+        """
+        cloned = self._clone()
+        cloned._profiling = profile
+        return cloned
+
+    def _get_profile(self):
+        if self._profiling and self._profile is None:
+            self._profile = QueryProfile()
+        return self._profile
+
+    def get_profile(self):
+        """The `QueryProfile` for this query, if it's being profiled"""
+        return self._get_profile()
+
+    def explain(self):
+        """Run this query with profiling and return its `QueryProfile`, with
+        the query strings and options it was run with, the number of RPCs,
+        and the time spent in each phase of running it.
+        """
+        query = self.profile()
+        for _ in query:
+            pass
+        return query.get_profile()
+
+    def lazy(self, lazy=True):
+        """Construct the result documents without converting any of their
+        fields up front. Each field is converted the first time it's accessed,
+        which saves a lot of work when only a few fields of each result are
+        used. Lazy documents don't go through their class's `__init__`.
+        """
+        cloned = self._clone()
+        cloned._lazy = lazy
+        return cloned
+
     def keywords(self, keywords):
         cloned = self._clone()
         cloned.query.add_keywords(quote_if_special_characters(keywords))
@@ -316,12 +867,7 @@ class SearchQuery(object):
     def snippet(self, *fields):
         """Add fields to get snippets for when this query is run"""
         cloned = self._clone()
-        for field_name in fields:
-            if field_name not in self.document_class._meta.fields:
-                raise ValueError(
-                    "Can't snippet field {} since {} has no field by that name"
-                    .format(field_name, self.document_class.__name__)
-                )
+        self._check_field_names(fields, "snippet")
         cloned._snippeted_fields.extend(fields)
         return cloned
 
@@ -375,7 +921,23 @@ class SearchQuery(object):
             )
         return field_expressions
 
-    def _run_query(self):
+    def get_query_strings(self):
+        """Get the query strings to search with. That's usually just the one,
+        but queries longer than the Search API allows (e.g. filtering on a
+        long list of values) are split into several, see `ql.Query.split`,
+        whose results are merged.
+        """
+        if self._raw_query is not None:
+            return [self._raw_query]
+        return [
+            str(query)
+            for query in self.query.split(search_api.MAXIMUM_QUERY_LENGTH)
+        ]
+
+    def _build_search_query(self, query_string=None):
+        """Build the Search API `Query` to run for this query, with
+        `query_string` in place of its own if it's given.
+        """
         if self._cursor:
             offset = None
         else:
@@ -384,10 +946,11 @@ class SearchQuery(object):
         limit = self._limit
         sort_expressions = self._sorts
 
-        if self._raw_query is not None:
-            query_string = self._raw_query
-        else:
-            query_string = str(self.query)
+        if query_string is None:
+            if self._raw_query is not None:
+                query_string = self._raw_query
+            else:
+                query_string = str(self.query)
 
         kwargs = {
             "expressions": sort_expressions
@@ -395,8 +958,9 @@ class SearchQuery(object):
         if self._match_scorer:
             kwargs["match_scorer"] = self._match_scorer
 
-        snippet_words = self.get_snippet_words()
-        field_expressions = self.get_snippet_expressions(snippet_words)
+        with (self._get_profile() or NULL_PROFILE).phase('snippets'):
+            snippet_words = self.get_snippet_words()
+            field_expressions = self.get_snippet_expressions(snippet_words)
 
         sort_options = search_api.SortOptions(**kwargs)
         search_options = search_api.QueryOptions(
@@ -404,15 +968,82 @@ class SearchQuery(object):
             limit=limit,
             sort_options=sort_options,
             ids_only=self.ids_only,
-            number_found_accuracy=100,
+            number_found_accuracy=self._count_accuracy,
+            returned_fields=(
+                None if self.ids_only else self.get_returned_fields()
+            ),
             returned_expressions=field_expressions,
             cursor=self._cursor
         )
-        search_query = search_api.Query(
+        return search_api.Query(
             query_string=query_string,
-            options=search_options
+            options=search_options,
+            enable_facet_discovery=self._facet_options is not None,
+            return_facets=self._facet_requests,
+            facet_options=self._facet_options,
+            facet_refinements=self._facet_refinements
         )
 
-        self._results_response = self.index.search(search_query)
-        self._number_found = self._results_response.number_found
-        self._next_cursor = self._results_response.cursor
+    def _run_query(self):
+        return self._run_query_async().get_result()
+
+    def _run_query_async(self):
+        """Start the search for this query. Returns a future for the Search
+        API's results, which are kept on the query once they've arrived.
+
+        If the query had to be split (see `get_query_strings`), the searches
+        for each part are run at once and their results merged, dropping
+        documents found by more than one. The count is the sum of the parts'
+        counts though, so it can include those documents more than once.
+        Split queries can only be sorted by field names, and can't be used
+        with cursors (so not with `iterator`, and `page` uses offsets).
+        """
+        profile = self._get_profile()
+        index = self.index if profile is None else ProfiledIndex(self.index, profile)
+        with (profile or NULL_PROFILE).phase('compile'):
+            query_strings = self.get_query_strings()
+
+        search_query = self._build_search_query(query_strings[0])
+        search_options = search_query.options
+
+        def search():
+            if len(query_strings) == 1:
+                return index.search_async(search_query)
+            return MergedSearch(
+                [(index, query_string) for query_string in query_strings],
+                search_query
+            ).start()
+
+        cache = get_search_cache(self.index.name)
+        if cache is None:
+            future = search()
+        else:
+            # The generation is read before searching, so results that race
+            # with a write are cached where they'll never be found
+            key = (
+                get_index_generation(self.index.name),
+                tuple(query_strings),
+                get_options_key(search_options),
+                get_facets_key(search_query)
+            )
+            response = cache.get(key)
+            if response is MISSING:
+                def cache_response(response):
+                    cache.set(key, response)
+                    return response
+                future = MappedFuture(search(), cache_response)
+            else:
+                future = DoneFuture(response)
+
+        return MappedFuture(future, self._set_response)
+
+    def _set_response(self, response):
+        self._results_response = response
+        self._number_found = response.number_found
+        self._next_cursor = response.cursor
+        if self._next_page_key is not None and response.cursor is not None:
+            page_cursor_cache.set(
+                self._next_page_key,
+                response.cursor.web_safe_string
+            )
+        return response
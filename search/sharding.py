@@ -0,0 +1,179 @@
+import hashlib
+import heapq
+import itertools
+
+from google.appengine.api import search as search_api
+
+from .futures import ResultFuture
+from .indexes import Index
+from .merging import MergedSearch
+from .metrics import MeteredIndex
+
+
+def get_shard_name(name, shard):
+    return '%s-%d' % (name, shard)
+
+
+class ShardedBackendIndex(object):
+    """Spreads one logical index over several backend indexes (`shards`).
+
+    It has the same interface as the backend indexes, so `Index`,
+    `SearchQuery`, etc. work on it as they would on a single index. Documents
+    go to the shard picked by a hash of their doc ID. Searches and
+    `get_range` calls go to every shard at once, and the results are merged
+    back into the order a single index would have returned them in.
+    """
+    def __init__(self, name, shards):
+        self.name = name
+        self.shards = shards
+
+    def get_shard(self, doc_id):
+        """Get the shard that the document with `doc_id` lives in"""
+        if not doc_id:
+            raise ValueError('Documents in a sharded index must have a doc_id')
+        if isinstance(doc_id, unicode):
+            doc_id = doc_id.encode('utf-8')
+        digest = hashlib.md5(doc_id).hexdigest()
+        return self.shards[int(digest, 16) % len(self.shards)]
+
+    def _group_by_shard(self, items, get_doc_id):
+        """Group `items` by shard, keeping each item's position in `items`.
+        Returns a list of `(shard, [(position, item), ...])`.
+        """
+        groups = {}
+        for position, item in enumerate(items):
+            shard = self.get_shard(get_doc_id(item))
+            groups.setdefault(id(shard), (shard, []))[1].append((position, item))
+        return groups.values()
+
+    def put_async(self, documents, deadline=None):
+        if isinstance(documents, search_api.Document):
+            documents = [documents]
+
+        rpcs = []
+        for shard, group in self._group_by_shard(documents, lambda d: d.doc_id):
+            positions = [position for position, _ in group]
+            future = shard.put_async([d for _, d in group])
+            rpcs.append((positions, future))
+
+        def combine(rpcs):
+            results = [None] * len(documents)
+            for positions, future in rpcs:
+                for position, result in zip(positions, future.get_result()):
+                    results[position] = result
+            return results
+        return ResultFuture(combine, rpcs)
+
+    def put(self, documents, deadline=None):
+        return self.put_async(documents).get_result()
+
+    def get(self, doc_id, deadline=None):
+        return self.get_shard(doc_id).get(doc_id)
+
+    def get_async(self, doc_id, deadline=None):
+        return self.get_shard(doc_id).get_async(doc_id)
+
+    def delete_async(self, doc_ids, deadline=None):
+        if isinstance(doc_ids, basestring):
+            doc_ids = [doc_ids]
+
+        futures = [
+            shard.delete_async([doc_id for _, doc_id in group])
+            for shard, group in self._group_by_shard(doc_ids, lambda d: d)
+        ]
+
+        def combine(futures):
+            for future in futures:
+                future.get_result()
+        return ResultFuture(combine, futures)
+
+    def delete(self, doc_ids, deadline=None):
+        return self.delete_async(doc_ids).get_result()
+
+    def get_range_async(self, start_id=None, include_start_object=True,
+            limit=100, ids_only=False, deadline=None):
+        # Any of the first `limit` documents overall are in the first `limit`
+        # of their shard
+        futures = [
+            shard.get_range_async(
+                start_id=start_id,
+                include_start_object=include_start_object,
+                limit=limit,
+                ids_only=ids_only
+            )
+            for shard in self.shards
+        ]
+
+        def combine(futures):
+            responses = [
+                [(d.doc_id, d) for d in future.get_result()]
+                for future in futures
+            ]
+            merged = heapq.merge(*responses)
+            return search_api.GetResponse(
+                results=[d for _, d in itertools.islice(merged, limit)]
+            )
+        return ResultFuture(combine, futures)
+
+    def get_range(self, start_id=None, include_start_object=True, limit=100,
+            ids_only=False, deadline=None):
+        return self.get_range_async(
+            start_id=start_id,
+            include_start_object=include_start_object,
+            limit=limit,
+            ids_only=ids_only
+        ).get_result()
+
+    def search_async(self, query, deadline=None):
+        if isinstance(query, basestring):
+            query = search_api.Query(query_string=query)
+        return ShardedSearch(self.shards, query).start()
+
+    def search(self, query, deadline=None):
+        return self.search_async(query).get_result()
+
+
+class ShardedSearch(MergedSearch):
+    """Runs a search query on every shard of a sharded index at once, then
+    merges the results, see `MergedSearch`. Cursors can't be used with the
+    merged results, so queries with a cursor are rejected.
+    """
+    def __init__(self, shards, query):
+        super(ShardedSearch, self).__init__(
+            [(shard, query.query_string) for shard in shards],
+            query
+        )
+
+    def describe(self):
+        return "a sharded index"
+
+
+class ShardedIndex(Index):
+    """An `Index` spread over `shards` backend indexes, for when a single
+    index would be too big or too busy. It works just like an `Index`, see
+    `ShardedBackendIndex` for how.
+
+    >>> index = ShardedIndex('films', FilmDocument, shards=8)
+    >>> index.put(FilmDocument(doc_id='die-hard', ...))
+    >>> index.search().filter(genre='action').order_by('-rating')[:20]
+
+    The shards are named `<name>-0`, `<name>-1`, etc. Documents put to a
+    sharded index must have a doc ID, and changing the number of shards
+    means reindexing.
+    """
+    def __init__(self, name=None, document_class=None, backend=None,
+            fingerprint_store=None, shards=4):
+        super(ShardedIndex, self).__init__(
+            name,
+            document_class=document_class,
+            backend=backend,
+            fingerprint_store=fingerprint_store
+        )
+
+        if shards < 1:
+            raise ValueError('A sharded index needs at least 1 shard')
+
+        self._index = MeteredIndex(ShardedBackendIndex(name, [
+            self.backend.get_index(get_shard_name(name, shard))
+            for shard in range(shards)
+        ]), name)
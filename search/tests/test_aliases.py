@@ -0,0 +1,80 @@
+import unittest
+
+from google.appengine.api import search as search_api
+
+from ..aliases import MemoryAliasStore, rebuild_index
+from ..backends.memory import MemoryBackend
+from ..errors import AliasError
+from ..fields import TextField
+from ..indexes import DocumentModel, Index
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+
+
+class TestMemoryAliasStore(unittest.TestCase):
+    def setUp(self):
+        self.store = MemoryAliasStore()
+
+    def test_no_alias(self):
+        self.assertEqual('films', self.store.resolve('films'))
+        self.assertEqual(['films'], self.store.get_write_names('films'))
+
+    def test_rebuild(self):
+        self.assertEqual('films_v2', self.store.begin_rebuild('films'))
+        self.assertEqual('films', self.store.resolve('films'))
+        self.assertEqual(['films', 'films_v2'], self.store.get_write_names('films'))
+        self.assertRaises(AliasError, self.store.begin_rebuild, 'films')
+
+        self.assertEqual('films', self.store.finish_rebuild('films'))
+        self.assertEqual('films_v2', self.store.resolve('films'))
+        self.assertEqual(['films_v2'], self.store.get_write_names('films'))
+
+        self.assertEqual('films_v3', self.store.begin_rebuild('films'))
+        self.store.cancel_rebuild('films')
+        self.assertEqual(['films_v2'], self.store.get_write_names('films'))
+        self.assertRaises(AliasError, self.store.finish_rebuild, 'films')
+
+        self.store.point('films', 'films')
+        self.assertEqual('films', self.store.resolve('films'))
+
+    def test_compare_and_set(self):
+        self.store.begin_rebuild('films')
+        stale = self.store.get_alias('films')
+        self.store.finish_rebuild('films')
+        self.assertFalse(self.store.compare_and_set('films', stale, stale))
+
+
+class TestRebuildIndex(unittest.TestCase):
+    def setUp(self):
+        self.store = MemoryAliasStore()
+        self.backend = MemoryBackend()
+        Index('films', backend=self.backend).put(
+            FakeDocument(doc_id='old', foo='old')
+        )
+
+    def test_rebuild_index(self):
+        old_name = rebuild_index(
+            'films',
+            [FakeDocument(doc_id=str(i), foo='new') for i in range(5)],
+            store=self.store,
+            backend=self.backend
+        )
+        self.assertEqual('films', old_name)
+
+        index = Index(self.store.resolve('films'), FakeDocument, backend=self.backend)
+        self.assertEqual('films_v2', index.name)
+        self.assertEqual(5, index.search().count())
+        self.assertEqual(1, Index('films', FakeDocument, backend=self.backend).search().count())
+
+    def test_failed_rebuild_cancelled(self):
+        def documents():
+            yield FakeDocument(doc_id='1')
+            raise search_api.TransientError('Oh no')
+
+        self.assertRaises(
+            search_api.TransientError,
+            rebuild_index, 'films', documents(), store=self.store, backend=self.backend
+        )
+        self.assertEqual(['films'], self.store.get_write_names('films'))
@@ -0,0 +1,242 @@
+import datetime
+import unittest
+
+from google.appengine.api import search as search_api
+
+from ..backends import get_default_backend, set_default_backend
+from ..backends.appengine import AppEngineBackend
+from ..backends.memory import MemoryBackend
+from ..fields import (
+    AtomField,
+    DateField,
+    FloatField,
+    GeoField,
+    IntegerField,
+    TextField,
+)
+from ..indexes import DocumentModel, Index
+from ..ql import GeoQueryArguments, Q
+
+from .base import AppengineTestCase
+
+
+class FilmDocument(DocumentModel):
+    title = TextField()
+    genre = AtomField()
+    rating = FloatField()
+    year = IntegerField()
+    released = DateField()
+
+
+class PlaceDocument(DocumentModel):
+    location = GeoField()
+
+
+FILMS = [
+    ('die-hard', 'Die Hard', 'action', 9.7, 1988, datetime.date(1989, 2, 3)),
+    ('die-hard-2', 'Die Hard 2', 'action', 7.1, 1990, datetime.date(1990, 7, 6)),
+    ('alien', 'Alien', 'horror', 8.5, 1979, datetime.date(1979, 9, 6)),
+    ('aliens', 'Aliens', 'action', 8.4, 1986, datetime.date(1986, 8, 29)),
+    ('up', 'Up', 'family', 8.3, 2009, None),
+]
+
+
+def put_films(index):
+    index.put([
+        FilmDocument(
+            doc_id=doc_id,
+            title=title,
+            genre=genre,
+            rating=rating,
+            year=year,
+            released=released
+        )
+        for doc_id, title, genre, rating, year, released in FILMS
+    ])
+
+
+class TestDefaultBackend(unittest.TestCase):
+    def tearDown(self):
+        set_default_backend(None)
+
+    def test_default_backend(self):
+        self.assertIsInstance(get_default_backend(), AppEngineBackend)
+
+        backend = MemoryBackend()
+        set_default_backend(backend)
+        self.assertIs(Index('films').backend, backend)
+
+
+class TestMemoryIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('films', FilmDocument, backend=MemoryBackend())
+        put_films(self.index)
+
+    def test_get(self):
+        doc = self.index.get('alien')
+        self.assertEqual(doc.title, 'Alien')
+        self.assertEqual(doc.rating, 8.5)
+        self.assertIsNone(self.index.get('nope'))
+
+    def test_get_range(self):
+        self.assertEqual(
+            ['alien', 'aliens', 'die-hard', 'die-hard-2', 'up'],
+            self.index.get_range(ids_only=True)
+        )
+        self.assertEqual(
+            ['die-hard-2', 'up'],
+            self.index.get_range(
+                ids_only=True,
+                start_id='die-hard',
+                include_start_object=False
+            )
+        )
+
+    def test_put_replaces(self):
+        self.index.put(FilmDocument(doc_id='up', title='Down', genre='family'))
+        self.assertEqual([], list(self.index.search().keywords('up')))
+        self.assertEqual(
+            ['up'],
+            [d.doc_id for d in self.index.search().keywords('down')]
+        )
+
+    def test_delete_and_purge(self):
+        self.index.delete(['alien', 'up'])
+        self.assertEqual(3, self.index.search().count())
+        self.assertEqual([], list(self.index.search().keywords('alien')))
+
+        self.index.purge()
+        self.assertEqual([], self.index.get_range())
+
+    def test_too_many_documents(self):
+        docs = [search_api.Document(doc_id=str(i)) for i in range(201)]
+        self.assertRaises(ValueError, self.index._index.put, docs)
+
+    def test_ordering_and_slicing(self):
+        query = self.index.search(ids_only=True).order_by('-rating')
+        self.assertEqual(
+            ['die-hard', 'alien', 'aliens', 'up', 'die-hard-2'],
+            list(query)
+        )
+        self.assertEqual(['alien', 'aliens'], list(query[1:3]))
+        self.assertEqual(5, len(query[1:3]))
+
+    def test_cursor(self):
+        query = self.index.search(ids_only=True).set_cursor().order_by('year')[:2]
+        self.assertEqual(['alien', 'aliens'], list(query))
+
+        query = self.index.search(ids_only=True).set_cursor(query.next_cursor).order_by('year')[:2]
+        self.assertEqual(['die-hard', 'die-hard-2'], list(query))
+
+        query = self.index.search(ids_only=True).set_cursor(query.next_cursor).order_by('year')[:2]
+        self.assertEqual(['up'], list(query))
+        self.assertIsNone(query.next_cursor)
+
+    def test_snippets(self):
+        doc = self.index.search().keywords('hard').snippet('title').order_by('year')[0]
+        self.assertEqual({'title': u'Die <b>Hard</b>'}, doc.get_snippets())
+
+    def test_mixed_kinds(self):
+        backend_index = MemoryBackend().get_index('mixed')
+        backend_index.put([
+            search_api.Document(doc_id='text', fields=[
+                search_api.TextField(name='code', value='abc'),
+            ]),
+            search_api.Document(doc_id='atom', fields=[
+                search_api.AtomField(name='code', value='5'),
+            ]),
+            search_api.Document(doc_id='number', fields=[
+                search_api.NumberField(name='code', value=5),
+            ]),
+            search_api.Document(doc_id='date', fields=[
+                search_api.DateField(name='code', value=datetime.date(2000, 1, 1)),
+            ]),
+        ])
+
+        def search(query_string):
+            response = backend_index.search(search_api.Query(query_string))
+            return sorted(result.doc_id for result in response.results)
+
+        self.assertEqual(['text'], search('code:abc'))
+        self.assertEqual(['atom', 'number'], search('code:5'))
+        self.assertEqual(['atom', 'number'], search('code = 5'))
+        self.assertEqual(['date'], search('code:2000-01-01'))
+        self.assertRaises(search_api.QueryError, search, 'code > 4')
+
+    def test_bad_query(self):
+        self.assertRaises(
+            search_api.QueryError,
+            list,
+            self.index.search().raw('title:(die')
+        )
+
+
+class TestMemoryQueryLanguage(AppengineTestCase):
+    """Check the memory backend finds the same documents as the Search API
+    stub for everything `ql.Query` produces.
+    """
+    def setUp(self):
+        super(TestMemoryQueryLanguage, self).setUp()
+        self.stub_index = Index('films', FilmDocument)
+        self.memory_index = Index('films', FilmDocument, backend=MemoryBackend())
+        put_films(self.stub_index)
+        put_films(self.memory_index)
+
+    def assertSameResults(self, build_query):
+        stub_ids = list(build_query(self.stub_index.search(ids_only=True)))
+        memory_ids = list(build_query(self.memory_index.search(ids_only=True)))
+        self.assertEqual(sorted(stub_ids), sorted(memory_ids))
+        return memory_ids
+
+    def test_keywords(self):
+        self.assertSameResults(lambda q: q.keywords('die hard'))
+        self.assertSameResults(lambda q: q.keywords('alien'))
+        self.assertSameResults(lambda q: q.keywords('"die hard 2"'))
+        self.assertSameResults(lambda q: q.keywords('action'))
+
+    def test_exact_and_contains(self):
+        self.assertSameResults(lambda q: q.filter(title='die hard'))
+        self.assertSameResults(lambda q: q.filter(title__contains='hard die'))
+        self.assertSameResults(lambda q: q.filter(genre='action'))
+        self.assertSameResults(lambda q: q.filter(genre='Action'))
+
+    def test_numbers(self):
+        self.assertSameResults(lambda q: q.filter(rating__gt=8.4))
+        self.assertSameResults(lambda q: q.filter(rating__gte=8.4))
+        self.assertSameResults(lambda q: q.filter(year__lt=1988))
+        self.assertSameResults(lambda q: q.filter(year__lte=1988))
+        self.assertSameResults(lambda q: q.filter(year=1990))
+
+    def test_dates(self):
+        self.assertSameResults(lambda q: q.filter(released__gt=datetime.date(1986, 8, 29)))
+        self.assertSameResults(lambda q: q.filter(released__lte=datetime.date(1986, 8, 29)))
+
+    def test_connectors(self):
+        self.assertSameResults(
+            lambda q: q.filter(Q(genre='horror') | Q(rating__gt=9))
+        )
+        self.assertSameResults(
+            lambda q: q.filter(~Q(genre='action') & Q(year__gt=1980))
+        )
+        self.assertSameResults(
+            lambda q: q.keywords('die').filter(~Q(year=1990))
+        )
+        self.assertSameResults(
+            lambda q: q.filter(genre=['horror', 'family'])
+        )
+
+
+class TestMemoryGeoQuery(unittest.TestCase):
+    def test_distance(self):
+        index = Index('places', PlaceDocument, backend=MemoryBackend())
+        index.put([
+            PlaceDocument(doc_id='london', location=search_api.GeoPoint(51.507, -0.128)),
+            PlaceDocument(doc_id='paris', location=search_api.GeoPoint(48.857, 2.352)),
+        ])
+
+        # London to Paris is ~344km
+        query = index.search(ids_only=True)
+        near = query.filter(location__geo=GeoQueryArguments(51.5, -0.1, 10000))
+        far = query.filter(location__geo_lt=GeoQueryArguments(51.5, -0.1, 400000))
+        self.assertEqual(['london'], list(near))
+        self.assertEqual(['london', 'paris'], sorted(far))
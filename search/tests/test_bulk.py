@@ -0,0 +1,115 @@
+import unittest
+
+from google.appengine.api import search as search_api
+
+from ..backends.memory import MemoryBackend
+from ..bulk import BulkWriter
+from ..fields import TextField
+from ..indexes import DocumentModel, Index
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+
+
+def generate_documents(count):
+    for i in xrange(count):
+        yield FakeDocument(doc_id=str(i), foo='thing %s' % i)
+
+
+class CountingIndex(object):
+    """Wraps a backend index to keep track of how many puts are running. The
+    puts numbered in `errors` (counting from 0) fail with the exception
+    given for them there.
+    """
+    def __init__(self, index, errors=None):
+        self.index = index
+        self.errors = errors or {}
+        self.puts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def put_async(self, documents):
+        counter = self
+        future = self.index.put_async(documents)
+        error = self.errors.get(self.puts)
+        self.puts += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        class Future(object):
+            def get_result(self):
+                counter.in_flight -= 1
+                if error is not None:
+                    raise error
+                return future.get_result()
+        return Future()
+
+
+class TestBulkWriter(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('bulk', FakeDocument, backend=MemoryBackend())
+
+    def test_bulk_put(self):
+        results = self.index.bulk_put(generate_documents(450))
+
+        self.assertEqual([200, 200, 50], [len(r.doc_ids) for r in results])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(450, self.index.search().count())
+
+    def test_put_more_than_batch_limit(self):
+        results = self.index.put(list(generate_documents(250)))
+
+        self.assertEqual(250, len(results))
+        self.assertEqual(250, self.index.search().count())
+
+    def test_max_in_flight(self):
+        self.index._index = CountingIndex(self.index._index)
+        callback_results = []
+
+        with BulkWriter(self.index, batch_size=10, max_in_flight=3,
+                callback=callback_results.append) as writer:
+            writer.put_many(generate_documents(95))
+
+        self.assertEqual(3, self.index._index.max_in_flight)
+        self.assertEqual(0, self.index._index.in_flight)
+        self.assertEqual(10, len(writer.results))
+        self.assertEqual(writer.results, callback_results)
+
+    def test_errors(self):
+        class FailingIndex(object):
+            name = 'failing'
+
+            def put_async(self, documents):
+                raise search_api.TransientError('Oh no')
+
+        self.index._index = FailingIndex()
+
+        results = self.index.bulk_put(generate_documents(5))
+        self.assertFalse(results[0].ok)
+        self.assertEqual(['0', '1', '2', '3', '4'], results[0].doc_ids)
+
+        self.assertRaises(
+            search_api.TransientError,
+            self.index.put,
+            FakeDocument(doc_id='5')
+        )
+
+    def test_errors_raised_after_waiting(self):
+        for error in (search_api.TransientError('Oh no'), RuntimeError('Oh no')):
+            self.index._index = counter = CountingIndex(
+                self.index._index,
+                errors={0: error}
+            )
+            writer = BulkWriter(
+                self.index,
+                batch_size=10,
+                max_in_flight=3,
+                raise_errors=True
+            )
+            self.assertRaises(type(error), writer.put_many, generate_documents(50))
+
+            # The batches already sent were waited on, and no more were sent
+            self.assertEqual(0, counter.in_flight)
+            self.assertEqual(3, counter.puts)
+            self.index._index = counter.index
@@ -0,0 +1,238 @@
+import unittest
+
+from ..backends.memory import MemoryBackend
+from ..cache import (
+    MISSING,
+    DocumentCache,
+    LRUCache,
+    disable_document_cache,
+    disable_search_cache,
+    enable_document_cache,
+    enable_search_cache,
+)
+from ..fields import TextField
+from ..futures import CallbackFuture
+from ..indexes import DocumentModel, Index
+from ..loader import DocumentLoader
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+
+
+class CountingIndex(object):
+    """Wraps a backend index to count the get and search RPCs made to it"""
+    def __init__(self, index):
+        self.index = index
+        self.gets = 0
+        self.searches = 0
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def get(self, doc_id):
+        self.gets += 1
+        return self.index.get(doc_id)
+
+    def get_async(self, doc_id):
+        self.gets += 1
+        return self.index.get_async(doc_id)
+
+    def search_async(self, query, **kwargs):
+        self.searches += 1
+        return self.index.search_async(query, **kwargs)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get('a'))
+        self.assertIs(MISSING, cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_ttl(self):
+        now = [100]
+        cache = LRUCache(ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        self.assertEqual(1, cache.get('a'))
+
+        now[0] = 110
+        self.assertIs(MISSING, cache.get('a'))
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_bytes=10)
+        cache.set('a', 1, size=4)
+        cache.set('b', 2, size=4)
+        cache.set('c', 3, size=4)
+
+        self.assertIs(MISSING, cache.get('a'))
+        self.assertEqual(8, cache.size)
+
+        # Too big to cache at all
+        cache.set('b', 4, size=11)
+        self.assertIs(MISSING, cache.get('b'))
+        self.assertEqual(4, cache.size)
+
+    def test_stale_set_ignored(self):
+        cache = DocumentCache()
+        version = cache.version
+        cache.invalidate(['a'])
+        cache.set('a', 'old', version=version)
+        self.assertIs(MISSING, cache.get('a'))
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('cached', FakeDocument, backend=MemoryBackend())
+        self.index.put(FakeDocument(doc_id='a', foo='one'))
+        self.index._index = CountingIndex(self.index._index)
+        self.cache = enable_document_cache('cached')
+
+    def tearDown(self):
+        disable_document_cache('cached')
+
+    def test_get_cached(self):
+        self.assertEqual('one', self.index.get('a').foo)
+        self.assertEqual('one', self.index.get('a').foo)
+        self.assertEqual(1, self.index._index.gets)
+
+    def test_misses_cached(self):
+        self.assertIsNone(self.index.get('b'))
+        self.assertIsNone(self.index.get('b'))
+        self.assertEqual(1, self.index._index.gets)
+
+    def test_put_invalidates(self):
+        self.index.get('a')
+        self.index.get('b')
+        self.index.put([
+            FakeDocument(doc_id='a', foo='two'),
+            FakeDocument(doc_id='b', foo='three'),
+        ])
+
+        self.assertEqual('two', self.index.get('a').foo)
+        self.assertEqual('three', self.index.get('b').foo)
+        self.assertEqual(4, self.index._index.gets)
+
+    def test_delete_invalidates(self):
+        self.index.get('a')
+        self.index.delete('a')
+        self.assertIsNone(self.index.get('a'))
+
+    def test_delete_async_invalidates_when_done(self):
+        backend_index = self.index._index.index
+        # Deleted only once it's waited for
+        self.index._index.delete_async = lambda doc_ids: CallbackFuture(
+            lambda: backend_index.delete(doc_ids)
+        )
+
+        future = self.index.delete_async('a')
+        self.assertEqual('one', self.index.get('a').foo)
+        future.get_result()
+        self.assertIsNone(self.index.get('a'))
+
+    def test_shared_between_index_objects(self):
+        self.index.get('a')
+        other = Index('cached', FakeDocument, backend=self.index.backend)
+        other.put(FakeDocument(doc_id='a', foo='two'))
+        self.assertEqual('two', self.index.get('a').foo)
+
+
+class TestSearchResultCache(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('searched', FakeDocument, backend=MemoryBackend())
+        self.index.put([
+            FakeDocument(doc_id='a', foo='one'),
+            FakeDocument(doc_id='b', foo='two'),
+        ])
+        self.index._index = CountingIndex(self.index._index)
+        self.cache = enable_search_cache('searched')
+
+    def tearDown(self):
+        disable_search_cache('searched')
+
+    def search(self, query):
+        return [d.foo for d in query[:10]]
+
+    def test_search_cached(self):
+        self.assertEqual(['one'], self.search(self.index.search().keywords('one')))
+        self.assertEqual(['one'], self.search(self.index.search().keywords('one')))
+        self.assertEqual(1, self.index._index.searches)
+        self.assertEqual(1, len(self.cache))
+        self.assertTrue(self.cache.size > 0)
+
+    def test_options_in_key(self):
+        self.search(self.index.search())
+        self.search(self.index.search().order_by('-foo'))
+        self.search(self.index.search().keywords('one'))
+        self.assertEqual(
+            ['two', 'one'],
+            self.search(self.index.search().order_by('-foo'))
+        )
+        self.assertEqual(['one'], [d.foo for d in self.index.search()[:1]])
+        self.assertEqual(4, self.index._index.searches)
+
+    def test_writes_invalidate(self):
+        generation = self.index.generation
+        self.search(self.index.search())
+
+        other = Index('searched', FakeDocument, backend=self.index.backend)
+        other.put(FakeDocument(doc_id='c', foo='three'))
+        self.assertNotEqual(generation, self.index.generation)
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(3, len(self.search(self.index.search())))
+
+        self.index.delete('c')
+        self.assertEqual(2, len(self.search(self.index.search())))
+
+        self.index.purge()
+        self.assertEqual([], self.search(self.index.search()))
+        self.assertEqual(4, self.index._index.searches)
+
+
+class TestDocumentLoader(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('loader', FakeDocument, backend=MemoryBackend())
+        self.index.put([
+            FakeDocument(doc_id=doc_id, foo=doc_id * 2)
+            for doc_id in ('a', 'b', 'c')
+        ])
+        self.index._index = CountingIndex(self.index._index)
+
+    def test_load(self):
+        loader = DocumentLoader(self.index)
+        a = loader.load('a')
+        b = loader.load('b')
+        missing = loader.load('ab')
+        self.assertEqual(0, self.index._index.gets)
+
+        self.assertEqual('aa', a.get_result().foo)
+        self.assertEqual(3, self.index._index.gets)
+        self.assertEqual('bb', b.get_result().foo)
+        self.assertIsNone(missing.get_result())
+        self.assertEqual(3, self.index._index.gets)
+
+    def test_get_many_memoized(self):
+        loader = DocumentLoader(self.index)
+        docs = loader.get_many(['c', 'a', 'c'])
+        self.assertEqual(['cc', 'aa', 'cc'], [d.foo for d in docs])
+        self.assertEqual(2, self.index._index.gets)
+
+        self.assertEqual('aa', loader.get('a').foo)
+        self.assertEqual(2, self.index._index.gets)
+
+    def test_uses_document_cache(self):
+        enable_document_cache('loader')
+        try:
+            self.index.get('a')
+            DocumentLoader(self.index).get_many(['a', 'b'])
+            self.assertEqual(2, self.index._index.gets)
+            self.assertEqual('bb', self.index.get('b').foo)
+            self.assertEqual(2, self.index._index.gets)
+        finally:
+            disable_document_cache('loader')
@@ -49,6 +49,28 @@ class TestBaseField(Base, unittest.TestCase):
         self.assertEqual(f.cls_name, 'FakeDocument')
 
 
+    def test_facet(self):
+        f = self.new_field(fields.AtomField, facet=True)
+        facet = f.to_search_facet(f.to_search_value('red'))
+        self.assertEqual(('test_field', 'red'), (facet.name, facet.value))
+        self.assertIsNone(f.to_search_facet(f.to_search_value(None)))
+
+        # Too long to be an atom
+        f = self.new_field(fields.TextField, facet=True)
+        self.assertEqual(u'\u2603' * 166, f.to_search_facet(u'\u2603' * 166).value)
+        self.assertIsNone(f.to_search_facet(u'\u2603' * 167))
+        self.assertIsNone(f.to_search_facet('x' * 501))
+
+        f = self.new_field(fields.IntegerField, facet=True)
+        self.assertEqual(5, f.to_search_facet(f.to_search_value(5)).value)
+
+        self.assertRaises(errors.FieldError, fields.DateField, facet=True)
+        self.assertRaises(
+            errors.FieldError,
+            fields.TextField, indexer=indexers.contains, facet=True
+        )
+
+
 class TestTextField(Base, unittest.TestCase):
     field_class = fields.TextField
 
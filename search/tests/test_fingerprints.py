@@ -0,0 +1,118 @@
+import unittest
+
+from google.appengine.api import search as search_api
+
+from ..backends.memory import MemoryBackend
+from ..fields import IntegerField, TextField
+from ..fingerprints import MemoryFingerprintStore, fingerprint
+from ..indexes import DocumentModel, Index
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+    bar = IntegerField()
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('fingerprints', backend=MemoryBackend())
+
+    def get_fingerprint(self, **kwargs):
+        document = FakeDocument(doc_id='1', **kwargs)
+        return fingerprint(
+            self.index.to_search_document(document),
+            rank=document._rank
+        )
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            self.get_fingerprint(foo=u'\u2603', bar=1),
+            self.get_fingerprint(foo=u'\u2603', bar=1)
+        )
+        self.assertNotEqual(
+            self.get_fingerprint(foo=u'\u2603', bar=1),
+            self.get_fingerprint(foo=u'\u2603', bar=2)
+        )
+        self.assertNotEqual(
+            self.get_fingerprint(foo=u'1', bar=1),
+            self.get_fingerprint(foo=u'1', bar=1, _rank=5)
+        )
+
+
+class CountingFingerprintStore(MemoryFingerprintStore):
+    """Records the calls made to the store"""
+    def __init__(self, *args, **kwargs):
+        super(CountingFingerprintStore, self).__init__(*args, **kwargs)
+        self.calls = []
+
+    def get_many(self, index_name, doc_ids):
+        self.calls.append('get_many')
+        return super(CountingFingerprintStore, self).get_many(index_name, doc_ids)
+
+    def set_many(self, index_name, fingerprints):
+        self.calls.append('set_many')
+        return super(CountingFingerprintStore, self).set_many(index_name, fingerprints)
+
+    def delete_many(self, index_name, doc_ids):
+        self.calls.append('delete_many')
+        return super(CountingFingerprintStore, self).delete_many(index_name, doc_ids)
+
+
+class TestSkipUnchanged(unittest.TestCase):
+    def setUp(self):
+        self.store = CountingFingerprintStore()
+        self.index = Index(
+            'fingerprints',
+            FakeDocument,
+            backend=MemoryBackend(),
+            fingerprint_store=self.store
+        )
+
+    def test_skips_unchanged(self):
+        self.assertEqual(2, len(self.index.put([
+            FakeDocument(doc_id='1', foo='one'),
+            FakeDocument(doc_id='2', foo='two'),
+        ])))
+
+        results = self.index.put([
+            FakeDocument(doc_id='1', foo='one'),
+            FakeDocument(doc_id='2', foo='three'),
+        ])
+        self.assertEqual(['2'], [r.id for r in results])
+        self.assertEqual(3, self.index.documents_written)
+        self.assertEqual(1, self.index.documents_skipped)
+        self.assertEqual('three', self.index.get('2').foo)
+
+        self.index.put(FakeDocument(doc_id='1', foo='one'), skip_unchanged=False)
+        self.assertEqual(4, self.index.documents_written)
+
+    def test_delete_forgets_fingerprint(self):
+        self.index.put(FakeDocument(doc_id='1', foo='one'))
+        self.index.delete('1')
+        self.index.put(FakeDocument(doc_id='1', foo='one'))
+
+        self.assertEqual(0, self.index.documents_skipped)
+        self.assertEqual('one', self.index.get('1').foo)
+
+    def test_failed_put_not_fingerprinted(self):
+        class FailingIndex(object):
+            name = 'failing'
+
+            def put_async(self, documents):
+                raise search_api.TransientError('Oh no')
+
+        backend_index, self.index._index = self.index._index, FailingIndex()
+        self.index.bulk_put([FakeDocument(doc_id='1', foo='one')])
+
+        self.index._index = backend_index
+        self.index.put(FakeDocument(doc_id='1', foo='one'))
+        self.assertEqual(0, self.index.documents_skipped)
+        self.assertEqual(1, self.index.documents_written)
+
+    def test_one_round_trip_per_batch(self):
+        self.index.put([FakeDocument(doc_id=str(i), foo='one') for i in range(3)])
+        self.assertEqual(['get_many', 'set_many'], self.store.calls)
+
+        del self.store.calls[:]
+        self.index.put(FakeDocument(doc_id='1', foo='two'), skip_unchanged=False)
+        self.assertEqual(['delete_many'], self.store.calls)
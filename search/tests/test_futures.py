@@ -0,0 +1,81 @@
+import unittest
+
+from google.appengine.api import search as search_api
+
+from ..backends.memory import MemoryBackend
+from ..fields import IntegerField, TextField
+from ..futures import CallbackFuture, DoneFuture, MappedFuture, wait_all
+from ..indexes import DocumentModel, Index
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+    number = IntegerField()
+
+
+class TestFutures(unittest.TestCase):
+    def test_result_computed_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'result'
+
+        future = MappedFuture(CallbackFuture(compute), lambda r: r.upper())
+        self.assertFalse(future.done())
+        self.assertEqual('RESULT', future.get_result())
+        self.assertEqual('RESULT', future.get_result())
+        self.assertTrue(future.done())
+        self.assertEqual(1, len(calls))
+
+    def test_wait_all(self):
+        waited = []
+
+        def fail():
+            waited.append('fail')
+            raise search_api.TransientError('Oh no')
+
+        def succeed():
+            waited.append('succeed')
+            return 2
+
+        self.assertEqual([1, 2], wait_all([DoneFuture(1), CallbackFuture(succeed)]))
+        self.assertRaises(
+            search_api.TransientError,
+            wait_all, [CallbackFuture(fail), CallbackFuture(succeed)]
+        )
+        # Everything is waited on before the failure is raised
+        self.assertEqual(['succeed', 'fail', 'succeed'], waited)
+
+
+class TestIndexAsync(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('async', FakeDocument, backend=MemoryBackend())
+        self.index.put([
+            FakeDocument(doc_id=str(i), foo='thing', number=i) for i in range(10)
+        ])
+
+    def test_put_get_delete(self):
+        future = self.index.put_async(FakeDocument(doc_id='new', foo='new'))
+        self.assertEqual(['new'], [r.id for r in future.get_result()])
+
+        a, missing = wait_all([
+            self.index.get_async('new'),
+            self.index.get_async('missing'),
+        ])
+        self.assertEqual('new', a.foo)
+        self.assertIsNone(missing)
+
+        self.index.delete_async('new').get_result()
+        self.assertIsNone(self.index.get_async('new').get_result())
+
+    def test_fetch_async(self):
+        queries = [
+            self.index.search().filter(number__lt=5).order_by('number'),
+            self.index.search().filter(number__gte=8).order_by('number')[:1],
+        ]
+        low, high = wait_all([q.fetch_async() for q in queries])
+        self.assertEqual(range(5), [d.number for d in low])
+        self.assertEqual([8], [d.number for d in high])
+        self.assertEqual([5, 2], wait_all([q.count_async() for q in queries]))
+        self.assertEqual(low, list(queries[0]))
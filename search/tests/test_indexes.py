@@ -0,0 +1,279 @@
+import datetime
+import pickle
+import unittest
+
+from google.appengine.api import search as search_api
+
+from .. import fields, indexers
+from ..backends.memory import MemoryBackend
+from ..indexes import UNSET, DocumentModel, Index, compile_serializer
+
+
+class FakeDocument(DocumentModel):
+    foo = fields.TextField()
+
+
+class EverythingDocument(DocumentModel):
+    text = fields.TextField()
+    indexed = fields.TextField(indexer=indexers.startswith)
+    html = fields.HtmlField()
+    atom = fields.AtomField()
+    number = fields.IntegerField()
+    real = fields.FloatField()
+    boolean = fields.BooleanField()
+    date = fields.DateField()
+    timestamp = fields.DateTimeField()
+    geo = fields.GeoField()
+
+
+class TestIterDocuments(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('iter', FakeDocument, backend=MemoryBackend())
+        self.index.put([
+            FakeDocument(doc_id='%03d' % i, foo='thing %s' % i)
+            for i in range(25)
+        ])
+
+    def test_iter_documents(self):
+        docs = list(self.index.iter_documents(page_size=10))
+        self.assertEqual(25, len(docs))
+        self.assertIsInstance(docs[0], FakeDocument)
+        self.assertEqual('thing 24', docs[-1].foo)
+
+    def test_ids_only(self):
+        doc_ids = list(self.index.iter_documents(page_size=5, ids_only=True))
+        self.assertEqual(['%03d' % i for i in range(25)], doc_ids)
+
+    def test_prefetches_next_page(self):
+        fetched = []
+        get_range_async = self.index._index.get_range_async
+
+        def counting_get_range_async(**kwargs):
+            fetched.append(kwargs['start_id'])
+            return get_range_async(**kwargs)
+
+        self.index._index.get_range_async = counting_get_range_async
+
+        documents = self.index.iter_documents(page_size=10, ids_only=True)
+        next(documents)
+        self.assertEqual([None, '009'], fetched)
+
+        list(documents)
+        self.assertEqual([None, '009', '019'], fetched)
+
+    def test_purge(self):
+        self.index.put([
+            FakeDocument(doc_id='more%03d' % i) for i in range(400)
+        ])
+        self.index.purge()
+        self.assertEqual([], list(self.index.iter_documents()))
+
+
+class TestSerializer(unittest.TestCase):
+    def get_values(self, search_document):
+        return sorted(
+            (f.name, type(f), f.value) for f in search_document.fields
+        )
+
+    def test_trusted_matches_checked(self):
+        documents = [
+            EverythingDocument(
+                doc_id='1',
+                text=u'\u2603 snowman',
+                indexed='indexed',
+                html='<b>hi</b>',
+                atom='atom',
+                number=5,
+                real=1.5,
+                boolean=True,
+                date=datetime.date(2016, 1, 2),
+                timestamp=datetime.datetime(2016, 1, 2, 3, 4, 5),
+                geo=search_api.GeoPoint(51.5, -0.1),
+                _rank=10
+            ),
+            EverythingDocument(doc_id='2', geo=search_api.GeoPoint(0, 0)),
+        ]
+        meta = EverythingDocument._meta
+        trusted = compile_serializer(meta, trusted=True)
+        checked = compile_serializer(meta, trusted=False)
+
+        for document in documents:
+            self.assertEqual(
+                self.get_values(checked(document)),
+                self.get_values(trusted(document))
+            )
+        self.assertEqual(10, trusted(documents[0]).rank)
+
+    def test_overridden_getattribute_not_trusted(self):
+        class UpperDocument(FakeDocument):
+            def __setattr__(self, name, value):
+                if name == 'foo' and value:
+                    value = value.upper()
+                super(UpperDocument, self).__setattr__(name, value)
+
+        class LowerDocument(FakeDocument):
+            def __getattribute__(self, name):
+                value = super(LowerDocument, self).__getattribute__(name)
+                return value.lower() if name == 'foo' else value
+
+        self.assertTrue(FakeDocument._meta.trusted)
+        # Values set through an overridden __setattr__ still go through the
+        # field descriptors, so they can be trusted
+        self.assertTrue(UpperDocument._meta.trusted)
+        self.assertFalse(LowerDocument._meta.trusted)
+
+        search_document = UpperDocument._meta.serializer(UpperDocument(foo='foo'))
+        self.assertEqual('FOO', search_document.field('foo').value)
+
+    def test_add_field(self):
+        class Document(DocumentModel):
+            foo = fields.TextField()
+
+        Document._meta.serializer
+        Document._meta.add_field('bar', fields.TextField())
+
+        document = Document(foo='foo')
+        document.bar = 'bar'
+        search_document = Index('serializer').to_search_document(document)
+        self.assertEqual(['bar', 'foo'], sorted(f.name for f in search_document.fields))
+
+
+class TestLazyResults(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('lazy', EverythingDocument, backend=MemoryBackend())
+        self.index.put([
+            EverythingDocument(
+                doc_id=str(i),
+                text=u'\u2603 snowman %s' % i,
+                number=i,
+                date=datetime.date(2016, 1, i + 1),
+                geo=search_api.GeoPoint(0, 0)
+            )
+            for i in range(5)
+        ])
+
+    def test_matches_eager(self):
+        eager = list(self.index.search().order_by('number'))
+        lazy = list(self.index.search(lazy=True).order_by('number'))
+        self.assertEqual([d.doc_id for d in eager], [d.doc_id for d in lazy])
+
+        for e, l in zip(eager, lazy):
+            self.assertIsInstance(l, EverythingDocument)
+            for name in EverythingDocument._meta.fields:
+                self.assertEqual(getattr(e, name), getattr(l, name))
+
+    def test_converted_on_access(self):
+        document = self.index.search().lazy().filter(number=3)[0]
+        self.assertEqual(
+            [True] * len(document._values),
+            [value is UNSET for value in document._values]
+        )
+        self.assertEqual(datetime.date(2016, 1, 4), document.date)
+        self.assertEqual(
+            1, len([value for value in document._values if value is not UNSET])
+        )
+
+        document.number = 10
+        self.assertEqual(10, document.number)
+
+    def test_snippets(self):
+        document = self.index.search().lazy().keywords('snowman').snippet('text')[0]
+        self.assertIn('snowman', document.get_snippets()['text'])
+
+    def test_put_again(self):
+        document = self.index.search().lazy().filter(number=1)[0]
+        document.number = 100
+        self.index.put(document)
+
+        document = self.index.get('1')
+        self.assertEqual(100, document.number)
+        self.assertEqual(u'\u2603 snowman 1', document.text)
+        self.assertEqual(datetime.date(2016, 1, 2), document.date)
+
+
+class SlottedDocument(DocumentModel):
+    class Meta:
+        slots = True
+
+    name = fields.TextField()
+    number = fields.IntegerField()
+
+
+class TestFieldDescriptors(unittest.TestCase):
+    def test_class_attribute(self):
+        self.assertRaises(AttributeError, getattr, FakeDocument, 'foo')
+        self.assertIs(fields.TextField, type(FakeDocument._meta.fields['foo']))
+
+    def test_conversion_cached(self):
+        calls = []
+
+        class CountingField(fields.IntegerField):
+            def to_python(self, value):
+                calls.append(value)
+                return super(CountingField, self).to_python(value)
+
+        class Document(DocumentModel):
+            number = CountingField()
+
+        document = Document(number='5')
+        self.assertEqual(5, document.number)
+        self.assertEqual(5, document.number)
+        self.assertEqual([5], calls)
+
+        document.number = 6
+        self.assertEqual(6, document.number)
+        self.assertEqual([5, 6], calls)
+
+    def test_delete(self):
+        document = FakeDocument(foo='foo')
+        del document.foo
+        self.assertRaises(AttributeError, getattr, document, 'foo')
+        search_document = Index('descriptors').to_search_document(document)
+        self.assertEqual(u'___NONE___', search_document.field('foo').value)
+
+    def test_inherited_fields(self):
+        class Child(FakeDocument):
+            bar = fields.IntegerField()
+
+        child = Child(foo='foo', bar=1)
+        self.assertEqual(('foo', 1), (child.foo, child.bar))
+        self.assertEqual('foo', FakeDocument(foo='foo').foo)
+
+    def test_slots(self):
+        document = SlottedDocument(doc_id='1', name='name', number=1)
+        self.assertFalse(hasattr(document, '__dict__'))
+        self.assertRaises(AttributeError, setattr, document, 'other', 1)
+        self.assertEqual(('name', 1), (document.name, document.number))
+        self.assertEqual({}, document.get_snippets())
+        self.assertEqual({'name': 'name', 'number': 1}, document.snippet_or_value())
+
+        # Subclasses that don't ask for slots get a __dict__ back
+        class Document(SlottedDocument):
+            pass
+        Document().other = 1
+
+    def test_pickle(self):
+        documents = [
+            FakeDocument(doc_id='1', foo=u'\u2603'),
+            SlottedDocument(doc_id='2', name='name', number=2),
+        ]
+        for protocol in (0, 2):
+            for document in documents:
+                unpickled = pickle.loads(pickle.dumps(document, protocol))
+                self.assertIs(type(document), type(unpickled))
+                self.assertEqual(document.doc_id, unpickled.doc_id)
+                self.assertEqual(document.snippet_or_value(), unpickled.snippet_or_value())
+
+    def test_pickle_lazy(self):
+        index = Index('pickle', EverythingDocument, backend=MemoryBackend())
+        index.put(EverythingDocument(
+            doc_id='1', text=u'\u2603 snowman', number=1, geo=search_api.GeoPoint(0, 0)
+        ))
+        document = index.search().lazy().keywords('snowman').snippet('text')[0]
+
+        for protocol in (0, 2):
+            unpickled = pickle.loads(pickle.dumps(document, protocol))
+            self.assertIsNone(getattr(unpickled, '_source', None))
+            self.assertEqual(u'\u2603 snowman', unpickled.text)
+            self.assertEqual(1, unpickled.number)
+            self.assertIn('snowman', unpickled.get_snippets()['text'])
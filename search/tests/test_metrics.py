@@ -0,0 +1,160 @@
+import socket
+import unittest
+
+from google.appengine.api import search as search_api
+
+from ..backends.memory import MemoryBackend
+from ..fields import IntegerField, TextField
+from ..indexes import DocumentModel, Index
+from ..metrics import (
+    HistogramAggregator,
+    LatencyHistogram,
+    MetricsHook,
+    RPCEvent,
+    StatsdExporter,
+    register_hook,
+    unregister_hook,
+)
+from ..sharding import ShardedIndex
+
+
+class FakeDocument(DocumentModel):
+    name = TextField()
+    number = IntegerField()
+
+
+class RecordingHook(MetricsHook):
+    def __init__(self):
+        self.before_events = []
+        self.after_events = []
+
+    def before(self, event):
+        self.before_events.append((event.operation, event.batch_size, event.latency))
+
+    def after(self, event):
+        self.after_events.append(
+            (event.index_name, event.operation, event.batch_size, event.documents, event.error)
+        )
+        assert event.latency >= 0
+
+
+class TestHooks(unittest.TestCase):
+    def setUp(self):
+        self.hook = register_hook(RecordingHook())
+        self.index = Index('metered', FakeDocument, backend=MemoryBackend())
+
+    def tearDown(self):
+        unregister_hook(self.hook)
+
+    def test_rpcs(self):
+        self.index.put([FakeDocument(doc_id=str(i), number=i) for i in range(5)])
+        self.index.get('1')
+        list(self.index.search().filter(number__lt=3)[:10])
+        self.index.get_range(limit=2)
+        self.index.delete(['1', '2'])
+
+        self.assertEqual([
+            ('metered', 'put', 5, 5, None),
+            ('metered', 'get', 1, 1, None),
+            ('metered', 'search', 10, 3, None),
+            ('metered', 'get_range', 2, 2, None),
+            ('metered', 'delete', 2, 2, None),
+        ], self.hook.after_events)
+        self.assertEqual(
+            [(operation, batch_size, None) for _, operation, batch_size, _, _ in self.hook.after_events],
+            self.hook.before_events
+        )
+
+    def test_errors(self):
+        docs = [search_api.Document(doc_id=str(i)) for i in range(201)]
+        self.assertRaises(ValueError, self.index._index.put, docs)
+        self.assertRaises(ValueError, self.index._index.put_async, docs)
+        self.assertEqual(
+            [('metered', 'put', 201, None, 'ValueError')] * 2,
+            self.hook.after_events
+        )
+
+    def test_broken_hook(self):
+        class BrokenHook(MetricsHook):
+            def after(self, event):
+                raise ValueError()
+
+        hook = register_hook(BrokenHook())
+        try:
+            self.index.put(FakeDocument(doc_id='1'))
+        finally:
+            unregister_hook(hook)
+        self.assertEqual(1, len(self.hook.after_events))
+
+    def test_sharded(self):
+        index = ShardedIndex('metered', FakeDocument, backend=MemoryBackend(), shards=3)
+        index.put([FakeDocument(doc_id=str(i), number=i) for i in range(5)])
+        list(index.search()[:20])
+        self.assertEqual([
+            ('metered', 'put', 5, 5, None),
+            ('metered', 'search', 20, 5, None),
+        ], self.hook.after_events)
+
+
+class TestHistograms(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+        for latency in range(1, 101):
+            histogram.add(float(latency))
+
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(50.5, histogram.mean)
+        for percent in (50, 95, 99):
+            self.assertTrue(
+                percent <= histogram.percentile(percent) <= percent * histogram.GROWTH
+            )
+        self.assertEqual(100, histogram.percentile(100))
+
+    def test_aggregator(self):
+        aggregator = HistogramAggregator()
+        for latency in (0.010, 0.020, 0.030):
+            event = RPCEvent('films', 'search', 20)
+            event.latency = latency
+            event.documents = 20
+            aggregator.after(event)
+
+        percentiles = aggregator.percentiles('films', 'search')
+        self.assertEqual(['p50', 'p95', 'p99'], sorted(percentiles))
+        self.assertAlmostEqual(20, percentiles['p50'], delta=2)
+        self.assertAlmostEqual(30, percentiles['p99'], delta=0.001)
+        self.assertEqual(60, aggregator.get_histogram('films', 'search').documents)
+        self.assertEqual({'p50': None}, aggregator.percentiles('films', 'put', (50,)))
+
+
+class TestStatsdExporter(unittest.TestCase):
+    def setUp(self):
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(('127.0.0.1', 0))
+        self.sink.settimeout(5)
+        self.exporter = StatsdExporter(*self.sink.getsockname())
+
+    def tearDown(self):
+        self.exporter.close()
+        self.sink.close()
+
+    def test_export(self):
+        event = RPCEvent(u'films \u2603', 'search', 20)
+        event.latency = 0.0123
+        event.documents = 20
+        event.error = 'Timeout'
+        self.exporter.after(event)
+
+        self.assertEqual(
+            'search.films__.search.latency:12.300|ms\n'
+            'search.films__.search.calls:1|c\n'
+            'search.films__.search.documents:20|c\n'
+            'search.films__.search.errors.Timeout:1|c',
+            self.sink.recv(4096)
+        )
+
+    def test_unreachable(self):
+        self.exporter.address = ('256.0.0.1', 8125)
+        event = RPCEvent('films', 'put', 1)
+        event.latency = 0.001
+        self.exporter.after(event)
@@ -0,0 +1,136 @@
+import threading
+import time
+import unittest
+
+from ..backends.memory import MemoryBackend
+from ..fields import TextField
+from ..indexes import DocumentModel
+from ..pool import IndexPool, LimitedIndex, RPCLimiter
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+
+
+class SlowIndex(object):
+    """Fake backend index which records how many searches run at once"""
+    name = 'slow'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def search(self, query):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return query
+
+
+class TestIndexPool(unittest.TestCase):
+    def test_reuses_indexes(self):
+        backend = MemoryBackend()
+        pool = IndexPool()
+
+        index = pool.get('foo', backend=backend)
+        self.assertIs(index, pool.get('foo', backend=backend))
+        self.assertIsNot(index, pool.get('bar', backend=backend))
+        self.assertIsNot(index, pool.get('foo', backend=MemoryBackend()))
+
+        pool.clear()
+        self.assertIsNot(index, pool.get('foo', backend=backend))
+
+    def test_limited_index(self):
+        pool = IndexPool(max_concurrent_rpcs=2)
+        index = pool.get('foo', backend=MemoryBackend())
+        self.assertIsInstance(index._index, LimitedIndex)
+        self.assertEqual(2, index._index.limiter.max_concurrent)
+
+        # More batches in flight than the limiter allows mustn't deadlock
+        index.bulk_put(
+            (FakeDocument(doc_id=str(i), foo='bar') for i in range(50)),
+            batch_size=5,
+            max_in_flight=4
+        )
+        self.assertEqual(50, index.search(FakeDocument).count())
+
+
+class TestRPCLimiter(unittest.TestCase):
+    def test_limits_across_threads(self):
+        slow_index = SlowIndex()
+        index = LimitedIndex(slow_index, RPCLimiter(3))
+
+        threads = [
+            threading.Thread(target=index.search, args=('query',))
+            for i in range(12)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(3, slow_index.max_running)
+
+    def test_async_results_kept(self):
+        limiter = RPCLimiter(1)
+        backend_index = MemoryBackend().get_index('foo')
+        index = LimitedIndex(backend_index, limiter)
+
+        first = index.get_range_async()
+        # Starting a second RPC makes the first one finish to free its slot
+        second = index.search_async('foo')
+        self.assertEqual(0, len(first.get_result()))
+        self.assertEqual(0, second.get_result().number_found)
+
+    def test_dropped_future_frees_slot(self):
+        limiter = RPCLimiter(1)
+        index = LimitedIndex(MemoryBackend().get_index('foo'), limiter)
+
+        index.get_range_async()
+        # The future was never waited on, so it can't be holding the slot
+        self.assertTrue(limiter._semaphore.acquire(False))
+        limiter.release()
+
+
+class TestAbandonedIterators(unittest.TestCase):
+    def setUp(self):
+        self.index = IndexPool(max_concurrent_rpcs=1).get(
+            'foo', backend=MemoryBackend()
+        )
+        self.index.put([
+            FakeDocument(doc_id=str(i), foo='bar') for i in range(10)
+        ])
+
+    def assertSlotFreed(self, abandon):
+        thread = threading.Thread(target=abandon)
+        thread.start()
+        thread.join()
+
+        # Another thread has no RPCs of its own to wait on, so it'd wait
+        # forever on a slot the first thread didn't give back
+        getter = threading.Thread(target=self.index.get, args=('1', FakeDocument))
+        getter.daemon = True
+        getter.start()
+        getter.join(5)
+        self.assertFalse(getter.is_alive())
+
+    def test_iter_documents(self):
+        def abandon():
+            documents = self.index.iter_documents(FakeDocument, page_size=3)
+            next(documents)
+        self.assertSlotFreed(abandon)
+
+    def test_query_iterator(self):
+        def abandon():
+            results = self.index.search(FakeDocument).iterator(chunk_size=3)
+            next(results)
+        self.assertSlotFreed(abandon)
+
+    def test_fetch_async(self):
+        def abandon():
+            self.index.search(FakeDocument).fetch_async()
+        self.assertSlotFreed(abandon)
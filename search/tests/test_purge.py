@@ -0,0 +1,67 @@
+import unittest
+
+from ..backends.memory import MemoryBackend
+from ..fields import TextField
+from ..indexes import DocumentModel, Index
+from ..purge import Purger
+
+
+class FakeDocument(DocumentModel):
+    foo = TextField()
+
+
+class TestPurger(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('purge', FakeDocument, backend=MemoryBackend())
+        self.index.bulk_put(
+            FakeDocument(doc_id='%04d' % i) for i in range(1050)
+        )
+
+    def test_purge(self):
+        checkpoints = []
+        result = self.index.purge(checkpoint=checkpoints.append)
+
+        self.assertTrue(result.finished)
+        self.assertEqual(1050, result.deleted)
+        self.assertEqual('1049', result.last_id)
+        self.assertEqual(['0199', '0399', '0599', '0799', '0999', '1049'], checkpoints)
+        self.assertEqual([], self.index.get_range())
+
+    def test_deadline_and_resume(self):
+        now = [0]
+
+        def clock():
+            now[0] += 1
+            return now[0]
+
+        result = Purger(self.index, batch_size=100, deadline=2, clock=clock).run()
+        self.assertFalse(result.finished)
+        self.assertEqual(200, result.deleted)
+        self.assertEqual('0199', result.last_id)
+        self.assertEqual('0200', self.index.get_range(ids_only=True, limit=1)[0])
+
+        result = Purger(self.index, start_id=result.last_id).run()
+        self.assertTrue(result.finished)
+        self.assertEqual(850, result.deleted)
+        self.assertEqual([], self.index.get_range())
+
+    def test_max_in_flight(self):
+        in_flight = []
+        max_in_flight = [0]
+        delete_async = self.index._index.delete_async
+
+        def counting_delete_async(doc_ids):
+            future = delete_async(doc_ids)
+            in_flight.append(future)
+            max_in_flight[0] = max(max_in_flight[0], len(in_flight))
+
+            class Future(object):
+                def get_result(self):
+                    in_flight.remove(future)
+                    return future.get_result()
+            return Future()
+
+        self.index._index.delete_async = counting_delete_async
+        Purger(self.index, batch_size=50, max_in_flight=3).run()
+        self.assertEqual(3, max_in_flight[0])
+        self.assertEqual([], in_flight)
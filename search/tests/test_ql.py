@@ -1,6 +1,7 @@
 import datetime
 import unittest
 
+from search.errors import BadValueError
 from search.ql import Query, Q, GeoQueryArguments
 from search.fields import TextField, GeoField, DateField
 from search.indexes import DocumentModel
@@ -47,7 +48,7 @@ class TestQuery(unittest.TestCase):
         query.add_q(q_2, conn=Q.OR)
 
         self.assertEqual(
-            u'((foo:"42") OR (foo:"128"))',
+            u'(foo:("42" OR "128"))',
             unicode(query))
 
 class TestGeoQuery(unittest.TestCase):
@@ -108,3 +109,140 @@ class TestDateQuery(unittest.TestCase):
         self.assertEqual(
             u"(bar > {0} AND NOT bar:{1})".format(today.isoformat(), DateField().none_value()),
             unicode(query))
+
+
+class TestCompiledQuery(unittest.TestCase):
+    def test_compiled_once(self):
+        query = Query(FakeDocument)
+        query.add_q(Q(foo='a') | Q(foo='b'))
+        compiled = query.build_query()
+        self.assertIs(compiled, query.build_query())
+
+    def test_invalidated(self):
+        query = Query(FakeDocument)
+        query.add_q(Q(foo='a'))
+        self.assertEqual(u'(foo:"a")', unicode(query))
+
+        query.add_keywords("hello")
+        self.assertEqual(u'hello AND (foo:"a")', unicode(query))
+
+        query.add_q(Q(foo='b'))
+        self.assertEqual(u'hello AND (foo:"a" AND foo:"b")', unicode(query))
+
+    def test_clones_independent(self):
+        query = Query(FakeDocument)
+        query.add_keywords("hello")
+        unicode(query)
+
+        clone = query._clone()
+        clone.add_keywords("world")
+        self.assertEqual(u"hello", unicode(query))
+        self.assertEqual(u"hello world", unicode(clone))
+
+    def test_conversions_memoized(self):
+        calls = []
+
+        class CountingField(TextField):
+            def prep_value_for_filter(self, value, **kwargs):
+                calls.append(value)
+                return super(CountingField, self).prep_value_for_filter(
+                    value, **kwargs
+                )
+
+        class Document(DocumentModel):
+            foo = CountingField()
+
+        for _ in range(3):
+            query = Query(Document)
+            query.add_q(Q(foo=u'\u2603'))
+            self.assertEqual(u'(foo:"\u2603")', query.build_query())
+        self.assertEqual([u'\u2603'], calls)
+
+        query.add_q(Q(foo=u'snowman'))
+        query.build_query()
+        self.assertEqual([u'\u2603', u'snowman'], calls)
+
+
+class TestNormalization(unittest.TestCase):
+    def unparse(self, q):
+        query = Query(FakeDocument)
+        query.add_q(q)
+        return query.build_query()
+
+    def test_list_values_folded(self):
+        self.assertEqual(
+            u'(foo:("a" OR "b" OR "c"))',
+            self.unparse(Q(foo=['a', 'b', 'a', 'c']))
+        )
+
+    def test_empty_list(self):
+        self.assertRaises(BadValueError, Q, foo=[])
+        self.assertRaises(BadValueError, Q, foo__in=iter([]))
+
+    def test_flattened(self):
+        q = Q(foo='a')
+        for i in range(2000):
+            q |= Q(foo=str(i))
+        compiled = self.unparse(q & Q(bar__lt=datetime.date(2016, 1, 1)))
+        self.assertTrue(compiled.startswith(u'(foo:("a" OR "0" OR "1" OR '))
+        self.assertTrue(compiled.endswith(u'"1999") AND bar < 2016-01-01)'))
+
+    def test_duplicates_dropped(self):
+        self.assertEqual(
+            u'(foo:"a" AND foo:"b")',
+            self.unparse(Q(foo='a') & Q(foo='b') & Q(foo='a'))
+        )
+
+    def test_mixed_or(self):
+        date = datetime.date(2016, 1, 1)
+        self.assertEqual(
+            u'(foo:("a" OR "b") OR (bar > 2016-01-01 AND NOT bar:9999-12-31) OR foo:(c))',
+            self.unparse(
+                Q(foo='a') | Q(bar__gt=date) | Q(foo__contains='c') | Q(foo='b')
+            )
+        )
+
+    def test_inverted(self):
+        self.assertEqual(
+            u'(foo:"a" AND NOT (foo:"b" AND foo:"c"))',
+            self.unparse(Q(foo='a') & ~(Q(foo='b') & Q(foo='c')))
+        )
+        self.assertEqual(
+            u'NOT (foo:("b" OR "c"))',
+            self.unparse(~Q(foo=['b', 'c']))
+        )
+
+
+class TestSplit(unittest.TestCase):
+    def test_short_enough(self):
+        query = Query(FakeDocument)
+        query.add_q(Q(foo=['a', 'b']))
+        self.assertEqual([query], query.split(100))
+
+    def test_split_largest_group(self):
+        query = Query(FakeDocument)
+        query.add_keywords("hello")
+        query.add_q(Q(foo=['a%02d' % i for i in range(20)]))
+        query.add_q(Q(foo=['b', 'c']), conn=Q.OR)
+        query.add_q(~Q(foo=['d', 'e']))
+
+        queries = query.split(100)
+        self.assertTrue(len(queries) > 1)
+        self.assertTrue(all(len(str(q)) <= 100 for q in queries))
+        self.assertEqual(
+            u'hello AND (foo:("a00" OR "a01" OR "a02" OR "a03" OR "a04")'
+            u' AND NOT (foo:("d" OR "e")))',
+            queries[0].build_query()
+        )
+        self.assertEqual(
+            u'hello AND (foo:("a16" OR "a17" OR "a18" OR "a19" OR "b" OR "c")'
+            u' AND NOT (foo:("d" OR "e")))',
+            queries[-1].build_query()
+        )
+        # The original query is left as it was
+        self.assertTrue(len(str(query)) > 100)
+
+    def test_inverted_not_split(self):
+        query = Query(FakeDocument)
+        query.add_q(~Q(foo=['a%02d' % i for i in range(20)]))
+        self.assertEqual([query], query.split(100))
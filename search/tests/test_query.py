@@ -3,8 +3,10 @@ import unittest
 
 from google.appengine.api import search as search_api
 
+from ..backends.memory import MemoryBackend
+from ..cache import page_cursor_cache
 from ..indexes import DocumentModel, Index
-from ..fields import TZDateTimeField, TextField
+from ..fields import AtomField, IntegerField, TZDateTimeField, TextField
 from ..query import SearchQuery
 from ..ql import Q
 from .. import timezone
@@ -17,6 +19,35 @@ class FakeDocument(DocumentModel):
     created = TZDateTimeField()
 
 
+class ProjectedDocument(DocumentModel):
+    name = TextField()
+    number = IntegerField()
+    corpus = TextField()
+
+
+class RecordingIndexTestCase(unittest.TestCase):
+    """Sets up `self.index`, an index of `ProjectedDocument`s on the memory
+    backend holding `get_documents()`, and records every Search API query
+    made to it in `self.queries`.
+    """
+    index_name = None
+
+    def get_documents(self):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.index = Index(self.index_name, ProjectedDocument, backend=MemoryBackend())
+        self.index.put(self.get_documents())
+        self.queries = []
+        search_async = self.index._index.search_async
+
+        def recording_search_async(query, **kwargs):
+            self.queries.append(query)
+            return search_async(query, **kwargs)
+
+        self.index._index.search_async = recording_search_async
+
+
 class TestSearchQueryClone(unittest.TestCase):
     def test_clone_keywords(self):
         q = SearchQuery("dummy", document_class=FakeDocument).keywords("bar")
@@ -40,15 +71,12 @@ class TestSearchQueryClone(unittest.TestCase):
         q1 = q.filter(~Q(foo="neg2"))
 
         self.assertEqual(
-            u'(((foo:"bar") OR (foo:"baz")) AND NOT (foo:"neg"))',
+            u'(foo:("bar" OR "baz") AND NOT (foo:"neg"))',
             unicode(q.query)
         )
 
         self.assertEqual(
-            u'('
-            '(((foo:"bar") OR (foo:"baz")) AND NOT (foo:"neg")) '
-            'AND NOT (foo:"neg2")'
-            ')',
+            u'(foo:("bar" OR "baz") AND NOT (foo:"neg") AND NOT (foo:"neg2"))',
             unicode(q1.query)
         )
 
@@ -62,6 +90,384 @@ class TestSearchQueryFilter(unittest.TestCase):
         self.assertEqual(unicode(q.query), u'(created > 1483185600)')
 
 
+class TestReturnedFields(RecordingIndexTestCase):
+    index_name = 'projected'
+
+    def get_documents(self):
+        return ProjectedDocument(doc_id='1', name='one', number=1, corpus='o on one')
+
+    def test_returned_fields(self):
+        q = self.index.search()
+        self.assertIsNone(q.get_returned_fields())
+        self.assertEqual(['name'], q.only('name').get_returned_fields())
+        self.assertEqual(['name', 'number'], q.defer('corpus').get_returned_fields())
+        self.assertEqual(
+            ['number'],
+            q.only('name', 'number').defer('name').get_returned_fields()
+        )
+        self.assertEqual(['name'], q.only('number').only('name').get_returned_fields())
+        self.assertIsNone(q.defer('corpus').defer(None).get_returned_fields())
+        self.assertRaises(ValueError, q.defer('name', 'number', 'corpus').get_returned_fields)
+
+    def test_unknown_field(self):
+        q = self.index.search()
+        self.assertRaises(ValueError, q.only, 'title')
+        self.assertRaises(ValueError, q.defer, 'title')
+
+    def test_clone(self):
+        q = self.index.search().defer('corpus').filter(number=1)
+        self.assertEqual(['name', 'number'], q[:10].get_returned_fields())
+
+    def test_unfetched_fields_unset(self):
+        for lazy in (False, True):
+            document = self.index.search(lazy=lazy).defer('corpus')[0]
+            self.assertEqual(('one', 1), (document.name, document.number))
+            self.assertRaises(AttributeError, getattr, document, 'corpus')
+
+            document = self.index.search(lazy=lazy).only('number')[0]
+            self.assertEqual(1, document.number)
+            self.assertRaises(AttributeError, getattr, document, 'name')
+
+    def test_sent_to_backend(self):
+        list(self.index.search().defer('corpus'))
+        self.assertEqual(['name', 'number'], self.queries[-1].options.returned_fields)
+
+        # The Search API doesn't allow returned fields with ids_only
+        list(self.index.search(ids_only=True).defer('corpus'))
+        self.assertEqual([], self.queries[-1].options.returned_fields)
+
+
+class TestCount(RecordingIndexTestCase):
+    index_name = 'counted'
+
+    def get_documents(self):
+        return [
+            ProjectedDocument(doc_id=str(i), name='thing', number=i)
+            for i in range(30)
+        ]
+
+    def test_page_counted_with_results(self):
+        page = self.index.search().order_by('number')[10:20]
+        self.assertEqual(30, page.count())
+        self.assertEqual(range(10, 20), [d.number for d in page])
+        self.assertEqual(1, len(self.queries))
+
+        # list() asks for the length before iterating
+        page = self.index.search().order_by('number')[:5]
+        self.assertEqual(5, len(list(page)))
+        self.assertEqual(30, page.count())
+        self.assertEqual(2, len(self.queries))
+
+    def test_count_ids_only(self):
+        q = self.index.search()
+        self.assertEqual(30, q.count())
+        self.assertEqual(30, q.count())
+        self.assertEqual(1, len(self.queries))
+        self.assertTrue(self.queries[0].options.ids_only)
+        self.assertEqual(1, self.queries[0].options.limit)
+
+    def test_count_accuracy(self):
+        q = self.index.search()
+        q.count()
+        q.count_accuracy(1000).count()
+        q.approximate_count()[:10].count()
+        self.assertEqual(
+            [100, 1000, None],
+            [query.options.number_found_accuracy for query in self.queries]
+        )
+        self.assertRaises(ValueError, q.count_accuracy, 0)
+        self.assertRaises(ValueError, q.count_accuracy, 25001)
+
+
+class TestSplitQuery(RecordingIndexTestCase):
+    index_name = 'split'
+
+    def get_documents(self):
+        return [
+            ProjectedDocument(doc_id=str(i), name='name%04d' % i, number=i % 40)
+            for i in range(400)
+        ]
+
+    def test_split(self):
+        names = ['name%04d' % i for i in range(0, 400, 2)]
+        q = self.index.search().filter(name=names, number__lt=20).order_by('-number')
+        self.assertGreater(len(str(q.query)), search_api.MAXIMUM_QUERY_LENGTH)
+
+        documents = list(q[:50])
+        self.assertTrue(len(self.queries) > 1)
+        self.assertTrue(all(
+            len(query.query_string) <= search_api.MAXIMUM_QUERY_LENGTH
+            for query in self.queries
+        ))
+        self.assertEqual(50, len(documents))
+        self.assertEqual(
+            [18] * 10 + [16] * 10 + [14] * 10 + [12] * 10 + [10] * 10,
+            [d.number for d in documents]
+        )
+        self.assertEqual(100, q.count())
+
+    def test_duplicates_dropped(self):
+        q = self.index.search(ids_only=True).filter(
+            Q(name=['name%04d' % i for i in range(200)]) |
+            Q(number=[0, 1])
+        )
+        doc_ids = list(q)
+        self.assertTrue(len(self.queries) > 1)
+        self.assertEqual(len(set(doc_ids)), len(doc_ids))
+        self.assertEqual(
+            set(str(i) for i in range(200)) |
+            set(str(i) for i in range(400) if i % 40 < 2),
+            set(doc_ids)
+        )
+
+    def test_cursors_rejected(self):
+        q = self.index.search().filter(name=['name%04d' % i for i in range(400)])
+        self.assertRaises(ValueError, list, q.iterator())
+
+    def test_page(self):
+        q = self.index.search().filter(
+            name=['name%04d' % i for i in range(400)]
+        ).order_by('number', 'name')
+        page = q.page(2, 5)
+        self.assertEqual(
+            ['name%04d' % i for i in range(200, 400, 40)],
+            [d.name for d in page]
+        )
+        self.assertEqual([2] * 10, [d.number for d in q.page(3, 10)])
+        self.assertEqual(400, page.count())
+        self.assertTrue(len(self.queries) > 1)
+        self.assertFalse(any(query.options.cursor for query in self.queries))
+
+        # Offsets only reach the first 1000 results
+        self.assertRaises(IndexError, q.page, 102, 10)
+
+
+class TestProfile(RecordingIndexTestCase):
+    index_name = 'profiled'
+
+    def get_documents(self):
+        return [
+            ProjectedDocument(doc_id=str(i), name=u'\u2603 thing %s' % i, number=i)
+            for i in range(30)
+        ]
+
+    def test_explain(self):
+        q = self.index.search().filter(number__lt=10).snippet('name')
+        profile = q.explain()
+        self.assertIsNone(q.get_profile())
+
+        self.assertEqual(['(number < 10)'], profile.query_strings)
+        self.assertEqual(1000, profile.options.limit)
+        self.assertEqual(1, profile.rpcs)
+        self.assertEqual(10, profile.documents)
+        self.assertGreater(profile.payload_bytes, 0)
+
+        phases = profile.as_dict()['phases']
+        self.assertEqual(
+            ['compile', 'snippets', 'rpc', 'construct'], list(phases)
+        )
+        self.assertEqual(1, phases['compile']['calls'])
+        self.assertEqual(11, phases['snippets']['calls'])
+        self.assertEqual(2, phases['rpc']['calls'])
+        self.assertEqual(10, phases['construct']['calls'])
+        self.assertIn(u'rpcs: 1, documents: 10', unicode(profile))
+
+    def test_profile(self):
+        q = self.index.search().profile().order_by('number')
+        self.assertEqual(30, q.count())
+        self.assertEqual(range(30), [d.number for d in q])
+        profile = q.get_profile()
+        self.assertEqual(2, profile.rpcs)
+        self.assertEqual(31, profile.documents)
+
+        # Queries made from it get their own
+        q = q.filter(number__gte=25)
+        self.assertEqual(5, len(list(q.iterator(chunk_size=2))))
+        self.assertEqual(3, q.get_profile().rpcs)
+
+    def test_split(self):
+        names = [u'\u2603 thing %s' % i for i in range(300)]
+        profile = self.index.search().filter(name=names).explain()
+        self.assertGreater(profile.rpcs, 1)
+        self.assertEqual(profile.rpcs, len(profile.query_strings))
+        self.assertEqual(30, profile.documents)
+
+
+class TestIterator(RecordingIndexTestCase):
+    index_name = 'iterated'
+
+    def get_documents(self):
+        return [
+            ProjectedDocument(doc_id='%02d' % i, name='thing', number=i)
+            for i in range(25)
+        ]
+
+    def test_iterator(self):
+        q = self.index.search().order_by('number')
+        documents = q.iterator(chunk_size=10)
+        self.assertEqual(0, next(documents).number)
+        # The second chunk is already on its way
+        self.assertEqual(2, len(self.queries))
+
+        self.assertEqual(range(1, 25), [d.number for d in documents])
+        self.assertEqual(3, len(self.queries))
+        self.assertEqual([10, 10, 10], [query.options.limit for query in self.queries])
+        self.assertIsNone(q._results_cache)
+
+    def test_ids_only(self):
+        doc_ids = list(self.index.search(ids_only=True).iterator(chunk_size=7))
+        self.assertEqual(sorted('%02d' % i for i in range(25)), sorted(doc_ids))
+
+    def test_sliced(self):
+        q = self.index.search().order_by('number')[:15]
+        self.assertEqual(range(15), [d.number for d in q.iterator(chunk_size=10)])
+        self.assertEqual([10, 5], [query.options.limit for query in self.queries])
+
+        self.assertRaises(ValueError, self.index.search()[5:].iterator)
+        self.assertRaises(ValueError, self.index.search().iterator, chunk_size=1001)
+
+
+class TestPage(RecordingIndexTestCase):
+    index_name = 'paged'
+
+    def setUp(self):
+        page_cursor_cache.clear()
+        super(TestPage, self).setUp()
+
+    def get_documents(self):
+        return [
+            ProjectedDocument(doc_id='%04d' % i, name='thing', number=i)
+            for i in range(1500)
+        ]
+
+    def tearDown(self):
+        page_cursor_cache.clear()
+
+    def get_page(self, number, per_page=100):
+        query = self.index.search().order_by('number').page(number, per_page)
+        return [d.number for d in query]
+
+    def test_next_page(self):
+        self.assertEqual(range(100), self.get_page(1))
+        self.assertEqual(range(100, 200), self.get_page(2))
+        self.assertEqual(range(100), self.get_page(1))
+        self.assertEqual(3, len(self.queries))
+
+    def test_deep_page(self):
+        self.assertEqual(range(1400, 1500), self.get_page(15))
+        # Two searches for the IDs of the 1400 documents before it
+        self.assertEqual(3, len(self.queries))
+        self.assertTrue(all(q.options.ids_only for q in self.queries[:2]))
+
+        # Pages in between were remembered on the way
+        del self.queries[:]
+        self.assertEqual(range(700, 800), self.get_page(8))
+        self.assertEqual(range(500, 600), self.get_page(6))
+        self.assertEqual(2, len(self.queries))
+
+    def test_past_the_end(self):
+        self.assertEqual([], self.get_page(16))
+        self.assertEqual([], self.get_page(4, per_page=1000))
+        self.assertEqual([], list(self.index.search().filter(number=-1).page(3, 10)))
+
+    def test_writes_forget_cursors(self):
+        self.get_page(1)
+        self.index.put(ProjectedDocument(doc_id='-001', name='thing', number=-1))
+
+        # The cursor for page 2 from before the write would skip a document
+        del self.queries[:]
+        self.assertEqual(range(99, 199), self.get_page(2))
+        self.assertEqual(2, len(self.queries))
+
+    def test_other_queries_separate(self):
+        self.get_page(2)
+        query = self.index.search().order_by('-number').page(2, 100)
+        self.assertEqual(range(1399, 1299, -1), [d.number for d in query])
+        self.assertRaises(ValueError, self.index.search().page, 0, 10)
+
+
+class FacetedDocument(DocumentModel):
+    title = TextField()
+    genre = AtomField(facet=True)
+    rating = IntegerField(facet=True)
+
+
+class TestFacets(unittest.TestCase):
+    def setUp(self):
+        self.index = Index('faceted', FacetedDocument, backend=MemoryBackend())
+        genres = ['action', 'action', 'comedy', 'drama', None]
+        self.index.put([
+            FacetedDocument(
+                doc_id=str(i),
+                title='film %s' % i,
+                genre=genre,
+                rating=i + 1
+            )
+            for i, genre in enumerate(genres)
+        ])
+
+    def get_counts(self, query, name):
+        return [(v.label, v.count) for v in query.get_facets()[name]]
+
+    def test_facets(self):
+        q = self.index.search().facets('genre')[:2]
+        self.assertEqual(
+            [('action', 2), ('comedy', 1), ('drama', 1)],
+            self.get_counts(q, 'genre')
+        )
+        # Counted in the same search as the page
+        self.assertEqual(2, len(list(q)))
+        self.assertEqual(5, q.count())
+
+    def test_ranges(self):
+        q = self.index.search().facets(search_api.FacetRequest('rating', ranges=[
+            search_api.FacetRange(end=3),
+            search_api.FacetRange(start=3),
+        ]))
+        self.assertEqual([('[,3)', 2), ('[3,)', 3)], self.get_counts(q, 'rating'))
+
+    def test_refine(self):
+        q = self.index.search().facet_refine(genre=['comedy', 'drama'])
+        self.assertEqual(['2', '3'], sorted(d.doc_id for d in q))
+
+        token = self.index.search().facets('genre').get_facets()['genre'][0].refinement_token
+        q = self.index.search().facet_refine(token).facets('rating')
+        self.assertEqual(['0', '1'], sorted(d.doc_id for d in q))
+        self.assertEqual([('1', 1), ('2', 1)], self.get_counts(q, 'rating'))
+
+    def test_discover(self):
+        q = self.index.search().discover_facets(limit=1)
+        self.assertEqual(['rating'], list(q.get_facets()))
+
+    def test_validated(self):
+        q = self.index.search()
+        self.assertRaises(ValueError, q.facets, 'title')
+        self.assertRaises(ValueError, q.facet_refine, title='film')
+        self.assertRaises(ValueError, q.facets, 'nope')
+
+    def test_long_text(self):
+        class Document(DocumentModel):
+            description = TextField(facet=True)
+
+        index = Index('long_facets', Document, backend=MemoryBackend())
+        index.put([
+            Document(doc_id='1', description='short'),
+            Document(doc_id='2', description='long ' * 101),
+        ])
+        q = index.search().facets('description')
+        self.assertEqual(2, q.count())
+        self.assertEqual([('short', 1)], self.get_counts(q, 'description'))
+
+    def test_serialized(self):
+        search_document = self.index.to_search_document(
+            FacetedDocument(doc_id='1', genre='action')
+        )
+        self.assertEqual(
+            [('genre', 'action')],
+            [(f.name, f.value) for f in search_document.facets]
+        )
+
+
 class TestCursor(AppengineTestCase):
     def test_cursor(self):
         idx = Index('dummy', FakeDocument)
@@ -0,0 +1,122 @@
+import unittest
+
+from ..backends.memory import MemoryBackend
+from ..fields import AtomField, IntegerField, TextField
+from ..indexes import DocumentModel, Index
+from ..sharding import ShardedIndex
+
+
+class FakeDocument(DocumentModel):
+    name = TextField()
+    colour = AtomField(facet=True)
+    number = IntegerField()
+
+
+COLOURS = ['red', 'green', 'blue']
+
+
+def make_documents(count):
+    return [
+        FakeDocument(
+            doc_id='doc%03d' % i,
+            name=u'thing %s' % i,
+            colour=COLOURS[i % 3],
+            number=(i * 7) % 50,
+            _rank=i
+        )
+        for i in range(count)
+    ]
+
+
+class TestShardedIndex(unittest.TestCase):
+    def setUp(self):
+        backend = MemoryBackend()
+        self.index = ShardedIndex('sharded', FakeDocument, backend=backend, shards=3)
+        self.single = Index('single', FakeDocument, backend=backend)
+
+        documents = make_documents(60)
+        self.index.put(documents)
+        self.single.put(documents)
+
+    def assertSameResults(self, query, single_query):
+        self.assertEqual(list(single_query), list(query))
+        self.assertEqual(single_query.count(), query.count())
+
+    def test_documents_spread_over_shards(self):
+        shards = self.index._index.shards
+        self.assertEqual(3, len(shards))
+        self.assertEqual(60, sum(len(shard.get_range(limit=100)) for shard in shards))
+        self.assertTrue(all(len(shard.get_range()) for shard in shards))
+
+    def test_get_and_delete(self):
+        self.assertEqual('thing 5', self.index.get('doc005').name)
+        self.index.delete(['doc005', 'doc006'])
+        self.assertIsNone(self.index.get('doc005'))
+        self.assertEqual(58, self.index.search().count())
+
+    def test_get_from_one_shard(self):
+        calls = []
+
+        class RecordingShard(object):
+            def __init__(self, shard):
+                self.shard = shard
+
+            def __getattr__(self, name):
+                calls.append(name)
+                return getattr(self.shard, name)
+
+        sharded = self.index._index._index
+        sharded.shards = [RecordingShard(shard) for shard in sharded.shards]
+        self.assertEqual('thing 5', self.index.get('doc005').name)
+        self.assertEqual(['get_async'], calls)
+
+    def test_get_range(self):
+        self.assertEqual(
+            ['doc%03d' % i for i in range(10, 30)],
+            self.index.get_range(start_id='doc010', limit=20, ids_only=True)
+        )
+        self.assertEqual(60, len(list(self.index.iter_documents(page_size=7))))
+
+    def test_search_by_rank(self):
+        self.assertSameResults(
+            self.index.search(ids_only=True).filter(colour='red')[5:12],
+            self.single.search(ids_only=True).filter(colour='red')[5:12]
+        )
+
+    def test_search_sorted(self):
+        self.assertSameResults(
+            self.index.search(ids_only=True).order_by('number', '-name')[3:40],
+            self.single.search(ids_only=True).order_by('number', '-name')[3:40]
+        )
+        self.assertSameResults(
+            self.index.search(ids_only=True).order_by('-colour')[:20],
+            self.single.search(ids_only=True).order_by('-colour')[:20]
+        )
+
+    def test_search_documents(self):
+        results = list(self.index.search().keywords('thing').order_by('-number')[:5])
+        self.assertEqual(5, len(results))
+        self.assertEqual([49, 49, 48, 47, 46], [d.number for d in results])
+
+    def test_facets_merged(self):
+        def get_counts(index):
+            query = index.search().facet_refine(colour=['red', 'blue']).facets('colour')
+            return [(v.label, v.count) for v in query.get_facets()['colour']]
+
+        self.assertEqual([('blue', 20), ('red', 20)], get_counts(self.index))
+        self.assertEqual(get_counts(self.single), get_counts(self.index))
+
+    def test_cursors_rejected(self):
+        query = self.index.search().set_cursor()
+        self.assertRaises(ValueError, list, query)
+
+    def test_deep_offset(self):
+        # Beyond 1000 results the shards have to be paged through
+        documents = make_documents(1300)
+        self.index.put(documents)
+        self.single.put(documents)
+
+        self.assertSameResults(
+            self.index.search(ids_only=True).order_by('number')[900:1200],
+            self.single.search(ids_only=True).order_by('number')[900:1200]
+        )
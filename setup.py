@@ -4,5 +4,5 @@ from setuptools import setup
 setup(
     name='search',
     url='https://github.com/potatolondon/search',
-    packages=['search', 'search.tests', 'search.django', 'search.django.rest_framework'],
+    packages=['search', 'search.backends', 'search.tests', 'search.django', 'search.django.rest_framework'],
 )